@@ -1,5 +1,6 @@
 from pyramid.httpexceptions import HTTPBadRequest, HTTPNotFound, HTTPOk
 from pyramid.request import Request
+from pyramid.settings import asbool
 from pyramid.view import view_config
 
 from cowbird.api import exception as ax
@@ -51,5 +52,6 @@ def resync_handler_view(request: Request) -> AnyResponseType:
     """
     Resync handler operation.
     """
-    get_handler(request).resync()
+    dry_run = asbool(ar.get_query_param(request, "dry_run", False))
+    get_handler(request).resync(dry_run=dry_run)
     return ax.valid_http(HTTPOk, detail=s.HandlerResync_PUT_OkResponseSchema.description)
@@ -0,0 +1,18 @@
+from pyramid.httpexceptions import HTTPOk
+from pyramid.request import Request
+from pyramid.view import view_config
+
+from cowbird.api import exception as ax
+from cowbird.api import schemas as s
+from cowbird.monitoring.monitoring import Monitoring
+from cowbird.typedefs import JSON, AnyResponseType
+
+
+@s.MonitoringAPI.get(tags=[s.MonitoringTag], response_schemas=s.Monitoring_GET_responses)
+@view_config(route_name=s.MonitoringAPI.name, request_method="GET")
+def get_monitoring_view(request: Request) -> AnyResponseType:
+    """
+    Get the statistics of the file system monitoring.
+    """
+    data: JSON = {"monitoring": Monitoring(request).stats()}
+    return ax.valid_http(HTTPOk, content=data, detail=s.Monitoring_GET_OkResponseSchema.description)
@@ -5,6 +5,7 @@ from cornice import Service
 from cornice.service import get_services
 from cornice_swagger.swagger import CorniceSwagger
 from pyramid.httpexceptions import (
+    HTTPAccepted,
     HTTPBadRequest,
     HTTPConflict,
     HTTPFailedDependency,
@@ -137,6 +138,12 @@ UserWebhookAPI = Service(
 PermissionWebhookAPI = Service(
     path="/webhooks/permissions",
     name="permission_webhook")
+WebhookEventAPI = Service(
+    path="/webhooks/events/{event_id}",
+    name="webhook_event")
+MonitoringAPI = Service(
+    path="/monitoring",
+    name="monitoring")
 
 # Path parameters
 OperationParameter = colander.SchemaNode(
@@ -149,14 +156,25 @@ HandlerNameParameter = colander.SchemaNode(
     example="my-wps")
 
 
+EventIdParameter = colander.SchemaNode(
+    colander.String(),
+    description="Identifier of a webhook event dispatched asynchronously.",
+    example="0b5cd5e3-5ac1-4d68-8d43-f4bc38eed6a0")
+
+
 class Handler_RequestPathSchema(colander.MappingSchema):
     handler_name = HandlerNameParameter
 
 
+class WebhookEvent_RequestPathSchema(colander.MappingSchema):
+    event_id = EventIdParameter
+
+
 # Tags
 APITag = "API"
 WebhooksTag = "Webhooks"
 HandlersTag = "Handlers"
+MonitoringTag = "Monitoring"
 
 TAG_DESCRIPTIONS = {
     APITag: "General information about the API.",
@@ -166,6 +184,9 @@ TAG_DESCRIPTIONS = {
     HandlersTag:
         f"Handlers that are managed by {__meta__.__title__}.\n\n" +
         "Each handler defines information such as endpoint and configuration details for running webhooks.",
+    MonitoringTag:
+        f"File system monitoring done by {__meta__.__title__}.\n\n" +
+        "Monitors notify the handlers of the changes of the paths that they watch.",
 }
 
 # Header definitions
@@ -497,8 +518,14 @@ class Handler_Check_NotFoundResponseSchema(BaseResponseSchemaAPI):
     body = ErrorResponseBodySchema(code=HTTPNotFound.code, description=description)
 
 
+class HandlerResync_PUT_QuerySchema(QueryRequestSchemaAPI):
+    dry_run = colander.SchemaNode(colander.Boolean(), missing=colander.drop, default=False,
+                                  description="Only report the changes required by the resync, without applying them.")
+
+
 class HandlerResync_PUT_RequestSchema(BaseRequestSchemaAPI):
     path = Handler_RequestPathSchema()
+    querystring = HandlerResync_PUT_QuerySchema()
 
 
 class HandlerResync_PUT_OkResponseSchema(BaseResponseSchemaAPI):
@@ -594,6 +621,18 @@ class UserWebhook_POST_OkResponseSchema(BaseResponseSchemaAPI):
     body = BaseResponseBodySchema(code=HTTPOk.code, description=description)
 
 
+class WebhookEvent_AcceptedResponseBodySchema(BaseResponseBodySchema):
+    event_id = colander.SchemaNode(
+        colander.String(),
+        description="Identifier of the event, to query the progress of its asynchronous dispatch.",
+        example="0b5cd5e3-5ac1-4d68-8d43-f4bc38eed6a0")
+
+
+class UserWebhook_POST_AcceptedResponseSchema(BaseResponseSchemaAPI):
+    description = "User event accepted for asynchronous handling."
+    body = WebhookEvent_AcceptedResponseBodySchema(code=HTTPAccepted.code, description=description)
+
+
 class UserWebhook_POST_InternalServerErrorResponseSchema(BaseResponseSchemaAPI):
     description = "Failed to handle user webhook event."
     body = BaseResponseBodySchema(code=HTTPInternalServerError.code, description=description)
@@ -659,6 +698,206 @@ class PermissionWebhook_POST_OkResponseSchema(BaseResponseSchemaAPI):
     body = BaseResponseBodySchema(code=HTTPOk.code, description=description)
 
 
+class PermissionWebhook_POST_AcceptedResponseSchema(BaseResponseSchemaAPI):
+    description = "Permission event accepted for asynchronous handling."
+    body = WebhookEvent_AcceptedResponseBodySchema(code=HTTPAccepted.code, description=description)
+
+
+class WebhookEventHandlerStatusSchema(colander.MappingSchema):
+    status = colander.SchemaNode(
+        colander.String(),
+        description="Status of the event handling by the handler.",
+        example="succeeded")
+    error = colander.SchemaNode(
+        colander.String(),
+        description="Error raised by the handler, if any.",
+        missing=colander.drop)
+
+
+class WebhookEventHandlersSchema(colander.MappingSchema):
+    description = "Status of the event handling by each handler, indexed by handler name."
+    handler_name = WebhookEventHandlerStatusSchema(
+        name="{handler_name}",
+        description="Status of the event handling by the handler named by the key.")
+
+
+class WebhookEventSchema(colander.MappingSchema):
+    event_id = EventIdParameter
+    webhook = colander.SchemaNode(
+        colander.String(),
+        description="Webhook that received the event.",
+        example="users")
+    event = colander.SchemaNode(
+        colander.String(),
+        description="Event received by the webhook.",
+        validator=colander.OneOf(ValidOperations.values()))
+    status = colander.SchemaNode(
+        colander.String(),
+        description="Overall status of the event dispatch.",
+        example="running")
+    handlers = WebhookEventHandlersSchema()
+    created = colander.SchemaNode(
+        colander.String(),
+        description="Time when the event was received.")
+    updated = colander.SchemaNode(
+        colander.String(),
+        description="Time of the last progress of the event dispatch.")
+
+
+class WebhookEvent_GET_RequestSchema(BaseRequestSchemaAPI):
+    path = WebhookEvent_RequestPathSchema()
+
+
+class WebhookEvent_GET_ResponseBodySchema(BaseResponseBodySchema):
+    event = WebhookEventSchema()
+
+
+class WebhookEvent_GET_OkResponseSchema(BaseResponseSchemaAPI):
+    description = "Get webhook event successful."
+    body = WebhookEvent_GET_ResponseBodySchema(code=HTTPOk.code, description=description)
+
+
+class WebhookEvent_GET_NotFoundResponseSchema(BaseResponseSchemaAPI):
+    description = "Could not find specified webhook event."
+    body = ErrorResponseBodySchema(code=HTTPNotFound.code, description=description)
+
+
+class InotifyUsageSchema(colander.MappingSchema):
+    instances = colander.SchemaNode(
+        colander.Integer(),
+        description="Inotify instances opened by the process.")
+    watches = colander.SchemaNode(
+        colander.Integer(),
+        description="Inotify watch descriptors held by the inotify instances of the process.")
+
+
+class ObserverBackendsSchema(colander.MappingSchema):
+    inotify = colander.SchemaNode(
+        colander.Integer(),
+        description="Watches of the native observers of the platform, inotify on Linux.")
+    polling = colander.SchemaNode(
+        colander.Integer(),
+        description="Watches of the polling observers.")
+
+
+class ObserverPoolStatsSchema(colander.MappingSchema):
+    observers = colander.SchemaNode(
+        colander.Integer(),
+        description="Running observers shared by the monitors.")
+    threads = colander.SchemaNode(
+        colander.Integer(),
+        description="Threads used by the observers and their emitters.")
+    process_threads = colander.SchemaNode(
+        colander.Integer(),
+        description="Threads of the whole process.")
+    watches = colander.SchemaNode(
+        colander.Integer(),
+        description="Distinct paths and recursive flags watched by the observers.")
+    merged_watches = colander.SchemaNode(
+        colander.Integer(),
+        description="Monitored paths and recursive flags served by the recursive watch of a parent path.")
+    handlers = colander.SchemaNode(
+        colander.Integer(),
+        description="Monitors receiving the events of the watches.")
+    inotify = InotifyUsageSchema()
+    backends = ObserverBackendsSchema()
+    polled_directories = colander.SchemaNode(
+        colander.Integer(),
+        description="Directories kept in the snapshots of the polling observers.")
+
+
+class EventDispatcherStatsSchema(colander.MappingSchema):
+    workers = colander.SchemaNode(
+        colander.Integer(),
+        description="Threads sending the events to the monitors callbacks, zero if sent by the observers directly.")
+    queue_size = colander.SchemaNode(
+        colander.Integer(),
+        description="Maximum number of events queued in memory for each worker.")
+    overflow_policy = colander.SchemaNode(
+        colander.String(),
+        description="Handling of the events received while the queue of their worker is full.",
+        example="block")
+    queued = colander.SchemaNode(
+        colander.Integer(),
+        description="Events currently queued in memory.")
+    spilled = colander.SchemaNode(
+        colander.Integer(),
+        description="Events currently saved in the database because of a full queue.")
+    max_queued = colander.SchemaNode(
+        colander.Integer(),
+        description="Highest number of events queued in memory for a worker.")
+    received = colander.SchemaNode(
+        colander.Integer(),
+        description="Events received from the observers.")
+    processed = colander.SchemaNode(
+        colander.Integer(),
+        description="Events sent to the monitors callbacks.")
+    overflows = colander.SchemaNode(
+        colander.Integer(),
+        description="Events received while the queue of their worker was full.")
+    blocked_seconds = colander.SchemaNode(
+        colander.Float(),
+        description="Total time that the observers waited for space in a full queue.")
+    dropped = colander.SchemaNode(
+        colander.Integer(),
+        description="Events discarded because of a full queue or a missing monitor.")
+    spilled_total = colander.SchemaNode(
+        colander.Integer(),
+        description="Events saved in the database because of a full queue.")
+    replayed = colander.SchemaNode(
+        colander.Integer(),
+        description="Journaled events replayed on startup, since they were not sent before the previous shutdown.")
+
+
+class MonitoringStartupStatsSchema(colander.MappingSchema):
+    load = colander.SchemaNode(
+        colander.Float(),
+        description="Duration (in seconds) of the loading and validation of the monitors saved in the database.")
+    start = colander.SchemaNode(
+        colander.Float(),
+        description="Duration (in seconds) of the scheduling of the watches of the loaded monitors.")
+    catch_up = colander.SchemaNode(
+        colander.Float(),
+        description="Duration (in seconds) of the scan of the changes since the watermarks of the loaded monitors.")
+
+
+class MonitorActivatorStatsSchema(colander.MappingSchema):
+    active = colander.SchemaNode(
+        colander.Integer(),
+        description="Lazy recursive monitors currently watching the whole tree of their path.")
+    activations = colander.SchemaNode(
+        colander.Integer(),
+        description="Activations of lazy monitors since the start of the process.")
+    deactivations = colander.SchemaNode(
+        colander.Integer(),
+        description="Deactivations of idle or least recently used lazy monitors since the start of the process.")
+
+
+class MonitoringStatsSchema(colander.MappingSchema):
+    monitors = colander.SchemaNode(
+        colander.Integer(),
+        description="Registered monitors.")
+    paths = colander.SchemaNode(
+        colander.Integer(),
+        description="Distinct paths of the registered monitors.")
+    inactive = colander.SchemaNode(
+        colander.Integer(),
+        description="Lazy recursive monitors only watching the direct entries of their path until activated.")
+    startup = MonitoringStartupStatsSchema()
+    activation = MonitorActivatorStatsSchema()
+    observers = ObserverPoolStatsSchema()
+    dispatcher = EventDispatcherStatsSchema()
+
+
+class Monitoring_GET_ResponseBodySchema(BaseResponseBodySchema):
+    monitoring = MonitoringStatsSchema()
+
+
+class Monitoring_GET_OkResponseSchema(BaseResponseSchemaAPI):
+    description = "Get monitoring statistics successful."
+    body = Monitoring_GET_ResponseBodySchema(code=HTTPOk.code, description=description)
+
+
 class Version_GET_ResponseBodySchema(BaseResponseBodySchema):
     version = colander.SchemaNode(
         colander.String(),
@@ -741,22 +980,36 @@ HandlerResync_PUT_responses = {
 }
 UserWebhook_POST_responses = {
     "200": UserWebhook_POST_OkResponseSchema(),
+    "202": UserWebhook_POST_AcceptedResponseSchema(),
     "400": UserWebhook_POST_BadRequestResponseSchema(),
     "406": NotAcceptableResponseSchema(),
     "500": InternalServerErrorResponseSchema(),
 }
 PermissionWebhook_POST_responses = {
     "200": PermissionWebhook_POST_OkResponseSchema(),
+    "202": PermissionWebhook_POST_AcceptedResponseSchema(),
     "400": PermissionWebhook_POST_BadRequestResponseSchema(),
     "406": NotAcceptableResponseSchema(),
     "500": InternalServerErrorResponseSchema(),
 }
+WebhookEvent_GET_responses = {
+    "200": WebhookEvent_GET_OkResponseSchema(),
+    "404": WebhookEvent_GET_NotFoundResponseSchema(),
+    "406": NotAcceptableResponseSchema(),
+    "500": InternalServerErrorResponseSchema(),
+}
 Version_GET_responses = {
     "200": Version_GET_OkResponseSchema(),
     "406": NotAcceptableResponseSchema(),
     "424": FailedDependencyErrorResponseSchema(),
     "500": InternalServerErrorResponseSchema(),
 }
+Monitoring_GET_responses = {
+    "200": Monitoring_GET_OkResponseSchema(),
+    "401": UnauthorizedResponseSchema(),
+    "406": NotAcceptableResponseSchema(),
+    "500": InternalServerErrorResponseSchema(),
+}
 Homepage_GET_responses = {
     "200": Homepage_GET_OkResponseSchema(),
     "406": NotAcceptableResponseSchema(),
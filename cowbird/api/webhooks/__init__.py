@@ -9,4 +9,5 @@ def includeme(config: Configurator) -> None:
     logger.info("Adding webhooks base routes...")
     config.add_route(**s.service_api_route_info(s.UserWebhookAPI))
     config.add_route(**s.service_api_route_info(s.PermissionWebhookAPI))
+    config.add_route(**s.service_api_route_info(s.WebhookEventAPI))
     config.scan()
@@ -0,0 +1,167 @@
+"""
+Asynchronous dispatch of the webhook events to the handlers, using `Celery` tasks.
+
+Each event is persisted in the :class:`WebhookEventStore` before being dispatched, and its progress is updated by the
+tasks handling it, such that it can be queried while the handlers are processing it.
+"""
+from typing import Any, Dict, List, Optional
+
+import requests
+from celery import Task, chain, shared_task
+from requests.exceptions import RequestException
+
+from cowbird.api.schemas import ValidOperations
+from cowbird.database import get_db
+from cowbird.database.stores import WebhookEventStatus, WebhookEventStore
+from cowbird.handlers import Handler, get_handlers
+from cowbird.handlers.impl.magpie import Magpie
+from cowbird.permissions_synchronizer import Permission
+from cowbird.request_task import RequestTask
+from cowbird.typedefs import AnySettingsContainer
+from cowbird.utils import get_logger, get_registry, get_ssl_verify, get_timeout
+
+LOGGER = get_logger(__name__)
+
+# see https://github.com/sbdchd/celery-types
+Task.__class_getitem__ = classmethod(lambda cls, *args, **kwargs: cls)
+
+USER_WEBHOOK = "users"
+PERMISSION_WEBHOOK = "permissions"
+
+
+class WebhookDispatchException(Exception):
+    """
+    Error indicating that an exception occurred during a webhook dispatch.
+    """
+
+
+def invalidate_magpie_resources(resource_id: int, service_name: Optional[str]) -> None:
+    """
+    Invalidates the resources cached by the Magpie handler that could be outdated by a permission event.
+
+    This must be done before any handler gets notified, since they all resolve resources using the Magpie handler.
+    """
+    for handler in get_handlers():
+        if isinstance(handler, Magpie):
+            handler.invalidate_permission_resource(resource_id, service_name)
+
+
+def call_magpie_callback(callback_url: str, container: AnySettingsContainer) -> None:
+    """
+    Calls the Magpie callback url, to set the status of the event as erroneous in Magpie.
+    """
+    try:
+        timeout = get_timeout(container)  # false positive security warning when passed directly
+        requests.head(callback_url, verify=get_ssl_verify(container), timeout=timeout)
+    except requests.exceptions.RequestException as exc:
+        LOGGER.warning("Cannot complete the Magpie callback url request to [%s] : [%s]", callback_url, exc)
+
+
+def notify_handler(handler: Handler, webhook: str, event: str, payload: Dict[str, Any]) -> None:
+    """
+    Notifies a handler of a webhook event, using the serialized payload of the event.
+    """
+    if webhook == USER_WEBHOOK:
+        if event == ValidOperations.CreateOperation.value:
+            handler.user_created(user_name=payload["user_name"])
+        else:
+            handler.user_deleted(user_name=payload["user_name"])
+    else:
+        permission = Permission(**payload)
+        if event == ValidOperations.CreateOperation.value:
+            handler.permission_created(permission=permission)
+        else:
+            handler.permission_deleted(permission=permission)
+
+
+def get_webhook_event_store(container: AnySettingsContainer) -> WebhookEventStore:
+    return get_db(container).get_store(WebhookEventStore)
+
+
+def dispatch_async(container: AnySettingsContainer,
+                   webhook: str,
+                   event: str,
+                   payload: Dict[str, Any],
+                   callback_url: Optional[str] = None,
+                   ) -> str:
+    """
+    Persists a webhook event and enqueues its dispatch to each active handler, in their order of priority.
+
+    :param container: Container from which to retrieve the database.
+    :param webhook: Webhook that received the event (:data:`USER_WEBHOOK` or :data:`PERMISSION_WEBHOOK`).
+    :param event: Event received by the webhook.
+    :param payload: Serializable parameters of the event.
+    :param callback_url: Magpie url to call if any handler fails to handle the event.
+    :returns: Identifier of the persisted event.
+    """
+    handler_names: List[str] = [handler.name for handler in get_handlers(container)]
+    event_id = get_webhook_event_store(container).save_event(webhook, event, payload, handler_names, callback_url)
+    chain(start_webhook_event.si(event_id),
+          *[handle_webhook_event.si(event_id, handler_name) for handler_name in handler_names],
+          finalize_webhook_event.si(event_id)).delay()
+    LOGGER.info("Enqueued dispatch of event [%s] of the [%s] webhook as event id [%s].", event, webhook, event_id)
+    return event_id
+
+
+def _get_task_store(task: Task[Any, None]) -> WebhookEventStore:
+    return get_webhook_event_store(get_registry(task.app))
+
+
+@shared_task(bind=True, base=RequestTask, typing=True)
+def start_webhook_event(task: Task[[str], None], event_id: str) -> None:
+    store = _get_task_store(task)
+    event = store.get_event(event_id)
+    store.set_event_status(event_id, WebhookEventStatus.RUNNING)
+    if event["webhook"] == PERMISSION_WEBHOOK:
+        invalidate_magpie_resources(event["payload"]["resource_id"], event["payload"]["service_name"])
+
+
+@shared_task(bind=True, base=RequestTask, typing=True)
+def handle_webhook_event(task: Task[[str, str], None], event_id: str, handler_name: str) -> None:
+    """
+    Notifies a single handler of an event, recording any error instead of interrupting the chain, so that every handler
+    gets notified even if one of them fails.
+
+    Request errors are still retried as per the :class:`RequestTask` configuration until retries are exhausted.
+    """
+    store = _get_task_store(task)
+    event = store.get_event(event_id)
+    store.set_handler_status(event_id, handler_name, WebhookEventStatus.RUNNING)
+    try:
+        handlers = [handler for handler in get_handlers() if handler.name == handler_name]
+        if not handlers:
+            raise WebhookDispatchException(f"Handler [{handler_name}] is not active anymore.")
+        LOGGER.info("Dispatching event [%s] [%s] for handler [%s].", event_id, event["event"], handler_name)
+        notify_handler(handlers[0], event["webhook"], event["event"], event["payload"])
+    except RequestException as exc:
+        if task.request.retries < task.retry_kwargs["max_retries"]:
+            store.set_handler_status(event_id, handler_name, WebhookEventStatus.RETRYING, error=repr(exc))
+            raise
+        store.set_handler_status(event_id, handler_name, WebhookEventStatus.FAILED, error=repr(exc))
+        LOGGER.error("Exception raised while handling event [%s] for handler [%s] : [%r].",
+                     event_id, handler_name, exc, exc_info=True)
+    except Exception as exc:  # noqa
+        store.set_handler_status(event_id, handler_name, WebhookEventStatus.FAILED, error=repr(exc))
+        LOGGER.error("Exception raised while handling event [%s] for handler [%s] : [%r].",
+                     event_id, handler_name, exc, exc_info=True)
+    else:
+        store.set_handler_status(event_id, handler_name, WebhookEventStatus.SUCCEEDED)
+
+
+@shared_task(bind=True, base=RequestTask, typing=True)
+def finalize_webhook_event(task: Task[[str], None], event_id: str) -> None:
+    store = _get_task_store(task)
+    event = store.get_event(event_id)
+    failed = [name for name, handler_status in event["handlers"].items()
+              if handler_status["status"] == WebhookEventStatus.FAILED.value]
+    if not failed:
+        store.set_event_status(event_id, WebhookEventStatus.SUCCEEDED)
+        return
+    store.set_event_status(event_id, WebhookEventStatus.FAILED)
+    if event["callback_url"]:
+        # If something bad happens, set the status as erroneous in Magpie
+        LOGGER.warning("Handlers %s failed to handle event [%s], calling Magpie callback url : [%s]",
+                       failed, event_id, event["callback_url"])
+        call_magpie_callback(event["callback_url"], get_registry(task.app))
+    else:
+        LOGGER.warning("Handlers %s failed to handle event [%s].", failed, event_id)
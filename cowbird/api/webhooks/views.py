@@ -1,48 +1,104 @@
 import inspect
-from typing import Callable
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
 
-import requests
-from pyramid.httpexceptions import HTTPBadRequest, HTTPInternalServerError, HTTPOk
+from pyramid.httpexceptions import HTTPAccepted, HTTPBadRequest, HTTPInternalServerError, HTTPNotFound, HTTPOk
 from pyramid.request import Request
+from pyramid.threadlocal import manager
 from pyramid.view import view_config
 
 from cowbird.api import exception as ax
 from cowbird.api import requests as ar
 from cowbird.api import schemas as s
 from cowbird.api.schemas import ValidOperations
+from cowbird.api.webhooks.tasks import (
+    PERMISSION_WEBHOOK,
+    USER_WEBHOOK,
+    WebhookDispatchException,
+    call_magpie_callback,
+    dispatch_async,
+    get_webhook_event_store,
+    invalidate_magpie_resources
+)
 from cowbird.handlers import Handler, get_handlers
+from cowbird.monitoring.monitoring import Monitoring
 from cowbird.permissions_synchronizer import Permission
 from cowbird.typedefs import AnyResponseType
-from cowbird.utils import CONTENT_TYPE_JSON, get_logger, get_ssl_verify, get_timeout
+from cowbird.utils import CONTENT_TYPE_JSON, get_dispatch_workers, get_logger, get_monitoring_lazy, get_webhook_async
 
 LOGGER = get_logger(__name__)
 
 
-class WebhookDispatchException(Exception):
+def notify_handler(handler: Handler, handler_fct: Callable[[Handler], None], event_name: str) -> Optional[Exception]:
     """
-    Error indicating that an exception occurred during a webhook dispatch.
+    Notifies a single handler of an event.
+
+    :returns: Exception raised by the handler, if any.
     """
+    start = time.perf_counter()
+    try:
+        LOGGER.info("Dispatching event [%s] for handler [%s].", event_name, handler.name)
+        handler_fct(handler)
+    except Exception as exception:  # noqa
+        LOGGER.error("Exception raised while handling event [%s] for handler [%s] : [%r].",
+                     event_name, handler.name, exception, exc_info=True)
+        return exception
+    finally:
+        LOGGER.info("Handler [%s] processed event [%s] in %.3fs.", handler.name, event_name,
+                    time.perf_counter() - start)
+    return None
 
 
 def dispatch(handler_fct: Callable[[Handler], None]) -> None:
+    """
+    Notifies every active handler of an event, allowing every handler to be notified even if one of them fails.
+
+    Handlers are notified by tiers of increasing priority value, a tier being completed before the next one starts.
+    Handlers of a same tier are notified concurrently, using up to ``COWBIRD_DISPATCH_WORKERS`` threads.
+    """
     exceptions = []
     event_name = inspect.getsource(handler_fct).split(":")[1].strip()
     handlers = get_handlers()
-    for handler in handlers:
-        # Allow every handler to be notified even if one of them throw an error
+    workers = get_dispatch_workers()
+    # Propagate the current request and registry to the threads, for handlers relying on the pyramid threadlocals
+    threadlocals = manager.get()
+
+    def notify_tier_handler(handler: Handler) -> Optional[Exception]:
+        manager.push(threadlocals)
         try:
-            LOGGER.info("Dispatching event [%s] for handler [%s].", event_name, handler.name)
-            handler_fct(handler)
-        except Exception as exception:  # noqa
-            exceptions.append(exception)
-            LOGGER.error("Exception raised while handling event [%s] for handler [%s] : [%r].",
-                         event_name, handler.name, exception, exc_info=True)
+            return notify_handler(handler, handler_fct, event_name)
+        finally:
+            manager.pop()
+
+    tiers: List[List[Handler]] = [list(tier) for _, tier in itertools.groupby(handlers, lambda hdl: hdl.priority)]
+    max_tier_size = max((len(tier) for tier in tiers), default=0)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, max_tier_size))) as executor:
+        for tier in tiers:
+            if workers > 1 and len(tier) > 1:
+                tier_exceptions = list(executor.map(notify_tier_handler, tier))
+            else:
+                tier_exceptions = [notify_handler(handler, handler_fct, event_name) for handler in tier]
+            exceptions.extend(exc for exc in tier_exceptions if exc is not None)
     if not handlers:
         LOGGER.warning("No handlers matched for dispatch of event [%s].", event_name)
     if exceptions:
         raise WebhookDispatchException(exceptions)
 
 
+def activate_user_monitors(request: Request, user_name: str) -> None:
+    """
+    Requests the activation of the lazy monitors of the workspace of a user, whose files are expected to change.
+    """
+    if not get_monitoring_lazy(request):
+        return
+    workspaces = {os.path.join(handler.workspace_dir, user_name) for handler in get_handlers() if handler.workspace_dir}
+    for workspace in workspaces:
+        Monitoring(request).activate(workspace)
+
+
 @s.UserWebhookAPI.post(schema=s.UserWebhook_POST_RequestSchema, tags=[s.WebhooksTag],
                        response_schemas=s.UserWebhook_POST_responses)
 @view_config(route_name=s.UserWebhookAPI.name, request_method="POST")
@@ -61,26 +117,34 @@ def post_user_webhook_view(request: Request) -> AnyResponseType:
     if event == ValidOperations.CreateOperation.value:
         # FIXME: Tried with ax.URL_REGEX, but cannot match what seems valid urls...
         callback_url = ar.get_multiformat_body(request, "callback_url", pattern=None)
+    else:
+        callback_url = None
+    if event == ValidOperations.CreateOperation.value:
+        def monitor_fct(handler: Handler) -> None:
+            handler.start_user_monitoring(user_name=user_name)
 
         def handler_fct(handler: Handler) -> None:
             handler.user_created(user_name=user_name)
     else:
-        callback_url = None
+        def monitor_fct(handler: Handler) -> None:
+            handler.stop_user_monitoring(user_name=user_name)
 
         def handler_fct(handler: Handler) -> None:
             handler.user_deleted(user_name=user_name)
     try:
+        # The monitors are always updated by the application, since they cannot be managed by the Celery workers
+        dispatch(monitor_fct)
+        if get_webhook_async(request):
+            event_id = dispatch_async(request, USER_WEBHOOK, event, {"user_name": user_name}, callback_url)
+            return ax.valid_http(HTTPAccepted, content={"event_id": event_id},
+                                 detail=s.UserWebhook_POST_AcceptedResponseSchema.description)
         dispatch(handler_fct)
     except Exception as dispatch_exc:  # noqa
         if callback_url:
             # If something bad happens, set the status as erroneous in Magpie
             LOGGER.warning("Exception occurred while dispatching event [%s], "
                            "calling Magpie callback url : [%s]", event, callback_url, exc_info=dispatch_exc)
-            try:
-                timeout = get_timeout(request)  # false positive security warning when passed directly
-                requests.head(callback_url, verify=get_ssl_verify(request), timeout=timeout)
-            except requests.exceptions.RequestException as exc:
-                LOGGER.warning("Cannot complete the Magpie callback url request to [%s] : [%s]", callback_url, exc)
+            call_magpie_callback(callback_url, request)
         else:
             LOGGER.warning("Exception occurred while dispatching event [%s].", event, exc_info=dispatch_exc)
         ax.raise_http(HTTPInternalServerError,
@@ -136,8 +200,34 @@ def post_permission_webhook_view(request: Request) -> AnyResponseType:
         group=group
     )
     LOGGER.debug("Received permission webhook event [%s] for [%s].", event, permission)
+    if user:
+        activate_user_monitors(request, user)
+    # Resources cached by the Magpie handler could be outdated by the modified resource (e.g.: resource newly created).
+    # This is also done by the Celery workers for their own handlers when the event is dispatched asynchronously.
+    invalidate_magpie_resources(resource_id, service_name)
+    if get_webhook_async(request):
+        event_id = dispatch_async(request, PERMISSION_WEBHOOK, event, dict(vars(permission)))
+        return ax.valid_http(HTTPAccepted, content={"event_id": event_id},
+                             detail=s.PermissionWebhook_POST_AcceptedResponseSchema.description)
     if event == ValidOperations.CreateOperation.value:
         dispatch(lambda handler: handler.permission_created(permission=permission))
     else:
         dispatch(lambda handler: handler.permission_deleted(permission=permission))
     return ax.valid_http(HTTPOk, detail=s.PermissionWebhook_POST_OkResponseSchema.description)
+
+
+@s.WebhookEventAPI.get(schema=s.WebhookEvent_GET_RequestSchema, tags=[s.WebhooksTag],
+                       response_schemas=s.WebhookEvent_GET_responses)
+@view_config(route_name=s.WebhookEventAPI.name, request_method="GET")
+def get_webhook_event_view(request: Request) -> AnyResponseType:
+    """
+    Get the progress of a webhook event dispatched asynchronously.
+    """
+    event_id = ar.get_path_param(request, "event_id", http_error=HTTPBadRequest,
+                                 msg_on_fail=s.WebhookEvent_GET_NotFoundResponseSchema.description)
+    event = get_webhook_event_store(request).get_event(event_id)
+    ax.verify_param(event, not_none=True, param_name="event_id", http_error=HTTPNotFound,
+                    msg_on_fail=s.WebhookEvent_GET_NotFoundResponseSchema.description)
+    # the callback url is only used internally to report failures to Magpie
+    data = {key: val for key, val in event.items() if key != "callback_url"}
+    return ax.valid_http(HTTPOk, content={"event": data}, detail=s.WebhookEvent_GET_OkResponseSchema.description)
@@ -11,6 +11,7 @@ from pyramid.router import Router
 from cowbird.config import (
     get_all_configs,
     validate_handlers_config_schema,
+    validate_monitoring_config_schema,
     validate_sync_config,
     validate_sync_perm_config_schema
 )
@@ -48,6 +49,9 @@ def get_app(global_config: Optional[SettingsType] = None, **settings: SettingVal
     if not sync_perm_cfgs:
         LOGGER.warning("No permission mapping configuration found in [%s]", config_path)
 
+    for monitoring_cfg in get_all_configs(config_path, "monitoring", allow_missing=True):
+        validate_monitoring_config_schema(monitoring_cfg)
+
     print_log("Starting Cowbird app...", LOGGER)
     wsgi_app = config.make_wsgi_app()
 
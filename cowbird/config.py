@@ -6,11 +6,13 @@ from typing import Any, Dict, List, Literal, Tuple, Union, cast, overload
 import yaml
 from schema import And, Optional, Or, Regex, Schema
 
+from cowbird.monitoring.observer import MonitorBackend
 from cowbird.typedefs import (
     ConfigDict,
     ConfigResTokenInfo,
     ConfigSegment,
     HandlerConfig,
+    MonitoringConfig,
     SyncPermissionConfig,
     SyncPointConfig
 )
@@ -98,11 +100,20 @@ def get_all_configs(  # type: ignore[misc,unused-ignore]
     ...
 
 
+@overload
+def get_all_configs(  # type: ignore[misc,unused-ignore]
+    path_or_dict: Union[str, ConfigDict],
+    section: Literal["monitoring"],
+    allow_missing: bool = False,
+) -> List[MonitoringConfig]:
+    ...
+
+
 def get_all_configs(  # type: ignore[misc,unused-ignore]
     path_or_dict: Union[str, ConfigDict],
     section: str,
     allow_missing: bool = False,
-) -> List[Union[ConfigDict, Dict[str, HandlerConfig], SyncPointConfig]]:
+) -> List[Union[ConfigDict, Dict[str, HandlerConfig], SyncPointConfig, MonitoringConfig]]:
     """
     Loads all configuration files specified by the path (if a directory), a single configuration (if a file) or directly
     returns the specified dictionary section (if a configuration dictionary).
@@ -168,6 +179,7 @@ def validate_handlers_config_schema(handlers_cfg: Dict[str, HandlerConfig]) -> N
             Optional("priority"): int,
             Optional("url"): str,
             Optional("workspace_dir"): str,
+            Optional("monitor_debounce"): And(Or(int, float), lambda v: v >= 0),
 
             # parameters for specific handlers
             Optional("jupyterhub_user_data_dir"): str_not_empty_validator,
@@ -177,6 +189,18 @@ def validate_handlers_config_schema(handlers_cfg: Dict[str, HandlerConfig]) -> N
             Optional("notebooks_dir_name"): str_not_empty_validator,
             Optional("public_workspace_wps_outputs_subpath"): str_not_empty_validator,
             Optional("user_wps_outputs_dir_name"): str_not_empty_validator,
+            Optional("pool_connections"): And(int, lambda i: i > 0),
+            Optional("pool_maxsize"): And(int, lambda i: i > 0),
+            Optional("pool_block"): bool,
+            Optional("keep_alive"): bool,
+            Optional("user_cache_ttl"): And(Or(int, float), lambda v: v >= 0),
+            Optional("user_cache_size"): And(int, lambda i: i >= 0),
+            Optional("resource_cache_ttl"): And(Or(int, float), lambda v: v >= 0),
+            Optional("resource_cache_size"): And(int, lambda i: i >= 0),
+            Optional("resync_workers"): And(int, lambda i: i > 0),
+            Optional("resync_queue_size"): And(int, lambda i: i > 0),
+            Optional("hardlink_index"): bool,
+            Optional("shapefile_ready_timeout"): And(Or(int, float), lambda v: v >= 0),
         }
     }, ignore_extra_keys=True)
     schema.validate(handlers_cfg)
@@ -201,6 +225,23 @@ def validate_sync_perm_config_schema(sync_cfg: SyncPointConfig) -> None:
     schema.validate(sync_cfg)
 
 
+def validate_monitoring_config_schema(monitoring_cfg: MonitoringConfig) -> None:
+    """
+    Validates the schema of the `monitoring` section found in the config.
+    """
+    backend_validator = Or(*MonitorBackend.values())
+    interval_validator = And(Or(int, float), lambda v: v > 0)
+    schema = Schema({
+        Optional("backend"): backend_validator,
+        Optional("poll_interval"): interval_validator,
+        Optional("poll_max_interval"): interval_validator,
+        Optional("paths"): [
+            {"path": And(str, lambda s: len(s) > 0), "backend": backend_validator}
+        ],
+    })
+    schema.validate(monitoring_cfg)
+
+
 def validate_and_get_resource_info(res_key: str, segments: List[ConfigSegment]) -> ConfigResTokenInfo:
     """
     Validates a resource_key and its related info from the config and returns some resource info relevant to the config
@@ -8,7 +8,15 @@ import pymongo
 from pymongo.database import Database
 
 from cowbird.database.base import DatabaseInterface, StoreSelector
-from cowbird.database.stores import MonitoringStore, StoreInterface
+from cowbird.database.stores import (
+    HardlinkIndexStatusStore,
+    HardlinkIndexStore,
+    MonitorEventJournalStore,
+    MonitorEventStore,
+    MonitoringStore,
+    StoreInterface,
+    WebhookEventStore
+)
 from cowbird.typedefs import JSON, AnySettingsContainer, SettingsType
 from cowbird.utils import get_settings
 
@@ -16,13 +24,30 @@ from cowbird.utils import get_settings
 MongoDB: Optional[Database] = None
 MongodbStores = frozenset([
     MonitoringStore,
+    HardlinkIndexStore,
+    HardlinkIndexStatusStore,
+    WebhookEventStore,
+    MonitorEventStore,
+    MonitorEventJournalStore,
 ])
 
-AnyMongodbStore = Union[MonitoringStore]
+AnyMongodbStore = Union[
+    MonitoringStore,
+    HardlinkIndexStore,
+    HardlinkIndexStatusStore,
+    WebhookEventStore,
+    MonitorEventStore,
+    MonitorEventJournalStore,
+]
 AnyMongodbStoreType = Union[
     StoreSelector,
     AnyMongodbStore,
     Type[MonitoringStore],
+    Type[HardlinkIndexStore],
+    Type[HardlinkIndexStatusStore],
+    Type[WebhookEventStore],
+    Type[MonitorEventStore],
+    Type[MonitorEventJournalStore],
 ]
 
 
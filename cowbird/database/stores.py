@@ -4,12 +4,19 @@ Stores to read/write data to from/to `MongoDB` using pymongo.
 
 import abc
 import logging
-from typing import Any, Dict, List, Tuple
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import pymongo
+from pymongo import DeleteOne, InsertOne
 from pymongo.collection import Collection
 
-from cowbird.monitoring.monitor import Monitor, MonitorException
+from cowbird.monitoring.fsmonitor import FSMonitor
+from cowbird.monitoring.monitor import Monitor, MonitorException, MonitorKey, MonitorParameters
+from cowbird.utils import ExtendedEnum
 
 LOGGER = logging.getLogger(__name__)
 
@@ -77,10 +84,18 @@ class MonitoringStore(StoreInterface, MongodbStore):
         """
         Stores Monitor in `MongoDB` storage.
         """
-        # check if the Monitor is already registered
-        if self.collection.count_documents(monitor.key) > 0:
-            self.collection.delete_one(monitor.key)
-        self.collection.insert_one(monitor.params())
+        self.collection.replace_one(monitor.key, monitor.params(), upsert=True)
+
+    def save_monitors(self, monitors: Iterable[Monitor]) -> None:
+        """
+        Stores many Monitor in `MongoDB` storage with a single request, replacing their previous entries if any.
+        """
+        requests: List[Union[DeleteOne, InsertOne]] = []
+        for monitor in monitors:
+            requests.extend([DeleteOne(monitor.key), InsertOne(monitor.params())])
+        if requests:
+            # ordered, such that each entry is removed before its replacement is inserted
+            self.collection.bulk_write(requests, ordered=True)
 
     def delete_monitor(self, monitor: Monitor) -> None:
         """
@@ -88,21 +103,65 @@ class MonitoringStore(StoreInterface, MongodbStore):
         """
         self.collection.delete_one(monitor.key)
 
-    def list_monitors(self) -> List[Monitor]:
+    def save_watermarks(self, monitor_keys: List[MonitorKey], watermark: float) -> None:
+        """
+        Updates the watermark of many monitors at once.
+        """
+        if monitor_keys:
+            self.collection.update_many({"$or": monitor_keys}, {"$set": {"watermark": watermark}})
+
+    def list_monitors(self, workers: int = 1) -> List[Monitor]:
         """
         Lists all Monitor in `MongoDB` storage.
+
+        Monitors whose path does not exist anymore or whose callback cannot be instantiated are removed from the
+        database with a single request.
+
+        :param workers: Maximum number of threads validating the paths of the monitors. Concurrent threads only help
+                        when each validation waits on a slow file system (e.g.: a network mount), the paths are
+                        otherwise validated faster by the calling thread.
         """
-        monitors = []
-        for mon_params in self.collection.find().sort("callback", pymongo.ASCENDING):
+        projection = {"_id": False, "callback": True, "path": True, "recursive": True, "debounce": True,
+                      "watermark": True}
+        monitors_params: List[MonitorParameters] = list(
+            self.collection.find({}, projection).sort("callback", pymongo.ASCENDING))
+        # callbacks are resolved once for all their monitors, since their instantiation is not thread-safe
+        callbacks: Dict[str, Union[FSMonitor, str, MonitorException]] = {}
+        for callback in {mon_params["callback"] for mon_params in monitors_params}:
             try:
-                monitors.append(Monitor(**{key: val for key, val in mon_params.items() if key != "_id"}))
+                callbacks[callback] = Monitor.get_fsmonitor_instance(callback) or callback
             except MonitorException as exc:
-                LOGGER.warning("Failed to start monitoring the following path [%s] with this monitor [%s] "
-                               "(Will be removed from database) : [%s]",
-                               mon_params["path"],
-                               mon_params["callback"],
-                               exc)
-                self.collection.delete_one(mon_params)
+                callbacks[callback] = exc
+
+        def create_monitor(mon_params: MonitorParameters) -> Union[Monitor, MonitorException]:
+            callback = callbacks[mon_params["callback"]]
+            if isinstance(callback, MonitorException):
+                return callback
+            try:
+                return Monitor(**{**mon_params, "callback": callback})  # type: ignore[arg-type]
+            except MonitorException as exc:
+                return exc
+
+        if workers > 1 and len(monitors_params) > 1:
+            with ThreadPoolExecutor(max_workers=min(workers, len(monitors_params))) as executor:
+                results = list(executor.map(create_monitor, monitors_params))
+        else:
+            results = [create_monitor(mon_params) for mon_params in monitors_params]
+
+        monitors = []
+        invalid_monitors = []
+        for mon_params, result in zip(monitors_params, results):
+            if isinstance(result, Monitor):
+                monitors.append(result)
+                continue
+            LOGGER.warning("Failed to start monitoring the following path [%s] with this monitor [%s] "
+                           "(Will be removed from database) : [%s]",
+                           mon_params["path"],
+                           mon_params["callback"],
+                           result)
+            invalid_monitors.append(DeleteOne({"callback": mon_params["callback"], "path": mon_params["path"]}))
+        if invalid_monitors:
+            self.collection.bulk_write(invalid_monitors)
         return monitors
 
     def clear_services(self, drop: bool = True) -> None:
@@ -113,3 +172,359 @@ class MonitoringStore(StoreInterface, MongodbStore):
             self.collection.drop()
         else:
             self.collection.delete_many({})
+
+
+class HardlinkIndexStore(StoreInterface, MongodbStore):
+    """
+    Index of the hardlinks generated for each WPS outputs file.
+
+    Uses `MongoDB` to store the inode of each source file along with the paths of its hardlinks, such that the hardlinks
+    of a file or of all files under a directory can be retrieved without browsing the file system.
+
+    Since files could exist before being indexed, the index of a directory can only be relied on once it is marked as
+    complete in the :class:`HardlinkIndexStatusStore`, after all of its files were indexed.
+    """
+    type = "hardlinks"
+    index_fields = ["src_path"]
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """
+        Init the store used to save the hardlinks.
+        """
+        db_args, db_kwargs = MongodbStore.get_args_kwargs(*args, **kwargs)
+        StoreInterface.__init__(self)
+        MongodbStore.__init__(self, *db_args, **db_kwargs)
+
+    @staticmethod
+    def _get_subpaths_query(dir_path: str) -> Dict[str, Any]:
+        """
+        Query matching all the paths found under a directory, using an anchored regex that can be resolved with the
+        ``src_path`` index.
+        """
+        return {"src_path": {"$regex": f"^{re.escape(dir_path.rstrip('/'))}/"}}
+
+    def save_hardlink(self, src_path: str, inode: int, links: List[str], user_id: Optional[int] = None) -> None:
+        """
+        Stores the hardlinks of a source file, replacing any previous entry of the same path.
+        """
+        self.collection.replace_one({"src_path": src_path},
+                                    {"src_path": src_path, "inode": inode, "links": links, "user_id": user_id},
+                                    upsert=True)
+
+    def get_hardlink(self, src_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Gets the hardlinks entry of a source file, if any.
+        """
+        return self.collection.find_one({"src_path": src_path}, {"_id": False})
+
+    def list_hardlinks(self, dir_path: str, user_ids: Optional[Iterable[int]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Lists the hardlinks entries of all the source files found under a directory, optionally filtered by users.
+        """
+        query = self._get_subpaths_query(dir_path)
+        if user_ids is not None:
+            query["user_id"] = {"$in": list(user_ids)}
+        return self.collection.find(query, {"_id": False})
+
+    def delete_hardlinks(self, src_path: str) -> List[Dict[str, Any]]:
+        """
+        Removes the hardlinks entries of a source file, or of all files found under a source directory.
+
+        :returns: Removed entries.
+        """
+        query = {"$or": [{"src_path": src_path}, self._get_subpaths_query(src_path)]}
+        entries = list(self.collection.find(query, {"_id": False}))
+        if entries:
+            self.collection.delete_many(query)
+        return entries
+
+    def prune_hardlinks(self, dir_path: str, src_paths: Iterable[str]) -> int:
+        """
+        Removes the hardlinks entries of the files found under a directory that are not part of the known source paths.
+
+        :returns: Number of removed entries.
+        """
+        known_paths = set(src_paths)
+        stale_paths = [entry["src_path"] for entry in self.collection.find(self._get_subpaths_query(dir_path),
+                                                                           {"_id": False, "src_path": True})
+                       if entry["src_path"] not in known_paths]
+        if stale_paths:
+            self.collection.delete_many({"src_path": {"$in": stale_paths}})
+        return len(stale_paths)
+
+    def clear_hardlinks(self) -> None:
+        """
+        Removes all hardlinks entries from `MongoDB` storage.
+        """
+        self.collection.delete_many({})
+
+
+class HardlinkIndexStatusStore(StoreInterface, MongodbStore):
+    """
+    Directories for which all the files are indexed in the :class:`HardlinkIndexStore`.
+    """
+    type = "hardlinks_status"
+    index_fields = ["complete_dir"]
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """
+        Init the store used to save the directories completely indexed.
+        """
+        db_args, db_kwargs = MongodbStore.get_args_kwargs(*args, **kwargs)
+        StoreInterface.__init__(self)
+        MongodbStore.__init__(self, *db_args, **db_kwargs)
+
+    def set_complete(self, dir_path: str, complete: bool = True) -> None:
+        """
+        Marks the index as complete for all the files found under a directory, or marks all directories as incomplete.
+        """
+        if complete:
+            self.collection.replace_one({"complete_dir": dir_path}, {"complete_dir": dir_path}, upsert=True)
+        else:
+            self.collection.delete_many({})
+
+    def is_complete(self, dir_path: str) -> bool:
+        """
+        Indicates if all the files found under a directory are indexed.
+        """
+        return self.collection.count_documents({"complete_dir": dir_path}, limit=1) > 0
+
+
+class MonitorEventStore(StoreInterface, MongodbStore):
+    """
+    Overflow of the file system events queued by the monitoring event dispatcher.
+
+    Uses `MongoDB` to save the events received while the queue of a worker is full, until the worker catches up. Each
+    event is saved with a hash of its path, which defines the worker processing it, and with a sequence number ordering
+    the events of all workers.
+    """
+    type = "monitor_events"
+    index_fields = ["seq"]
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """
+        Init the store used to save the overflowing monitoring events.
+        """
+        db_args, db_kwargs = MongodbStore.get_args_kwargs(*args, **kwargs)
+        StoreInterface.__init__(self)
+        MongodbStore.__init__(self, *db_args, **db_kwargs)
+
+    def get_next_seq(self) -> int:
+        """
+        Gets the sequence number following the one of the last saved event.
+        """
+        last = self.collection.find_one({}, {"_id": False, "seq": True}, sort=[("seq", pymongo.DESCENDING)])
+        return last["seq"] + 1 if last else 0
+
+    def save_event(self,
+                   seq: int,
+                   worker: int,
+                   path_key: int,
+                   callback: str,
+                   monitor_path: str,
+                   path: str,
+                   event_type: str,
+                   journal_seq: Optional[int] = None,
+                   ) -> None:
+        """
+        Stores an event of a monitor, to be processed by a given worker.
+        """
+        self.collection.insert_one({"seq": seq, "worker": worker, "path_key": path_key, "callback": callback,
+                                    "monitor_path": monitor_path, "path": path, "type": event_type,
+                                    "journal_seq": journal_seq})
+
+    def assign_events(self, workers: int) -> None:
+        """
+        Reassigns the saved events to a new number of workers, according to the hash of their path.
+        """
+        for entry in self.collection.find({}, {"_id": False, "seq": True, "worker": True, "path_key": True}):
+            if entry["worker"] != entry["path_key"] % workers:
+                self.collection.update_one({"seq": entry["seq"]}, {"$set": {"worker": entry["path_key"] % workers}})
+
+    def count_events(self, worker: int) -> int:
+        """
+        Counts the events saved for a worker.
+        """
+        return self.collection.count_documents({"worker": worker})
+
+    def pop_events(self, worker: int, limit: int) -> List[Dict[str, Any]]:
+        """
+        Removes the oldest events saved for a worker.
+
+        :returns: Removed events, in the order in which they were saved.
+        """
+        entries = list(self.collection.find({"worker": worker}, {"_id": False}).sort("seq", pymongo.ASCENDING)
+                       .limit(limit))
+        if entries:
+            self.collection.delete_many({"seq": {"$in": [entry["seq"] for entry in entries]}})
+        return entries
+
+    def clear_events(self) -> None:
+        """
+        Removes all events from `MongoDB` storage.
+        """
+        self.collection.delete_many({})
+
+
+class MonitorEventJournalStore(StoreInterface, MongodbStore):
+    """
+    Journal of the file system events received by the monitors.
+
+    Uses `MongoDB` to save each event before it is sent to the callback of its monitor, and to acknowledge it once it
+    was sent, such that the events interrupted by a restart can be replayed. Acknowledged events are kept for a
+    retention delay before being removed by a TTL index.
+    """
+    type = "monitor_journal"
+    index_fields = ["seq"]
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """
+        Init the store used to journal the monitoring events.
+        """
+        db_args, db_kwargs = MongodbStore.get_args_kwargs(*args, **kwargs)
+        StoreInterface.__init__(self)
+        MongodbStore.__init__(self, *db_args, **db_kwargs)
+
+    def set_retention(self, seconds: int) -> None:
+        """
+        Defines the delay after which the acknowledged events are removed.
+        """
+        index_name = "acked_ttl"
+        index = self.collection.index_information().get(index_name)
+        if index and index.get("expireAfterSeconds") != seconds:
+            self.collection.drop_index(index_name)
+        self.collection.create_index("acked", name=index_name, expireAfterSeconds=seconds)
+
+    def get_next_seq(self) -> int:
+        """
+        Gets the sequence number following the one of the last journaled event.
+        """
+        last = self.collection.find_one({}, {"_id": False, "seq": True}, sort=[("seq", pymongo.DESCENDING)])
+        return last["seq"] + 1 if last else 0
+
+    def save_events(self, seqs: List[int], callback: str, monitor_path: str, events: List[Tuple[str, str]]) -> None:
+        """
+        Stores pending events of a monitor.
+
+        :param seqs: Sequence numbers of the events.
+        :param callback: Qualified class name of the callback of the monitor.
+        :param monitor_path: Path of the monitor.
+        :param events: Path and type of each event.
+        """
+        if not events:
+            return
+        self.collection.insert_many([{"seq": seq, "callback": callback, "monitor_path": monitor_path,
+                                      "path": path, "type": event_type}
+                                     for seq, (path, event_type) in zip(seqs, events)], ordered=False)
+
+    def acknowledge_events(self, seqs: List[int]) -> None:
+        """
+        Marks events as sent to their callback.
+        """
+        self.collection.update_many({"seq": {"$in": seqs}}, {"$set": {"acked": datetime.now(timezone.utc)}})
+
+    def list_pending_events(self) -> List[Dict[str, Any]]:
+        """
+        Lists the events that were not acknowledged, in the order in which they were saved.
+        """
+        return list(self.collection.find({"acked": {"$exists": False}}, {"_id": False}).sort("seq", pymongo.ASCENDING))
+
+    def count_pending_events(self) -> int:
+        """
+        Counts the events that were not acknowledged.
+        """
+        return self.collection.count_documents({"acked": {"$exists": False}})
+
+    def clear_events(self) -> None:
+        """
+        Removes all events from `MongoDB` storage.
+        """
+        self.collection.delete_many({})
+
+
+class WebhookEventStatus(ExtendedEnum):
+    """
+    Status of a webhook event dispatched asynchronously, or of its handling by a single handler.
+    """
+    PENDING = "pending"
+    RUNNING = "running"
+    RETRYING = "retrying"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class WebhookEventStore(StoreInterface, MongodbStore):
+    """
+    Registry of the webhook events dispatched asynchronously.
+
+    Uses `MongoDB` to persist the received events and the progress of their handling by each handler.
+    """
+    type = "webhook_events"
+    index_fields = ["event_id"]
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """
+        Init the store used to save webhook events.
+        """
+        db_args, db_kwargs = MongodbStore.get_args_kwargs(*args, **kwargs)
+        StoreInterface.__init__(self)
+        MongodbStore.__init__(self, *db_args, **db_kwargs)
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def save_event(self,
+                   webhook: str,
+                   event: str,
+                   payload: Dict[str, Any],
+                   handlers: List[str],
+                   callback_url: Optional[str] = None,
+                   ) -> str:
+        """
+        Stores a new webhook event, pending for each of the handlers that must handle it.
+
+        :returns: Generated event identifier.
+        """
+        event_id = str(uuid.uuid4())
+        now = self._now()
+        self.collection.insert_one({
+            "event_id": event_id,
+            "webhook": webhook,
+            "event": event,
+            "payload": payload,
+            "callback_url": callback_url,
+            "status": WebhookEventStatus.PENDING.value,
+            "handlers": {name: {"status": WebhookEventStatus.PENDING.value} for name in handlers},
+            "created": now,
+            "updated": now,
+        })
+        return event_id
+
+    def get_event(self, event_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Gets a webhook event, if it exists.
+        """
+        return self.collection.find_one({"event_id": event_id}, {"_id": False})
+
+    def set_event_status(self, event_id: str, status: WebhookEventStatus) -> None:
+        """
+        Updates the overall status of a webhook event.
+        """
+        self.collection.update_one({"event_id": event_id},
+                                   {"$set": {"status": status.value, "updated": self._now()}})
+
+    def set_handler_status(self,
+                           event_id: str,
+                           handler_name: str,
+                           status: WebhookEventStatus,
+                           error: Optional[str] = None,
+                           ) -> None:
+        """
+        Updates the status of the handling of a webhook event by a single handler.
+        """
+        handler_status: Dict[str, Any] = {"status": status.value}
+        if error:
+            handler_status["error"] = error
+        self.collection.update_one({"event_id": event_id},
+                                   {"$set": {f"handlers.{handler_name}": handler_status, "updated": self._now()}})
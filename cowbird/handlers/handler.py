@@ -34,6 +34,7 @@ class Handler(abc.ABC):
                  "name",
                  "ssl_verify",
                  "timeout",
+                 "monitor_debounce",
                  HANDLER_PRIORITY_PARAM,
                  HANDLER_URL_PARAM,
                  HANDLER_WORKSPACE_DIR_PARAM
@@ -60,6 +61,8 @@ class Handler(abc.ABC):
         :param workspace_dir: Workspace directory
         :param priority: Relative priority between handlers while handling events.
                          Lower value has higher priority, default value is last.
+        :param monitor_debounce: Delay in seconds during which the file system events of a same path are coalesced
+                                 before being sent to the handler, if it monitors paths.
         """
         if getattr(self, "required_params", None) is None:
             raise NotImplementedError("Handler 'required_params' must be overridden in inheriting class.")
@@ -68,6 +71,7 @@ class Handler(abc.ABC):
         self.priority = kwargs.get(HANDLER_PRIORITY_PARAM, math.inf)
         self.url = kwargs.get(HANDLER_URL_PARAM, None)
         self.workspace_dir = kwargs.get(HANDLER_WORKSPACE_DIR_PARAM, None)
+        self.monitor_debounce = kwargs.get("monitor_debounce", 0)
         # Handlers making outbound requests should use these settings to avoid SSLError on test/dev setup
         self.ssl_verify = get_ssl_verify(self.settings)
         self.timeout = get_timeout(self.settings)
@@ -94,6 +98,22 @@ class Handler(abc.ABC):
     def user_deleted(self, user_name: str) -> None:
         raise NotImplementedError
 
+    def start_user_monitoring(self, user_name: str) -> None:
+        """
+        Starts monitoring the files of a created user handled by this handler, if any.
+
+        Always called by the web application, the monitoring being unavailable to the `Celery` workers handling the
+        webhook events dispatched asynchronously.
+        """
+
+    def stop_user_monitoring(self, user_name: str) -> None:
+        """
+        Stops monitoring the files of a deleted user handled by this handler, if any.
+
+        Always called by the web application, the monitoring being unavailable to the `Celery` workers handling the
+        webhook events dispatched asynchronously.
+        """
+
     @abc.abstractmethod
     def permission_created(self, permission: Permission) -> None:
         raise NotImplementedError
@@ -103,5 +123,10 @@ class Handler(abc.ABC):
         raise NotImplementedError
 
     @abc.abstractmethod
-    def resync(self) -> None:
+    def resync(self, dry_run: bool = False) -> None:
+        """
+        Resync operation of the handler.
+
+        :param dry_run: Only report the changes required by the operation, without applying them.
+        """
         raise NotImplementedError
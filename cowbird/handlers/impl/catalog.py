@@ -1,3 +1,4 @@
+import os
 from typing import Any, List, Optional
 
 from cowbird.handlers.handler import HANDLER_URL_PARAM, HANDLER_WORKSPACE_DIR_PARAM, AnyHandlerParameter, Handler
@@ -27,10 +28,18 @@ class Catalog(Handler, FSMonitor):
         # TODO: Need to monitor data directory
 
     def user_created(self, user_name: str) -> None:
-        LOGGER.info("Start monitoring workspace of created user [%s]", user_name)
-        Monitoring().register(self._user_workspace_dir(user_name), True, Catalog)
+        pass
 
     def user_deleted(self, user_name: str) -> None:
+        pass
+
+    def start_user_monitoring(self, user_name: str) -> None:
+        # the workspace directory must exist to be monitored, even if the user creation was not handled yet
+        os.makedirs(self._user_workspace_dir(user_name), exist_ok=True)
+        LOGGER.info("Start monitoring workspace of created user [%s]", user_name)
+        Monitoring().register(self._user_workspace_dir(user_name), True, Catalog, debounce=self.monitor_debounce)
+
+    def stop_user_monitoring(self, user_name: str) -> None:
         LOGGER.info("Stop monitoring workspace of removed user [%s]", user_name)
         Monitoring().unregister(self._user_workspace_dir(user_name), self)
 
@@ -72,6 +81,6 @@ class Catalog(Handler, FSMonitor):
         """
         LOGGER.info("The following path [%s] has just been modified", path)
 
-    def resync(self) -> None:
+    def resync(self, dry_run: bool = False) -> None:
         # FIXME: this should be implemented in the eventual task addressing the resync mechanism.
         raise NotImplementedError
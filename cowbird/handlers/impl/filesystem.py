@@ -1,20 +1,26 @@
 import os
 import re
 import shutil
+import stat
+import threading
+import time
+from collections import Counter, defaultdict
 from pathlib import Path
-from typing import Any, List, Tuple, cast
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, cast
 
 from magpie.permissions import Access
 from magpie.permissions import Permission as MagpiePermission
 from magpie.services import ServiceAPI
 
+from cowbird.database import get_db
+from cowbird.database.stores import HardlinkIndexStatusStore, HardlinkIndexStore
 from cowbird.handlers import HandlerFactory
 from cowbird.handlers.handler import HANDLER_WORKSPACE_DIR_PARAM, Handler
-from cowbird.monitoring.fsmonitor import FSMonitor
+from cowbird.monitoring.fsmonitor import FSEvent, FSEventType, FSMonitor
 from cowbird.monitoring.monitoring import Monitoring
 from cowbird.permissions_synchronizer import Permission
 from cowbird.typedefs import JSON, SettingsType
-from cowbird.utils import apply_new_path_permissions, get_logger
+from cowbird.utils import apply_new_path_permissions, get_logger, run_partitioned_tasks, update_filesystem_permissions
 
 LOGGER = get_logger(__name__)
 
@@ -23,6 +29,8 @@ DEFAULT_PUBLIC_WORKSPACE_WPS_OUTPUTS_SUBPATH = "public/wps_outputs"
 DEFAULT_WPS_OUTPUTS_RES_NAME = "wps_outputs"
 DEFAULT_SECURE_DATA_PROXY_NAME = "secure-data-proxy"
 DEFAULT_USER_WPS_OUTPUTS_DIR_NAME = "wps_outputs"
+DEFAULT_RESYNC_WORKERS = 1
+DEFAULT_RESYNC_QUEUE_SIZE = 1000
 
 
 class FileSystem(Handler, FSMonitor):
@@ -41,6 +49,9 @@ class FileSystem(Handler, FSMonitor):
                  notebooks_dir_name: str = DEFAULT_NOTEBOOKS_DIR_NAME,
                  public_workspace_wps_outputs_subpath: str = DEFAULT_PUBLIC_WORKSPACE_WPS_OUTPUTS_SUBPATH,
                  user_wps_outputs_dir_name: str = DEFAULT_USER_WPS_OUTPUTS_DIR_NAME,
+                 resync_workers: int = DEFAULT_RESYNC_WORKERS,
+                 resync_queue_size: int = DEFAULT_RESYNC_QUEUE_SIZE,
+                 hardlink_index: bool = False,
                  **kwargs: Any) -> None:
         """
         Create the file system instance.
@@ -59,6 +70,11 @@ class FileSystem(Handler, FSMonitor):
                                                      outputs data
         :param user_wps_outputs_dir_name: Name of the directory found in the user workspace and which contains the
                                           hardlinks to the user WPS outputs data
+        :param resync_workers: Number of threads used to generate the hardlinks during a resync operation, the files
+                               being processed in the calling thread when a single worker is used
+        :param resync_queue_size: Maximum number of directories of WPS outputs files waiting to be processed during a
+                                  resync operation
+        :param hardlink_index: Keep a persistent index of the WPS outputs files and of their hardlinks in the database
         """
         LOGGER.info("Creating Filesystem handler")
         super(FileSystem, self).__init__(settings, name, **kwargs)
@@ -71,6 +87,12 @@ class FileSystem(Handler, FSMonitor):
         self.notebooks_dir_name = notebooks_dir_name
         self.public_workspace_wps_outputs_subpath = public_workspace_wps_outputs_subpath
         self.user_wps_outputs_dir_name = user_wps_outputs_dir_name
+        self.resync_workers = resync_workers
+        self.resync_queue_size = resync_queue_size
+        self.resync_report: Optional[JSON] = None
+        self.hardlink_index = hardlink_index
+        self._hardlink_store: Optional[HardlinkIndexStore] = None
+        self._hardlink_status_store: Optional[HardlinkIndexStatusStore] = None
 
         # Regex to find any directory or file found in the `users` output path of a 'bird' service
         # {self.wps_outputs_dir}/<wps-bird-name>/users/<user-uuid>/...
@@ -82,7 +104,50 @@ class FileSystem(Handler, FSMonitor):
             LOGGER.warning("Input WPS outputs folder [%s] does not exist. Creating folder...", self.wps_outputs_dir)
             os.makedirs(self.wps_outputs_dir)
         LOGGER.info("Start monitoring WPS outputs folder [%s]", self.wps_outputs_dir)
-        monitoring.register(self.wps_outputs_dir, True, self)
+        monitoring.register(self.wps_outputs_dir, True, self, debounce=self.monitor_debounce)
+
+    @property
+    def hardlink_store(self) -> Optional[HardlinkIndexStore]:
+        """
+        Store indexing the hardlinks of the WPS outputs files, if the index is enabled.
+        """
+        if self.hardlink_index and self._hardlink_store is None:
+            self._hardlink_store = get_db(self.settings).get_store(HardlinkIndexStore)
+        return self._hardlink_store
+
+    @property
+    def hardlink_status_store(self) -> Optional[HardlinkIndexStatusStore]:
+        """
+        Store of the directories whose WPS outputs files are all indexed, if the index is enabled.
+        """
+        if self.hardlink_index and self._hardlink_status_store is None:
+            self._hardlink_status_store = get_db(self.settings).get_store(HardlinkIndexStatusStore)
+        return self._hardlink_status_store
+
+    def _save_hardlink_index(self, src_path: str, hardlink_path: Optional[str]) -> None:
+        """
+        Records the hardlink of a WPS outputs file in the index, or the absence of hardlink if the file is not
+        accessible.
+        """
+        if not self.hardlink_store:
+            return
+        try:
+            inode = os.stat(src_path).st_ino
+        except FileNotFoundError:
+            return
+        regex_match = self.wps_outputs_user_data_regex.search(src_path)
+        user_id = int(regex_match.group("user_id")) if regex_match else None
+        try:
+            self.hardlink_store.save_hardlink(src_path, inode, [hardlink_path] if hardlink_path else [], user_id)
+        except Exception:
+            # The file is missing from the index until the next resync, the directories must be browsed instead
+            LOGGER.error("Failed to index the hardlink of the WPS outputs file [%s], the index will not be used until "
+                         "the next resync.", src_path)
+            try:
+                self.hardlink_status_store.set_complete(self.wps_outputs_dir, complete=False)
+            except Exception as exc:  # noqa
+                LOGGER.error("Failed to mark the hardlinks index as incomplete : [%r]", exc)
+            raise
 
     def get_user_workspace_dir(self, user_name: str) -> str:
         return os.path.join(self.workspace_dir, user_name)
@@ -140,6 +205,9 @@ class FileSystem(Handler, FSMonitor):
         except FileNotFoundError:
             LOGGER.info("User workspace directory not found (skip removal): [%s]", user_workspace_dir)
 
+    def json(self) -> JSON:
+        return {"name": self.name, "resync": self.resync_report}
+
     @staticmethod
     def get_instance() -> "FileSystem":
         """
@@ -159,19 +227,13 @@ class FileSystem(Handler, FSMonitor):
         subpath = os.path.join(bird_name, subpath)
         return os.path.join(self.get_user_workspace_wps_outputs_dir(user_name), subpath)
 
-    def _get_secure_data_proxy_file_perms(self, src_path: str, user_name: str) -> Tuple[bool, bool]:
+    def _find_closest_route_res_id(self, service_resource: JSON, src_path: str) -> Optional[int]:
         """
-        Finds a route from the `secure-data-proxy` service that matches the resource path (or one of its parent
-        resource) and gets the user permissions on that route.
+        Finds the resource id of the `secure-data-proxy` route that matches the path, or of its closest parent route.
         """
-        magpie_handler = HandlerFactory().get_handler("Magpie")
-        sdp_svc_info = magpie_handler.get_service_info(self.secure_data_proxy_name)
-        # Find the closest related route resource
         expected_route = re.sub(rf"^{self.wps_outputs_dir}", self.wps_outputs_res_name, src_path)
-
-        # Finds the resource id of the route or the closest matching parent route.
         closest_res_id = None
-        resource = magpie_handler.get_resource(cast(int, sdp_svc_info["resource_id"]))
+        resource = service_resource
         for segment in expected_route.split("/"):
             child_res_id = None
             for child in resource["children"].values():
@@ -182,24 +244,56 @@ class FileSystem(Handler, FSMonitor):
             if not child_res_id:
                 break
             closest_res_id = child_res_id
+        return closest_res_id
 
-        if not closest_res_id:
-            # No resource corresponds to the expected route or one of its parent route.
-            # Assume access is not allowed.
-            is_readable = False
-            is_writable = False
-        else:
-            # Resolve permissions
-            res_perms = magpie_handler.get_user_permissions_by_res_id(user=user_name,
-                                                                      res_id=closest_res_id,
-                                                                      effective=True)["permissions"]
-            read_access = [perm["access"] for perm in res_perms
-                           if perm["name"] == MagpiePermission.READ.value][0]
-            write_access = [perm["access"] for perm in res_perms
-                            if perm["name"] == MagpiePermission.WRITE.value][0]
-            is_readable = read_access == Access.ALLOW.value
-            is_writable = write_access == Access.ALLOW.value
-        return is_readable, is_writable
+    def resolve_secure_data_proxy_perms(self,
+                                        user_paths: Iterable[Tuple[str, str]],
+                                        ) -> Dict[Tuple[str, str], Tuple[bool, bool]]:
+        """
+        Resolves the permissions of a batch of paths for their user, from the routes of the `secure-data-proxy` service.
+
+        Paths are grouped by their closest matching route resource, such that the effective permissions are only
+        requested once for each distinct user and resource.
+
+        :param user_paths: Pairs of user name and path for which to resolve the permissions.
+        :returns: Readable and writable permissions, for each pair of user name and path.
+        """
+        magpie_handler = HandlerFactory().get_handler("Magpie")
+        sdp_svc_info = magpie_handler.get_service_info(self.secure_data_proxy_name)
+        resource = magpie_handler.get_resource(cast(int, sdp_svc_info["resource_id"]))
+
+        paths_by_user_res: Dict[Tuple[str, Optional[int]], List[Tuple[str, str]]] = defaultdict(list)
+        for user_name, src_path in user_paths:
+            closest_res_id = self._find_closest_route_res_id(resource, src_path)
+            paths_by_user_res[(user_name, closest_res_id)].append((user_name, src_path))
+
+        resolved_perms = {}
+        for (user_name, res_id), user_res_paths in paths_by_user_res.items():
+            if not res_id:
+                # No resource corresponds to the expected route or one of its parent route.
+                # Assume access is not allowed.
+                is_readable = False
+                is_writable = False
+            else:
+                res_perms = magpie_handler.get_user_permissions_by_res_id(user=user_name,
+                                                                          res_id=res_id,
+                                                                          effective=True)["permissions"]
+                read_access = [perm["access"] for perm in res_perms
+                               if perm["name"] == MagpiePermission.READ.value][0]
+                write_access = [perm["access"] for perm in res_perms
+                                if perm["name"] == MagpiePermission.WRITE.value][0]
+                is_readable = read_access == Access.ALLOW.value
+                is_writable = write_access == Access.ALLOW.value
+            for user_path in user_res_paths:
+                resolved_perms[user_path] = (is_readable, is_writable)
+        return resolved_perms
+
+    def _get_secure_data_proxy_file_perms(self, src_path: str, user_name: str) -> Tuple[bool, bool]:
+        """
+        Finds a route from the `secure-data-proxy` service that matches the resource path (or one of its parent
+        resource) and gets the user permissions on that route.
+        """
+        return self.resolve_secure_data_proxy_perms([(user_name, src_path)])[(user_name, src_path)]
 
     def update_secure_data_proxy_path_perms(self, src_path: str, user_name: str) -> bool:
         """
@@ -208,19 +302,33 @@ class FileSystem(Handler, FSMonitor):
 
         Returns a boolean to indicate if the user should have some type of access to the path or not.
         """
-        is_readable, is_writable = self._get_secure_data_proxy_file_perms(src_path, user_name)
+        return self.update_secure_data_proxy_paths_perms([(user_name, src_path)])[(user_name, src_path)]
 
-        if is_writable:
-            LOGGER.warning("Found enabled `write` permissions from the `%s` service for the path `%s` and user `%s`. "
-                           "Write permissions will be ignored and will not be added to the path to prevent "
-                           "modifications on WPS outputs data.",
-                           self.secure_data_proxy_name, src_path, user_name)
-
-        # Files do not require the `executable` permission and must not be writable to prevent changing wps outputs data
-        apply_new_path_permissions(src_path, is_readable, is_writable=False, is_executable=False)
+    def update_secure_data_proxy_paths_perms(self,
+                                             user_paths: Iterable[Tuple[str, str]],
+                                             ) -> Dict[Tuple[str, str], bool]:
+        """
+        Batch version of :meth:`update_secure_data_proxy_path_perms`, resolving the permissions of all paths at once.
 
-        # Return read permissions to indicate if access is allowed and if the hardlink should be created.
-        return is_readable
+        Returns a boolean for each pair of user name and path, to indicate if the user should have some type of access
+        to the path or not.
+        """
+        accesses = {}
+        resolved_perms = self.resolve_secure_data_proxy_perms(user_paths)
+        for (user_name, src_path), (is_readable, is_writable) in resolved_perms.items():
+            if is_writable:
+                LOGGER.warning("Found enabled `write` permissions from the `%s` service for the path `%s` and user "
+                               "`%s`. Write permissions will be ignored and will not be added to the path to prevent "
+                               "modifications on WPS outputs data.",
+                               self.secure_data_proxy_name, src_path, user_name)
+
+            # Files do not require the `executable` permission and must not be writable to prevent changing wps
+            # outputs data
+            apply_new_path_permissions(src_path, is_readable, is_writable=False, is_executable=False)
+
+            # Return read permissions to indicate if access is allowed and if the hardlink should be created.
+            accesses[(user_name, src_path)] = is_readable
+        return accesses
 
     @staticmethod
     def create_hardlink_path(src_path: str, hardlink_path: str, access_allowed: bool) -> None:
@@ -270,7 +378,12 @@ class FileSystem(Handler, FSMonitor):
             if not process_public_files:
                 return
             hardlink_path = self._get_public_hardlink(src_path)
+        self._link_wps_outputs_file(src_path, hardlink_path, access_allowed, overwrite)
 
+    def _link_wps_outputs_file(self, src_path: str, hardlink_path: str, access_allowed: bool, overwrite: bool) -> None:
+        """
+        Creates the hardlink of a WPS outputs file once its access was resolved, replacing any existing path.
+        """
         if os.path.exists(hardlink_path):
             if not overwrite and access_allowed:
                 # Hardlink already exists, nothing to do.
@@ -281,6 +394,86 @@ class FileSystem(Handler, FSMonitor):
             os.remove(hardlink_path)
 
         self.create_hardlink_path(src_path, hardlink_path, access_allowed)
+        self._save_hardlink_index(src_path, hardlink_path if access_allowed else None)
+
+    def _create_wps_outputs_hardlinks(self, src_paths: List[str], overwrite: bool = False) -> None:
+        """
+        Batch version of :meth:`_create_wps_outputs_hardlink`, creating the hardlinks of many WPS outputs files.
+
+        The user name of each distinct user id is only resolved once, and the permissions of all user files are
+        resolved together, such that the files of a same user and output directory only require a single permissions
+        request. An error for a file is logged without preventing the creation of the other hardlinks.
+        """
+        magpie_handler = HandlerFactory().get_handler("Magpie")
+        user_names: Dict[int, str] = {}
+        user_files: List[Tuple[str, str, str]] = []
+        for src_path in src_paths:
+            try:
+                regex_match = self.wps_outputs_user_data_regex.search(src_path)
+                if not regex_match:  # public files
+                    self._link_wps_outputs_file(src_path, self._get_public_hardlink(src_path), True, overwrite)
+                    continue
+                user_id = int(regex_match.group("user_id"))
+                if user_id not in user_names:
+                    user_names[user_id] = magpie_handler.get_user_name_from_user_id(user_id)
+                hardlink_path = self.get_user_hardlink(src_path=src_path,
+                                                       bird_name=regex_match.group("bird_name"),
+                                                       user_name=user_names[user_id],
+                                                       subpath=regex_match.group("subpath"))
+                user_files.append((src_path, user_names[user_id], hardlink_path))
+            except Exception as exc:  # noqa
+                LOGGER.error("Failed to create the hardlink of the WPS outputs file [%s] : [%r]", src_path, exc)
+        if not user_files:
+            return
+
+        api_services = magpie_handler.get_services_by_type(ServiceAPI.service_type)
+        if self.secure_data_proxy_name not in api_services:
+            LOGGER.warning("`%s` service not found. Considering user WPS outputs data as accessible (read-only) "
+                           "by default.", self.secure_data_proxy_name)
+            accesses = {}
+            for src_path, user_name, _ in user_files:
+                apply_new_path_permissions(src_path, True, False, False)
+                accesses[(user_name, src_path)] = True
+        else:  # get access and apply permissions if the secure-data-proxy exists
+            accesses = self.update_secure_data_proxy_paths_perms(
+                [(user_name, src_path) for src_path, user_name, _ in user_files])
+        for src_path, user_name, hardlink_path in user_files:
+            try:
+                self._link_wps_outputs_file(src_path, hardlink_path, accesses[(user_name, src_path)], overwrite)
+            except Exception as exc:  # noqa
+                LOGGER.error("Failed to create the hardlink of the WPS outputs file [%s] : [%r]", src_path, exc)
+
+    def _is_wps_outputs_file(self, path: str) -> bool:
+        return not os.path.isdir(path) and Path(self.wps_outputs_dir) in Path(path).parents
+
+    def on_events(self, events: List[FSEvent]) -> None:
+        """
+        Called with a batch of events, ordered as they occurred.
+
+        Consecutive creations of WPS outputs files are processed together, to share the requests resolving the users and
+        permissions of the files. Modifications are ignored, as for :meth:`on_modified`.
+        """
+        created: List[str] = []
+        modified = 0
+        for event in events:
+            if event.type == FSEventType.CREATED and self._is_wps_outputs_file(event.path):
+                created.append(event.path)
+                continue
+            if created:
+                LOGGER.info("Creating hardlinks for [%s] new file paths", len(created))
+                self._create_wps_outputs_hardlinks(created, overwrite=True)
+                created = []
+            if event.type == FSEventType.MODIFIED:
+                LOGGER.debug("Modification event detected on path [%s]. Event ignored.", event.path)
+                modified += 1
+            else:
+                super().on_events([event])
+        if created:
+            LOGGER.info("Creating hardlinks for [%s] new file paths", len(created))
+            self._create_wps_outputs_hardlinks(created, overwrite=True)
+        if modified:
+            LOGGER.warning("Modification events detected on [%s] paths. Events ignored as there is nothing to be done "
+                           "by the handler.", modified)
 
     def on_created(self, path: str) -> None:
         """
@@ -288,7 +481,7 @@ class FileSystem(Handler, FSMonitor):
 
         :param path: Absolute path of a new file/directory
         """
-        if not os.path.isdir(path) and Path(self.wps_outputs_dir) in Path(path).parents:
+        if self._is_wps_outputs_file(path):
             # Only process files, since hardlinks are not permitted on directories
             LOGGER.info("Creating hardlink for the new file path `%s`", path)
             self._create_wps_outputs_hardlink(src_path=path, overwrite=True)
@@ -313,6 +506,17 @@ class FileSystem(Handler, FSMonitor):
 
         Returns a bool to indicate if a hardlink path was deleted or not.
         """
+        if self.hardlink_store:
+            entries = self.hardlink_store.delete_hardlinks(src_path)
+            if len(entries) == 1 and entries[0]["src_path"] == src_path:
+                # Deleted file found in the index, no need to resolve the user of its hardlink.
+                for linked_path in entries[0]["links"]:
+                    try:
+                        os.remove(linked_path)
+                    except FileNotFoundError:
+                        LOGGER.debug("Indexed hardlink `%s` of the wpsoutput path `%s` was already deleted.",
+                                     linked_path, src_path)
+                return bool(entries[0]["links"])
         regex_match = self.wps_outputs_user_data_regex.search(src_path)
         try:
             if regex_match:  # user paths
@@ -399,6 +603,10 @@ class FileSystem(Handler, FSMonitor):
                 regex_match = self.wps_outputs_user_data_regex.search(full_route)
                 if regex_match and int(regex_match.group("user_id")) in users:
                     user_routes[full_route] = regex_match
+            elif self.hardlink_store and self.hardlink_status_store.is_complete(self.wps_outputs_dir):
+                # dir case, find all children user file paths from the index, if all files were indexed
+                for entry in self.hardlink_store.list_hardlinks(full_route, user_ids=users):
+                    user_routes[entry["src_path"]] = self.wps_outputs_user_data_regex.search(entry["src_path"])
             else:  # dir case, browse to find all children user file paths
                 for root, _, filenames in os.walk(full_route):
                     for file in filenames:
@@ -407,10 +615,14 @@ class FileSystem(Handler, FSMonitor):
                         if regex_match and int(regex_match.group("user_id")) in users:
                             user_routes[full_path] = regex_match
 
-            # Update permissions for all found user paths
+            # Update permissions for all found user paths, resolving the permissions of all paths at once
+            user_names = {user_path: users[int(path_regex_match.group("user_id"))]
+                          for user_path, path_regex_match in user_routes.items()}
+            accesses = self.update_secure_data_proxy_paths_perms(
+                [(user_name, user_path) for user_path, user_name in user_names.items()])
             for user_path, path_regex_match in user_routes.items():
-                user_name = users[int(path_regex_match.group("user_id"))]
-                access_allowed = self.update_secure_data_proxy_path_perms(user_path, user_name)
+                user_name = user_names[user_path]
+                access_allowed = accesses[(user_name, user_path)]
                 try:
                     hardlink_path = self.get_user_hardlink(src_path=user_path,
                                                            bird_name=path_regex_match.group("bird_name"),
@@ -426,6 +638,7 @@ class FileSystem(Handler, FSMonitor):
                 if os.path.exists(hardlink_path):
                     os.remove(hardlink_path)
                 self.create_hardlink_path(user_path, hardlink_path, access_allowed)
+                self._save_hardlink_index(user_path, hardlink_path if access_allowed else None)
 
     def permission_created(self, permission: Permission) -> None:
         self._update_permissions_on_filesystem(permission)
@@ -433,41 +646,278 @@ class FileSystem(Handler, FSMonitor):
     def permission_deleted(self, permission: Permission) -> None:
         self._update_permissions_on_filesystem(permission)
 
-    def resync(self) -> None:
+    def _get_wps_outputs_partition(self, src_path: str) -> Tuple[str, ...]:
+        """
+        Partition of a WPS outputs file, grouping the files of a same bird and user whose hardlinks share directories.
+        """
+        regex_match = self.wps_outputs_user_data_regex.search(src_path)
+        if regex_match:
+            return regex_match.group("bird_name"), regex_match.group("user_id")
+        subpath = os.path.relpath(src_path, self.wps_outputs_dir).split(os.sep)
+        return (subpath[0] if len(subpath) > 1 else "",)
+
+    def _iter_wps_outputs_files(self) -> Iterator[Tuple[Tuple[str, ...], List[str]]]:
+        """
+        Walks the WPS outputs directory, yielding the file paths of each directory along with their partition.
+
+        All files of a same directory share the partition of their bird and user.
+        """
+        for root, _, filenames in os.walk(self.wps_outputs_dir):
+            if filenames:
+                full_paths = [os.path.join(root, file) for file in filenames]
+                yield self._get_wps_outputs_partition(full_paths[0]), full_paths
+
+    def _resolve_wps_outputs_files_perms(self, src_paths: List[str]) -> Dict[str, Tuple[bool, bool]]:
+        """
+        Resolves the `secure-data-proxy` permissions of a batch of WPS outputs files with
+        :meth:`resolve_secure_data_proxy_perms`, such that the files of a same user and directory only require a single
+        permissions request.
+
+        :returns: Readable and writable permissions by path, for the user files only, or no permissions at all if the
+                  `secure-data-proxy` service does not exist.
+        """
+        magpie_handler = HandlerFactory().get_handler("Magpie")
+        api_services = magpie_handler.get_services_by_type(ServiceAPI.service_type)
+        if self.secure_data_proxy_name not in api_services:
+            return {}
+        user_names: Dict[int, str] = {}
+        user_paths = []
+        for src_path in src_paths:
+            regex_match = self.wps_outputs_user_data_regex.search(src_path)
+            if regex_match:
+                user_id = int(regex_match.group("user_id"))
+                if user_id not in user_names:
+                    user_names[user_id] = magpie_handler.get_user_name_from_user_id(user_id)
+                user_paths.append((user_names[user_id], src_path))
+        resolved_perms = self.resolve_secure_data_proxy_perms(user_paths)
+        return {src_path: perms for (_, src_path), perms in resolved_perms.items()}
+
+    def _reconcile_wps_outputs_file_perms(self, src_path: str, is_readable: bool, dry_run: bool) -> bool:
+        """
+        Applies the expected permissions on a user WPS outputs file.
+
+        Returns a boolean to indicate if the permissions of the file needed to be changed.
+        """
+        previous_perms = os.stat(src_path)[stat.ST_MODE] & 0o777
+        new_perms = update_filesystem_permissions(previous_perms, is_readable=is_readable,
+                                                  is_writable=False, is_executable=False)
+        if not dry_run:
+            apply_new_path_permissions(src_path, is_readable, is_writable=False, is_executable=False)
+        return new_perms != previous_perms
+
+    def _reconcile_wps_outputs_hardlink(self,
+                                        src_path: str,
+                                        dry_run: bool = False,
+                                        file_perms: Optional[Tuple[bool, bool]] = None,
+                                        ) -> Tuple[Optional[str], List[str]]:
+        """
+        Compares the hardlink expected for a WPS outputs file with the one found in the workspace, and only applies the
+        required changes.
+
+        :param src_path: WPS outputs file for which to reconcile the hardlink.
+        :param dry_run: Only find the required changes, without applying them.
+        :param file_perms: Readable and writable permissions of the user file if already resolved by batch, see
+                           :meth:`_resolve_wps_outputs_files_perms`.
+        :returns: Expected hardlink path, or ``None`` if the file is not accessible, and the list of changes required
+                  among ``created``, ``replaced``, ``removed`` and ``chmod``.
+        """
+        changes = []
+        access_allowed = True
+        regex_match = self.wps_outputs_user_data_regex.search(src_path)
+        if regex_match:  # user files
+            magpie_handler = HandlerFactory().get_handler("Magpie")
+            user_name = magpie_handler.get_user_name_from_user_id(int(regex_match.group("user_id")))
+            hardlink_path = self.get_user_hardlink(src_path=src_path,
+                                                   bird_name=regex_match.group("bird_name"),
+                                                   user_name=user_name,
+                                                   subpath=regex_match.group("subpath"))
+            if file_perms is None:
+                api_services = magpie_handler.get_services_by_type(ServiceAPI.service_type)
+                if self.secure_data_proxy_name in api_services:
+                    file_perms = self._get_secure_data_proxy_file_perms(src_path, user_name)
+            if file_perms is not None:
+                access_allowed, is_writable = file_perms
+                if is_writable:
+                    LOGGER.warning("Found enabled `write` permissions from the `%s` service for the path `%s` and "
+                                   "user `%s`. Write permissions will be ignored and will not be added to the path to "
+                                   "prevent modifications on WPS outputs data.",
+                                   self.secure_data_proxy_name, src_path, user_name)
+            if self._reconcile_wps_outputs_file_perms(src_path, access_allowed, dry_run):
+                changes.append("chmod")
+        else:  # public files
+            hardlink_path = self._get_public_hardlink(src_path)
+
+        try:
+            hardlink_stat: Optional[os.stat_result] = os.lstat(hardlink_path)
+        except FileNotFoundError:
+            hardlink_stat = None
+
+        if not access_allowed:
+            if hardlink_stat:
+                changes.append("removed")
+                if not dry_run:
+                    LOGGER.info("Removing hardlink `%s` to a WPS output file not accessible anymore.", hardlink_path)
+                    os.remove(hardlink_path)
+            return None, changes
+
+        if hardlink_stat and os.path.samestat(hardlink_stat, os.stat(src_path)):
+            return hardlink_path, changes  # hardlink already up-to-date
+        changes.append("replaced" if hardlink_stat else "created")
+        if not dry_run:
+            if hardlink_stat:
+                LOGGER.warning("Replacing existing path at `%s` that is not a hardlink to the WPS output file `%s`.",
+                               hardlink_path, src_path)
+                if stat.S_ISDIR(hardlink_stat.st_mode):
+                    shutil.rmtree(hardlink_path)
+                else:
+                    os.remove(hardlink_path)
+            self.create_hardlink_path(src_path, hardlink_path, access_allowed=True)
+        return hardlink_path, changes
+
+    def _prune_wps_outputs_hardlinks(self, dir_path: str, expected_paths: Set[str], expected_dirs: Set[str],
+                                     dry_run: bool = False) -> int:
+        """
+        Removes any file or directory found under a directory of WPS outputs hardlinks, which does not correspond to or
+        contain an expected hardlink.
+
+        :returns: Number of paths removed.
+        """
+        removed = 0
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.path in expected_dirs:
+                        removed += self._prune_wps_outputs_hardlinks(entry.path, expected_paths, expected_dirs,
+                                                                     dry_run)
+                        continue
+                    removed += 1
+                    if not dry_run:
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                elif entry.path not in expected_paths:
+                    removed += 1
+                    if not dry_run:
+                        os.remove(entry.path)
+        return removed
+
+    def _iter_wps_outputs_hardlinks_dirs(self) -> Iterator[str]:
+        """
+        Iterates over the existing directories that contain the hardlinks to the WPS outputs files.
+        """
+        public_workspace_wps_outputs_dir = self.get_public_workspace_wps_outputs_dir()
+        if os.path.isdir(public_workspace_wps_outputs_dir):
+            yield public_workspace_wps_outputs_dir
+        else:
+            LOGGER.debug("Linked public wps outputs data folder [%s] does not exist. "
+                         "No public file to delete for the resync operation.", public_workspace_wps_outputs_dir)
+        for user_name in HandlerFactory().get_handler("Magpie").get_user_list():
+            user_wps_outputs_dir = self.get_user_workspace_wps_outputs_dir(user_name)
+            if os.path.isdir(user_wps_outputs_dir):
+                yield user_wps_outputs_dir
+
+    def resync(self, dry_run: bool = False) -> None:
         """
         Resync operation, regenerating required links (user_workspace, wps_outputs, ...)
+
+        The hardlinks expected from the WPS outputs files are compared with the ones found in the workspaces, and only
+        the missing, invalid or extraneous hardlinks and the file permissions that differ are modified. Existing
+        hardlinks that are still valid are left untouched.
+
+        Hardlinks are reconciled by directory, resolving the permissions of the files of a directory at once, and can be
+        reconciled by a pool of threads, where the files of a same bird and user are always processed by the same
+        thread. A report of the operation, with the number of changes, its throughput and the duration of each
+        phase, is logged and made available in the handler details.
+
+        :param dry_run: Only report the number of changes required, without applying them.
         """
-        LOGGER.info("Applying resync operation.")
+        LOGGER.info("Applying resync operation%s.", " (dry-run)" if dry_run else "")
         if not os.path.exists(self.wps_outputs_dir):
             LOGGER.warning("Skipping resync operation for WPS outputs folder since the source folder `%s` could not be "
                            "found", self.wps_outputs_dir)
         else:
-            # Delete the content of the linked public folder, but keep the folder to avoid breaking the volume
-            # if the folder is mounted on a Docker container
-            public_workspace_wps_outputs_dir = self.get_public_workspace_wps_outputs_dir()
-            if not os.path.exists(public_workspace_wps_outputs_dir):
-                LOGGER.debug("Linked public wps outputs data folder [%s] does not exist. "
-                             "No public file to delete for the resync operation.", public_workspace_wps_outputs_dir)
-            else:
-                for filename in os.listdir(public_workspace_wps_outputs_dir):
-                    file_path = os.path.join(public_workspace_wps_outputs_dir, filename)
+            phases = {}
+            changes: Counter[str] = Counter()
+            expected_paths: Set[str] = set()
+            expected_dirs: Set[str] = set()
+            src_paths: Set[str] = set()
+            errors: List[Exception] = []
+            results_lock = threading.Lock()
+            resync_start = phase_start = time.perf_counter()
+            # Resolve the existing hardlink directories first
+            hardlinks_dirs = list(self._iter_wps_outputs_hardlinks_dirs())
+
+            def reconcile(dir_src_paths: List[str]) -> None:
+                try:
+                    files_perms = self._resolve_wps_outputs_files_perms(dir_src_paths)
+                except Exception as exc:  # noqa
+                    # Resolve the permissions of each file instead, to report the errors of each file
+                    LOGGER.warning("Failed to resolve the permissions of the WPS outputs files of the directory [%s] : "
+                                   "[%r]", os.path.dirname(dir_src_paths[0]), exc)
+                    files_perms = {}
+                for src_path in dir_src_paths:
                     try:
-                        if os.path.isfile(file_path):
-                            os.remove(file_path)
-                        elif os.path.isdir(file_path):
-                            shutil.rmtree(file_path)
-                    except Exception as exc:
-                        LOGGER.error("Failed to delete path [%s].", file_path, exc_info=exc)
-
-            # Delete wps outputs hardlinks for each user
-            user_list = HandlerFactory().get_handler("Magpie").get_user_list()
-            for user_name in user_list:
-                shutil.rmtree(self.get_user_workspace_wps_outputs_dir(user_name), ignore_errors=True)
-
-            # Create all hardlinks from files of the current source folder
-            for root, _, filenames in os.walk(self.wps_outputs_dir):
-                for file in filenames:
-                    full_path = os.path.join(root, file)
-                    self._create_wps_outputs_hardlink(src_path=full_path, overwrite=True)
+                        hardlink_path, file_changes = self._reconcile_wps_outputs_hardlink(
+                            src_path, dry_run=dry_run, file_perms=files_perms.get(src_path))
+                        if not dry_run:
+                            self._save_hardlink_index(src_path, hardlink_path)
+                    except Exception as exc:  # noqa
+                        with results_lock:
+                            errors.append(exc)
+                            src_paths.add(src_path)
+                        continue
+                    with results_lock:
+                        changes.update(file_changes)
+                        src_paths.add(src_path)
+                        if hardlink_path:
+                            expected_paths.add(hardlink_path)
+                            parent_dir = os.path.dirname(hardlink_path)
+                            while parent_dir not in expected_dirs and parent_dir != os.path.dirname(parent_dir):
+                                expected_dirs.add(parent_dir)
+                                parent_dir = os.path.dirname(parent_dir)
+
+            # Create or update the hardlinks from the files of the current source folder, by directory
+            _, dir_errors = run_partitioned_tasks(self._iter_wps_outputs_files(), reconcile,
+                                                  workers=self.resync_workers,
+                                                  queue_size=self.resync_queue_size)
+            errors.extend(dir_errors)
+            file_count = len(src_paths)
+            phases["hardlinks"] = time.perf_counter() - phase_start
+
+            # Remove any remaining path that does not correspond to an expected hardlink
+            phase_start = time.perf_counter()
+            if errors:
+                # An expected hardlink could be missing from the failed files, keep everything to avoid data loss.
+                LOGGER.warning("Skipping removal of extraneous hardlinks since %s WPS outputs files failed to resync.",
+                               len(errors))
+            else:
+                for hardlinks_dir in hardlinks_dirs:
+                    changes["removed"] += self._prune_wps_outputs_hardlinks(hardlinks_dir, expected_paths,
+                                                                            expected_dirs, dry_run)
+                if self.hardlink_store and not dry_run:
+                    # Remove the index entries of the source files that do not exist anymore
+                    self.hardlink_store.prune_hardlinks(self.wps_outputs_dir, src_paths)
+                    # All existing files were indexed, the index can be used instead of browsing the directories
+                    self.hardlink_status_store.set_complete(self.wps_outputs_dir)
+            phases["prune"] = time.perf_counter() - phase_start
+
+            duration = time.perf_counter() - resync_start
+            diff = {change: changes[change] for change in ["created", "replaced", "removed", "chmod"]}
+            self.resync_report = {
+                "dry_run": dry_run,
+                "files": file_count,
+                "errors": len(errors),
+                "diff": diff,
+                "duration": duration,
+                "files_per_second": file_count / phases["hardlinks"] if phases["hardlinks"] else 0.0,
+                "phases": phases,
+            }
+            LOGGER.info("Resync of WPS outputs %s %s changes for %s files in %.3fs (%.1f files/s) with %s errors "
+                        "[created: %s, replaced: %s, removed: %s, chmod: %s] [hardlinks: %.3fs, prune: %.3fs].",
+                        "found" if dry_run else "applied", sum(diff.values()), file_count, duration,
+                        self.resync_report["files_per_second"], len(errors), diff["created"], diff["replaced"],
+                        diff["removed"], diff["chmod"], phases["hardlinks"], phases["prune"])
+            if errors:
+                for error in errors:
+                    LOGGER.error("Failed to resync a WPS outputs file : [%r]", error)
+                raise errors[0]
         # TODO: add resync of the user_workspace symlinks to the jupyterhub dirs,
         #   will be added during the resync task implementation
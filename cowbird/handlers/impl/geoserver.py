@@ -2,24 +2,33 @@ import functools
 import os
 import re
 import stat
-from time import sleep
-from typing import Any, List, Optional, Protocol, Tuple, Union, cast, overload
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Protocol, Set, Tuple, TypedDict, Union, cast, overload
 from typing_extensions import TypeAlias
 
 import requests
 from celery import Task, chain, shared_task
+from celery.utils.time import get_exponential_backoff_interval
 from magpie.models import Layer, Workspace
 from magpie.permissions import Access, Scope
 
 from cowbird.handlers.handler import HANDLER_URL_PARAM, HANDLER_WORKSPACE_DIR_PARAM, Handler
 from cowbird.handlers.handler_factory import HandlerFactory
 from cowbird.handlers.impl.magpie import GEOSERVER_READ_PERMISSIONS, GEOSERVER_WRITE_PERMISSIONS
-from cowbird.monitoring.fsmonitor import FSMonitor
+from cowbird.monitoring.fsmonitor import FSEvent, FSEventType, FSMonitor
 from cowbird.monitoring.monitoring import Monitoring
 from cowbird.permissions_synchronizer import Permission
 from cowbird.request_task import RequestTask
 from cowbird.typedefs import JSON, SettingsType
-from cowbird.utils import CONTENT_TYPE_JSON, apply_default_path_ownership, apply_new_path_permissions, get_logger
+from cowbird.utils import (
+    CONTENT_TYPE_JSON,
+    HTTPSessionPool,
+    LatencyHistogram,
+    apply_default_path_ownership,
+    apply_new_path_permissions,
+    get_logger
+)
 
 GeoserverType: TypeAlias = "Geoserver"  # need a reference for the decorator before it gets defined
 
@@ -58,10 +67,21 @@ class GeoserverFuncSupportsShapefile(Protocol):
         ...
 
 
+class GeoserverFuncSupportsFeatureTypes(Protocol):
+    def __call__(  # type: ignore[misc]
+        self: GeoserverType,
+        *,
+        workspace_name: str,
+        datastore_name: str,
+    ) -> requests.Response:
+        ...
+
+
 GeoserverFunc = Union[
     GeoserverFuncSupportsWorkspace,
     GeoserverFuncSupportsDatastore,
     GeoserverFuncSupportsShapefile,
+    GeoserverFuncSupportsFeatureTypes,
 ]
 
 SHAPEFILE_MAIN_EXTENSION = ".shp"
@@ -71,6 +91,13 @@ SHAPEFILE_ALL_EXTENSIONS = SHAPEFILE_OPTIONAL_EXTENSIONS + SHAPEFILE_REQUIRED_EX
 
 DEFAULT_DATASTORE_DIR_NAME = "shapefile_datastore"
 
+# Delay in seconds after which a new shapefile still missing some required files is reported and no longer tracked
+DEFAULT_SHAPEFILE_READY_TIMEOUT = 300
+
+# Delay in seconds during which the events of the datastores are collected in a same batch, such that the shapefiles
+# extracted together are published together
+DEFAULT_MONITOR_DEBOUNCE = 2
+
 LOGGER = get_logger(__name__)
 
 
@@ -89,10 +116,19 @@ def geoserver_response_handling(func: GeoserverFuncSupportsShapefile) -> Geoserv
     ...
 
 
+@overload
+def geoserver_response_handling(func: GeoserverFuncSupportsFeatureTypes) -> GeoserverFuncSupportsFeatureTypes:
+    ...
+
+
 def geoserver_response_handling(func: GeoserverFunc) -> GeoserverFunc:
     """
     Decorator for response and logging handling for the different Geoserver HTTP requests.
 
+    The latency of each request is recorded in the histogram of its operation, see :meth:`Geoserver.json`, and logged
+    along with its status, such that the latencies of the requests sent by the `Celery` workers can be collected from
+    their logs.
+
     :param func: Function executing a http request to Geoserver
     :returns: Response object
     """
@@ -108,13 +144,20 @@ def geoserver_response_handling(func: GeoserverFunc) -> GeoserverFunc:
         # Since a connection error causes the requests library to raise an exception (RequestException),
         # we can't rely on a response code and need to handle this case, so it can be seen in the logs.
         # Without this, the requests auto-retries as per RequestTask class's configurations.
+        operation = func.__name__
+        start = time.perf_counter()
+        status: Union[int, str] = "error"
         try:
             response = func(geoserver, **kwargs)  # type: ignore[arg-type,misc]  # since args are not named explicitly
+            status = response.status_code
         except Exception as error:
             LOGGER.error(error)
             raise requests.RequestException(f"Connection to Geoserver failed using [{geoserver.url}]")
+        finally:
+            duration = time.perf_counter() - start
+            geoserver.get_latency_histogram(operation).observe(duration)
+            LOGGER.info("Geoserver request latency : operation=%s status=%s duration=%.3f", operation, status, duration)
 
-        operation = func.__name__
         response_code = response.status_code
         fail_msg_intro = f"Operation [{operation}] failed"
         regex_exists = "Workspace &#39;.*&#39; already exists"
@@ -147,6 +190,164 @@ def geoserver_response_handling(func: GeoserverFunc) -> GeoserverFunc:
     return cast(GeoserverFunc, wrapper)
 
 
+ShapefileReadinessStats = TypedDict(
+    "ShapefileReadinessStats",
+    {
+        "pending": int,
+        "ready": int,
+        "expired": int,
+    },
+    total=True,
+)
+
+
+class ShapefileReadinessTracker(object):
+    """
+    Tracks the new shapefiles until all their required files are found, to publish them as soon as they are complete.
+
+    A shapefile is made of many files, usually written one after another, such that its main file can be found before
+    the others. Instead of waiting an arbitrary delay before checking its files, the missing files of a new shapefile
+    are found once when it is added, and are then only updated by the events of these files. The shapefiles found
+    complete are sent to the ``on_ready`` callback, grouped by workspace. The shapefiles still incomplete after the
+    timeout are reported and no longer tracked.
+    """
+
+    def __init__(self,
+                 on_ready: Callable[[str, List[str]], None],
+                 get_missing_files: Callable[[str, str], List[str]],
+                 timeout: float = DEFAULT_SHAPEFILE_READY_TIMEOUT,
+                 ) -> None:
+        """
+        :param on_ready: Called with a workspace name and the names of its complete shapefiles.
+        :param get_missing_files: Returns the paths of the required files missing for a workspace and shapefile name.
+        :param timeout: Delay in seconds after which an incomplete shapefile is reported and no longer tracked.
+        """
+        self.on_ready = on_ready
+        self.get_missing_files = get_missing_files
+        self.timeout = timeout
+        self.ready = 0
+        self.expired = 0
+        # pending shapefiles ordered by deadline, since the timeout is the same for all of them
+        self.__pending: Dict[Tuple[str, str], Tuple[float, Set[str]]] = {}  # shapefile -> (deadline, missing files)
+        self.__missing_files: Dict[str, Tuple[str, str]] = {}  # missing file -> shapefile
+        self.__condition = threading.Condition()
+        self.__thread: Optional[threading.Thread] = None
+
+    def add(self, workspace_name: str, shapefile_names: List[str]) -> None:
+        """
+        Starts tracking new shapefiles of a workspace, those already complete being sent immediately.
+        """
+        ready_names = []
+        with self.__condition:
+            deadline = time.monotonic() + self.timeout
+            for shapefile_name in shapefile_names:
+                shapefile = (workspace_name, shapefile_name)
+                self._discard(shapefile)
+                missing_files = set(self.get_missing_files(workspace_name, shapefile_name))
+                if not missing_files:
+                    ready_names.append(shapefile_name)
+                    continue
+                self.__pending[shapefile] = (deadline, missing_files)
+                for path in missing_files:
+                    self.__missing_files[path] = shapefile
+            if len(ready_names) < len(shapefile_names):
+                self._start_thread()
+                self.__condition.notify()
+            self.ready += len(ready_names)
+        if ready_names:
+            self._send_ready(workspace_name, ready_names)
+
+    def update(self, paths: Iterable[str]) -> None:
+        """
+        Updates the pending shapefiles with files that were created or modified, sending those found complete.
+        """
+        ready_names: Dict[str, List[str]] = {}
+        with self.__condition:
+            for path in paths:
+                shapefile = self.__missing_files.get(path)
+                if shapefile is None or not os.path.isfile(path):
+                    continue
+                del self.__missing_files[path]
+                missing_files = self.__pending[shapefile][1]
+                missing_files.discard(path)
+                if not missing_files:
+                    del self.__pending[shapefile]
+                    workspace_name, shapefile_name = shapefile
+                    ready_names.setdefault(workspace_name, []).append(shapefile_name)
+                    self.ready += 1
+        for workspace_name, shapefile_names in ready_names.items():
+            self._send_ready(workspace_name, shapefile_names)
+
+    def remove(self, workspace_name: str, shapefile_name: str) -> None:
+        """
+        Stops tracking a shapefile that was deleted.
+        """
+        with self.__condition:
+            self._discard((workspace_name, shapefile_name))
+
+    def expire(self) -> int:
+        """
+        Reports and stops tracking the shapefiles still incomplete after the timeout.
+
+        :returns: Number of expired shapefiles.
+        """
+        now = time.monotonic()
+        expired: List[Tuple[Tuple[str, str], Set[str]]] = []
+        with self.__condition:
+            for shapefile, (deadline, missing_files) in self.__pending.items():
+                if deadline > now:
+                    break
+                expired.append((shapefile, missing_files))
+            for shapefile, _ in expired:
+                self._discard(shapefile)
+            self.expired += len(expired)
+        for (workspace_name, shapefile_name), missing_files in expired:
+            LOGGER.warning("Shapefile [%s] of workspace [%s] is still incomplete after [%s] seconds and will not be "
+                           "published : Missing %s",
+                           shapefile_name, workspace_name, self.timeout, sorted(missing_files))
+        return len(expired)
+
+    def _send_ready(self, workspace_name: str, shapefile_names: List[str]) -> None:
+        try:
+            self.on_ready(workspace_name, shapefile_names)
+        except Exception as exc:  # noqa
+            LOGGER.error("Failed to publish the complete shapefiles %s of the workspace [%s] : [%r]",
+                         shapefile_names, workspace_name, exc, exc_info=True)
+
+    def _discard(self, shapefile: Tuple[str, str]) -> None:
+        pending = self.__pending.pop(shapefile, None)
+        if pending:
+            for path in pending[1]:
+                self.__missing_files.pop(path, None)
+
+    def _start_thread(self) -> None:
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self._run, name="ShapefileReadinessTracker", daemon=True)
+            self.__thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self.__condition:
+                while not self.__pending:
+                    self.__condition.wait()
+                next_deadline = next(iter(self.__pending.values()))[0]
+                delay = next_deadline - time.monotonic()
+                if delay > 0:
+                    self.__condition.wait(delay)
+            try:
+                self.expire()
+            except Exception as exc:  # noqa
+                LOGGER.error("Failed to expire the incomplete shapefiles : [%r]", exc, exc_info=True)
+
+    def stats(self) -> ShapefileReadinessStats:
+        with self.__condition:
+            return {
+                "pending": len(self.__pending),
+                "ready": self.ready,
+                "expired": self.expired,
+            }
+
+
 class Geoserver(Handler, FSMonitor):
     """
     Keep Geoserver internal representation in sync with the platform.
@@ -158,6 +359,11 @@ class Geoserver(Handler, FSMonitor):
                  name: str,
                  admin_user: Optional[str] = None,
                  admin_password: Optional[str] = None,
+                 pool_connections: int = 10,
+                 pool_maxsize: int = 10,
+                 pool_block: bool = False,
+                 keep_alive: bool = True,
+                 shapefile_ready_timeout: float = DEFAULT_SHAPEFILE_READY_TIMEOUT,
                  **kwargs: Any) -> None:
         """
         Create the geoserver handler instance.
@@ -166,31 +372,69 @@ class Geoserver(Handler, FSMonitor):
         :param name: Handler name
         :param admin_user: Geoserver admin username
         :param admin_password: Geoserver admin password
-        """
+        :param pool_connections: Number of distinct hosts for which a connection pool is kept.
+        :param pool_maxsize: Maximum number of connections kept open to Geoserver, shared by concurrent threads.
+        :param pool_block: Wait for a connection to be released instead of opening a connection beyond the pool size.
+        :param keep_alive: Reuse the connections to Geoserver between requests.
+        :param shapefile_ready_timeout: Delay in seconds during which a new shapefile waits for its missing required
+                                        files before being reported as incomplete, or zero to publish it immediately
+                                        and let the publishing task retry while it is incomplete.
+        """
+        kwargs.setdefault("monitor_debounce", DEFAULT_MONITOR_DEBOUNCE)
         super(Geoserver, self).__init__(settings, name, **kwargs)
         self.api_url = f"{self.url}/rest"
         self.headers = {"Content-type": CONTENT_TYPE_JSON}
         self.admin_user = admin_user
         self.admin_password = admin_password
         self.auth = (self.admin_user, self.admin_password)
+        # the handler instance of a process is used by all of its tasks, which share its authenticated connections
+        self.http = HTTPSessionPool(pool_connections=pool_connections,
+                                    pool_maxsize=pool_maxsize,
+                                    pool_block=pool_block,
+                                    keep_alive=keep_alive,
+                                    auth=self.auth)
+        self.latency: Dict[str, LatencyHistogram] = {}
+        self._latency_lock = threading.Lock()
         self.datastore_regex = rf"^{self.workspace_dir}/\w+/{DEFAULT_DATASTORE_DIR_NAME}/?$"
+        self.shapefile_ready_timeout = shapefile_ready_timeout
+        self.shapefile_tracker = ShapefileReadinessTracker(on_ready=Geoserver.publish_shapefiles_task,
+                                                           get_missing_files=self._get_missing_shapefile_files,
+                                                           timeout=shapefile_ready_timeout)
 
     #
     # Implementation of parent classes' functions
     #
 
     # Handler class functions
+    def json(self) -> JSON:
+        """
+        Details of the handler, with the latencies of the requests sent by the current process only.
+
+        The requests sent by the `Celery` workers are only reported in their logs.
+        """
+        return {
+            "name": self.name,
+            "latency": {operation: histogram.stats() for operation, histogram in sorted(self.latency.items())},
+            "shapefiles": self.shapefile_tracker.stats(),
+        }
+
+    def get_latency_histogram(self, operation: str) -> LatencyHistogram:
+        """
+        Returns the histogram of the latencies of the requests of an operation, created if missing.
+        """
+        histogram = self.latency.get(operation)
+        if histogram is None:
+            with self._latency_lock:
+                histogram = self.latency.setdefault(operation, LatencyHistogram())
+        return histogram
+
     def user_created(self, user_name: str) -> None:
         self._create_datastore_dir(user_name)
         res = chain(create_workspace.si(user_name), create_datastore.si(user_name))
         res.delay()
-        LOGGER.info("Start monitoring datastore of created user [%s]", user_name)
-        Monitoring().register(self._shapefile_folder_dir(user_name), True, Geoserver)
 
     def user_deleted(self, user_name: str) -> None:
         remove_workspace.delay(user_name)
-        LOGGER.info("Stop monitoring datastore of created user [%s]", user_name)
-        Monitoring().unregister(self._shapefile_folder_dir(user_name), self)
 
         # Attempt to delete the corresponding resources in Magpie
         magpie_handler = HandlerFactory().get_handler("Magpie")
@@ -200,6 +444,18 @@ class Geoserver(Handler, FSMonitor):
         else:
             magpie_handler.delete_resource(workspace_res_id)
 
+    def start_user_monitoring(self, user_name: str) -> None:
+        # the datastore directory must exist to be monitored, even if the user creation was not handled yet
+        os.makedirs(self._user_workspace_dir(user_name), exist_ok=True)
+        self._create_datastore_dir(user_name)
+        LOGGER.info("Start monitoring datastore of created user [%s]", user_name)
+        Monitoring().register(self._shapefile_folder_dir(user_name), True, Geoserver,
+                              debounce=self.monitor_debounce)
+
+    def stop_user_monitoring(self, user_name: str) -> None:
+        LOGGER.info("Stop monitoring datastore of removed user [%s]", user_name)
+        Monitoring().unregister(self._shapefile_folder_dir(user_name), self)
+
     def get_shapefile_list(self, workspace_name: str, shapefile_name: str) -> List[str]:
         """
         Generates the list of all files associated with a shapefile name.
@@ -320,6 +576,13 @@ class Geoserver(Handler, FSMonitor):
                     publish_shapefile.si(workspace_name, shapefile_name))
         res.delay()
 
+    @staticmethod
+    def publish_shapefiles_task(workspace_name: str, shapefile_names: List[str]) -> None:
+        """
+        Applies the celery task required to publish many new files of a workspace to Geoserver together.
+        """
+        publish_shapefiles.delay(workspace_name, shapefile_names)
+
     def on_created(self, path: str) -> None:
         """
         Call when a new path is found.
@@ -331,11 +594,7 @@ class Geoserver(Handler, FSMonitor):
         # The Magpie workspace resource will be automatically created if needed upon a shapefile creation.
         if path.endswith(SHAPEFILE_MAIN_EXTENSION):
             workspace_name, shapefile_name = self._get_shapefile_info(path)
-
-            LOGGER.info("Starting Geoserver publishing process for [%s]", path)
-            Geoserver.publish_shapefile_task_chain(workspace_name, shapefile_name)
-
-            self._update_magpie_layer_permissions(workspace_name, shapefile_name)
+            self.on_shapefiles_created(workspace_name, [shapefile_name])
 
     @staticmethod
     def remove_shapefile_task(workspace_name: str, shapefile_name: str) -> None:
@@ -358,6 +617,7 @@ class Geoserver(Handler, FSMonitor):
                            "existing Geoserver workspace and corresponding Magpie resources.", path)
         elif path.endswith(SHAPEFILE_MAIN_EXTENSION):
             workspace_name, shapefile_name = self._get_shapefile_info(path)
+            self.shapefile_tracker.remove(workspace_name, shapefile_name)
             Geoserver.remove_shapefile_task(workspace_name, shapefile_name)
 
             # Remove all the remaining shapefile related files
@@ -386,51 +646,107 @@ class Geoserver(Handler, FSMonitor):
             workspace_name, shapefile_name = self._get_shapefile_info(path)
             self._update_magpie_layer_permissions(workspace_name, shapefile_name)
 
-    def resync(self) -> None:
+    def _get_event_target(self, path: str) -> Optional[Tuple[str, ...]]:
+        """
+        Returns the workspace or layer affected by the event of a path, or ``None`` if the event requires no operation.
+        """
+        if path.endswith(SHAPEFILE_MAIN_EXTENSION):
+            return self._get_shapefile_info(path)
+        if re.match(self.datastore_regex, path):
+            return (path.rstrip("/").split("/")[-2],)
+        return None
+
+    def on_events(self, events: List[FSEvent]) -> None:
+        """
+        Called with a batch of events, ordered as they occurred.
+
+        Events are grouped by affected workspace or layer, in the order of their first event. Every change of a file of
+        the datastore folder also modifies the folder, so that the permissions of a workspace or a layer are only
+        updated once for all its modifications of the batch, and not at all if the layer is also published by the batch.
+
+        The shapefiles created by the batch are published together per workspace, with a single task validating and
+        publishing all of them, and their Magpie layer resources are found or created with a single search. The other
+        files of the batch complete the shapefiles waiting for them, see :class:`ShapefileReadinessTracker`.
+        """
+        targets: Dict[Tuple[str, ...], List[FSEvent]] = {}
+        created_shapefiles: Dict[str, List[str]] = {}
+        self.shapefile_tracker.update(event.path for event in events if event.type != FSEventType.DELETED)
+        for event in events:
+            target = self._get_event_target(event.path)
+            if target is None:
+                continue
+            target_events = targets.setdefault(target, [])
+            if (event.type == FSEventType.MODIFIED and target_events
+                    and target_events[-1].type in [FSEventType.CREATED, FSEventType.MODIFIED]):
+                continue  # permissions are already updated by the previous event
+            target_events.append(event)
+        for target, target_events in targets.items():
+            if len(target) == 2 and target_events[-1].type == FSEventType.CREATED:
+                # a previous deletion of the same layer is still handled before its new publication
+                workspace_name, shapefile_name = target
+                created_shapefiles.setdefault(workspace_name, []).append(shapefile_name)
+                target_events = target_events[:-1]
+            super().on_events(target_events)
+        for workspace_name, shapefile_names in created_shapefiles.items():
+            try:
+                self.on_shapefiles_created(workspace_name, shapefile_names)
+            except Exception as exc:  # noqa
+                LOGGER.error("Failed to handle the creation of the shapefiles %s of the workspace [%s] : [%r]",
+                             shapefile_names, workspace_name, exc, exc_info=True)
+
+    def on_shapefiles_created(self, workspace_name: str, shapefile_names: List[str]) -> None:
+        """
+        Called when many new shapefiles are found in the datastore folder of a workspace.
+
+        :param workspace_name: Name of the workspace of the shapefiles
+        :param shapefile_names: Names of the new shapefiles, without file extension
+        """
+        LOGGER.info("Starting Geoserver publishing process for the shapefiles %s of the workspace [%s]",
+                    shapefile_names, workspace_name)
+        if self.shapefile_ready_timeout:
+            # published once all their required files are found
+            self.shapefile_tracker.add(workspace_name, shapefile_names)
+        else:
+            Geoserver.publish_shapefiles_task(workspace_name, shapefile_names)
+
+        magpie_handler = HandlerFactory().get_handler("Magpie")
+        layer_res_ids = magpie_handler.get_geoserver_layer_res_ids(workspace_name, shapefile_names,
+                                                                   create_if_missing=True)
+        for shapefile_name in shapefile_names:
+            self._update_magpie_layer_permissions(workspace_name, shapefile_name,
+                                                  layer_res_id=layer_res_ids[shapefile_name])
+
+    def resync(self, dry_run: bool = False) -> None:
         # FIXME: this should be implemented in the eventual task addressing the resync mechanism.
         raise NotImplementedError
 
     @staticmethod
     def _is_permission_update_required(effective_permissions: List[JSON],
-                                       user_name: str,
-                                       res_id: int,
+                                       resource_permissions: List[JSON],
                                        perm_name: str,
                                        perm_access: str,
                                        perm_scope: str,
-                                       delete_if_required: bool = False,
                                        ) -> bool:
         """
-        Checks if the required permission already exists on the resource, else returns true if an update is required.
+        Checks if the required permission is already resolved on the resource, else returns true if an update is
+        required.
 
-        Also, deletes the permission if the associated input argument is activated.
+        :param effective_permissions: Effective permissions of the user on the resource.
+        :param resource_permissions: Permissions set for the user on the resource itself, to verify the actual scope of
+                                     the `recursive` permissions.
         """
-        magpie_handler = HandlerFactory().get_handler("Magpie")
-        actual_perms_on_resource: List[JSON] = []
-
-        if perm_scope == Scope.RECURSIVE.value:
-            # Special case for recursive permissions. We have to check the actual permission on the resource to verify
-            # the actual scope.
-            body: JSON = magpie_handler.get_user_permissions_by_res_id(user_name, res_id, effective=False)
-            actual_perms_on_resource = cast(List[JSON], body["permissions"])
-
         for perm in effective_permissions:
             if perm["name"] == perm_name:
                 if perm["access"] == perm_access and perm_scope == Scope.RECURSIVE.value:
                     # We truly have a valid recursive permission only if the resource has the actual recursive
                     # permission, or if the resource does not have the permission, which means the permission was
                     # inherited by the parent resources, which is a valid case, that doesn't need an update.
-                    if (not any(p["name"] == perm_name for p in actual_perms_on_resource) or
+                    if (not any(p["name"] == perm_name for p in resource_permissions) or
                         any(p["name"] == perm_name and p["scope"] == Scope.RECURSIVE.value
-                            for p in actual_perms_on_resource)):
+                            for p in resource_permissions)):
                         return False
                 elif perm["access"] == perm_access and perm["scope"] == perm_scope:
                     return False
-
-                # Permission needs to be updated.
-                if delete_if_required:
-                    magpie_handler.delete_permission_by_user_and_res_id(user_name=user_name,
-                                                                        res_id=res_id,
-                                                                        permission_name=perm_name)
                 break
         return True
 
@@ -443,50 +759,52 @@ class Geoserver(Handler, FSMonitor):
                                    ) -> None:
         """
         Updates permissions on a Magpie resource (workspace/layer).
+
+        The effective permissions and the permissions set on the resource are fetched once to find the permissions that
+        differ, and only those are created or updated, with a single request each. The permissions already resolved on
+        the resource do not require any other request.
         """
         magpie_handler = HandlerFactory().get_handler("Magpie")
 
         allowed_perms = set(GEOSERVER_READ_PERMISSIONS if is_readable else [])
         allowed_perms = allowed_perms.union(GEOSERVER_WRITE_PERMISSIONS if is_writable else [])
         denied_perms = set(GEOSERVER_READ_PERMISSIONS + GEOSERVER_WRITE_PERMISSIONS).difference(allowed_perms)
-        perm_names_and_access = ([(p, Access.ALLOW.value) for p in allowed_perms] +
-                                 [(p, Access.DENY.value) for p in denied_perms])
+        perm_names_and_access = ([(p, Access.ALLOW.value) for p in sorted(allowed_perms)] +
+                                 [(p, Access.DENY.value) for p in sorted(denied_perms)])
 
         # Get resolved permissions on magpie
-        user_perms_body: JSON = magpie_handler.get_user_permissions_by_res_id(user_name, res_id, effective=True)
-        user_permissions = cast(List[JSON], user_perms_body["permissions"])
-
-        perms_to_update = set()
-        for perm_name, perm_access in perm_names_and_access:
-            # Find all permissions that actually need an update. If the permission already exists but still needs an
-            # update, delete the permission, and check in the next steps if the permission still needs an update
-            # according to the new effective permission solving.
-            if Geoserver._is_permission_update_required(effective_permissions=user_permissions,
-                                                        user_name=user_name,
-                                                        res_id=res_id,
-                                                        perm_name=perm_name,
-                                                        perm_access=perm_access,
-                                                        perm_scope=perm_scope,
-                                                        delete_if_required=True):
-                perms_to_update.add((perm_name, perm_access))
-
-        # Get new resolved permissions on magpie, after previous perms update were applied
         body: JSON = magpie_handler.get_user_permissions_by_res_id(user_name, res_id, effective=True)
-        user_permissions = cast(List[JSON], body["permissions"])
+        effective_perms = cast(List[JSON], body["permissions"])
+        # No need to check the scope, since only `match` scopes are returned when getting `effective` permissions,
+        # even if the permission comes from a `recursive` permission of a parent resource.
+        if perm_scope != Scope.RECURSIVE.value and all(
+                any(p["name"] == perm_name and p["access"] == perm_access for p in effective_perms)
+                for perm_name, perm_access in perm_names_and_access):
+            return
 
-        # Only apply new allow/deny permissions if required. If parent resources already have the required recursive
-        # allow/deny, a new permission is not necessary and will not be created in order to simplify
-        # effective permission solving.
+        # Permissions set on the resource itself, to find the actual scope of the permissions and those to update
+        body = magpie_handler.get_user_permissions_by_res_id(user_name, res_id, effective=False)
+        resource_perms = cast(List[JSON], body["permissions"])
+        perms_to_update = [(perm_name, perm_access) for perm_name, perm_access in perm_names_and_access
+                           if Geoserver._is_permission_update_required(effective_permissions=effective_perms,
+                                                                       resource_permissions=resource_perms,
+                                                                       perm_name=perm_name,
+                                                                       perm_access=perm_access,
+                                                                       perm_scope=perm_scope)]
+
+        # Permissions not set on the resource are only created if the resolved permission differs, since a permission
+        # resolved from a recursive permission of the parent resources does not require an update (see
+        # `_is_permission_update_required`), which simplifies the effective permission solving. Permissions already set
+        # on the resource are updated in place, and are kept even if the parent resources would resolve the same access,
+        # since the permissions inherited once they are deleted cannot be known without reading them again.
         for perm_name, perm_access in perms_to_update:
-            # No need to check the scope, since only `match` scopes are returned when getting `effective` permissions,
-            # even if the permission comes from a `recursive` permission of a parent resource.
-            if not any(p["name"] == perm_name and p["access"] == perm_access for p in user_permissions):
-                magpie_handler.create_permission_by_user_and_res_id(
-                    user_name=user_name,
-                    res_id=res_id,
-                    perm_name=perm_name,
-                    perm_access=perm_access,
-                    perm_scope=perm_scope)
+            magpie_handler.create_permission_by_user_and_res_id(
+                user_name=user_name,
+                res_id=res_id,
+                perm_name=perm_name,
+                perm_access=perm_access,
+                perm_scope=perm_scope,
+                current_permissions=resource_perms)
 
     def _update_magpie_workspace_permissions(self, workspace_name: str) -> None:
         """
@@ -510,13 +828,20 @@ class Geoserver(Handler, FSMonitor):
                                         is_readable=is_readable,
                                         is_writable=is_writable)
 
-    def _update_magpie_layer_permissions(self, workspace_name: str, layer_name: str) -> None:
+    def _update_magpie_layer_permissions(self,
+                                         workspace_name: str,
+                                         layer_name: str,
+                                         layer_res_id: Optional[int] = None,
+                                         ) -> None:
         """
         Updates the permissions of a `layer` resource on Magpie to the current permissions found on the corresponding
         shapefile.
+
+        :param layer_res_id: Resource id of the layer if already known, otherwise found or created on Magpie.
         """
-        magpie_handler = HandlerFactory().get_handler("Magpie")
-        layer_res_id = magpie_handler.get_geoserver_layer_res_id(workspace_name, layer_name, create_if_missing=True)
+        if layer_res_id is None:
+            magpie_handler = HandlerFactory().get_handler("Magpie")
+            layer_res_id = magpie_handler.get_geoserver_layer_res_id(workspace_name, layer_name, create_if_missing=True)
 
         # Get permissions of the shapefile's main file
         is_readable, is_writable = self._get_shapefile_permissions(workspace_name, layer_name)
@@ -582,6 +907,63 @@ class Geoserver(Handler, FSMonitor):
                                         datastore_name=datastore_name,
                                         filename=shapefile_name)
 
+    def publish_shapefiles(self, workspace_name: str, shapefile_names: List[str]) -> List[str]:
+        """
+        Validates and publishes many shapefiles in the specified workspace.
+
+        The layers already published in the datastore of the workspace are listed with a single request and skipped,
+        such that publishing the same shapefiles again, for example when the task is retried, only publishes the
+        missing ones. The Geoserver REST API does not provide any bulk creation of feature types, so each new layer is
+        still published with its own request. A layer that fails to be published does not prevent the other ones from
+        being published, but the failure is raised once all the layers were handled.
+
+        :param workspace_name: Name of the workspace from which the shapefiles will be published
+        :param shapefile_names: The shapefiles' names, without file extension
+        :returns: Names of the incomplete shapefiles, which were not published, along with the names of the shapefiles
+                  that failed to be published if any shapefile is incomplete.
+        :raises GeoserverError: If some shapefiles failed to be published while no shapefile is incomplete.
+        """
+        incomplete_names = []
+        failed_names = []
+        valid_names = []
+        for shapefile_name in shapefile_names:
+            missing_files = self._get_missing_shapefile_files(workspace_name, shapefile_name)
+            if missing_files:
+                LOGGER.warning("Shapefile is incomplete: Missing %s", missing_files)
+                incomplete_names.append(shapefile_name)
+            else:
+                valid_names.append(shapefile_name)
+        if not valid_names:
+            return incomplete_names
+
+        datastore_name = self._get_datastore_name(workspace_name)
+        response = self._list_shapefiles_request(workspace_name=workspace_name, datastore_name=datastore_name)
+        feature_types = response.json()["featureTypes"] or {}  # empty string when the datastore has no feature type
+        published_names = {feature_type["name"] for feature_type in feature_types.get("featureType", [])}
+        LOGGER.info("Attempting to publish shapefiles %s to workspace:datastore [%s : %s]",
+                    valid_names,
+                    workspace_name,
+                    datastore_name)
+        for shapefile_name in valid_names:
+            if shapefile_name in published_names:
+                LOGGER.info("Shapefile [%s] is already published", shapefile_name)
+                continue
+            try:
+                self._publish_shapefile_request(workspace_name=workspace_name,
+                                                datastore_name=datastore_name,
+                                                filename=shapefile_name)
+            except GeoserverError as exc:
+                LOGGER.error("Failed to publish shapefile [%s] : [%s]", shapefile_name, exc)
+                failed_names.append(shapefile_name)
+        if failed_names:
+            if incomplete_names:
+                # the failed layers are published again with the incomplete shapefiles, which must still be retried
+                LOGGER.warning("Shapefiles %s will be published again with the incomplete shapefiles %s",
+                               failed_names, incomplete_names)
+                return incomplete_names + failed_names
+            raise GeoserverError(f"Failed to publish shapefiles {failed_names} to workspace [{workspace_name}]")
+        return incomplete_names
+
     def validate_shapefile(self, workspace_name: str, shapefile_name: str) -> None:
         """
         Validate shapefile.
@@ -592,15 +974,19 @@ class Geoserver(Handler, FSMonitor):
         :param workspace_name: Name of the workspace from which the shapefile will be published
         :param shapefile_name: The shapefile's name, without file extension
         """
-        # Small wait time to prevent unnecessary failure since shapefile is a multi file format
-        sleep(1)
+        missing_files = self._get_missing_shapefile_files(workspace_name, shapefile_name)
+        if missing_files:
+            LOGGER.warning("Shapefile is incomplete: Missing [%s]", missing_files[0])
+            raise FileNotFoundError
+        LOGGER.info("Shapefile [%s] is valid", shapefile_name)
+
+    def _get_missing_shapefile_files(self, workspace_name: str, shapefile_name: str) -> List[str]:
+        """
+        Returns the paths of the files necessary for Geoserver publishing that are missing for a shapefile.
+        """
         files_to_find = [f"{self._shapefile_folder_dir(workspace_name)}/{shapefile_name}{ext}"
                          for ext in SHAPEFILE_REQUIRED_EXTENSIONS]
-        for file in files_to_find:
-            if not os.path.isfile(file):
-                LOGGER.warning("Shapefile is incomplete: Missing [%s]", file)
-                raise FileNotFoundError
-        LOGGER.info("Shapefile [%s] is valid", shapefile_name)
+        return [file for file in files_to_find if not os.path.isfile(file)]
 
     def _get_shapefile_permissions(self, workspace_name: str, shapefile_name: str) -> Tuple[bool, bool]:
         """
@@ -710,8 +1096,7 @@ class Geoserver(Handler, FSMonitor):
         """
         request_url = f"{self.api_url}/workspaces/"
         payload = {"workspace": {"name": workspace_name, "isolated": "True"}}
-        response = requests.post(url=request_url, json=payload, auth=self.auth,
-                                 headers=self.headers, timeout=self.timeout)
+        response = self.http.request("POST", url=request_url, json=payload, headers=self.headers, timeout=self.timeout)
         return response
 
     @geoserver_response_handling
@@ -726,8 +1111,7 @@ class Geoserver(Handler, FSMonitor):
         :returns: Response object
         """
         request_url = f"{self.api_url}/workspaces/{workspace_name}?recurse=true"
-        response = requests.delete(url=request_url, auth=self.auth,
-                                   headers=self.headers, timeout=self.timeout)
+        response = self.http.request("DELETE", url=request_url, headers=self.headers, timeout=self.timeout)
         return response
 
     def _create_datastore_dir(self, workspace_name: str) -> None:
@@ -765,8 +1149,7 @@ class Geoserver(Handler, FSMonitor):
                 },
             }
         }
-        response = requests.post(url=request_url, json=payload, auth=self.auth,
-                                 headers=self.headers, timeout=self.timeout)
+        response = self.http.request("POST", url=request_url, json=payload, headers=self.headers, timeout=self.timeout)
         return response
 
     @geoserver_response_handling
@@ -818,8 +1201,7 @@ class Geoserver(Handler, FSMonitor):
                 },
             }
         }
-        response = requests.put(url=request_url, json=payload, auth=self.auth,
-                                headers=self.headers, timeout=self.timeout)
+        response = self.http.request("PUT", url=request_url, json=payload, headers=self.headers, timeout=self.timeout)
         return response
 
     @geoserver_response_handling
@@ -865,8 +1247,24 @@ class Geoserver(Handler, FSMonitor):
                 "numDecimals": 6,
             }
         }
-        response = requests.post(url=request_url, json=payload, auth=self.auth,
-                                 headers=self.headers, timeout=self.timeout)
+        response = self.http.request("POST", url=request_url, json=payload, headers=self.headers, timeout=self.timeout)
+        return response
+
+    @geoserver_response_handling
+    def _list_shapefiles_request(self,
+                                 *,
+                                 workspace_name: str,
+                                 datastore_name: str,
+                                 ) -> requests.Response:
+        """
+        Request to list the `Feature types` published from a datastore in Geoserver.
+
+        :param workspace_name: Workspace of the datastore
+        :param datastore_name: Datastore of the published shapefiles
+        :returns: Response object
+        """
+        request_url = f"{self.api_url}/workspaces/{workspace_name}/datastores/{datastore_name}/featuretypes.json"
+        response = self.http.request("GET", url=request_url, headers=self.headers, timeout=self.timeout)
         return response
 
     @geoserver_response_handling
@@ -888,8 +1286,7 @@ class Geoserver(Handler, FSMonitor):
             f"{self.api_url}/workspaces/{workspace_name}/datastores/{datastore_name}"
             f"/featuretypes/{filename}?recurse=true"
         )
-        response = requests.delete(url=request_url, auth=self.auth,
-                                   headers=self.headers, timeout=self.timeout)
+        response = self.http.request("DELETE", url=request_url, headers=self.headers, timeout=self.timeout)
         return response
 
 
@@ -921,6 +1318,18 @@ def publish_shapefile(_task: Task[[Any, Any], None], workspace_name: str, shapef
     return Geoserver.get_instance().publish_shapefile(workspace_name, shapefile_name)
 
 
+@shared_task(bind=True, base=RequestTask, max_retries=8, typing=True)
+def publish_shapefiles(task: Task[[Any, Any], None], workspace_name: str, shapefile_names: List[str]) -> None:
+    incomplete_names = Geoserver.get_instance().publish_shapefiles(workspace_name, shapefile_names)
+    if incomplete_names:
+        # only the incomplete shapefiles are validated again, with the same backoff as the `validate_shapefile` task,
+        # along with the ones that failed to be published in the same batch
+        countdown = get_exponential_backoff_interval(factor=1, retries=task.request.retries,
+                                                     maximum=task.retry_backoff_max, full_jitter=task.retry_jitter)
+        raise task.retry(args=(workspace_name, incomplete_names), countdown=countdown,
+                         exc=FileNotFoundError(f"Unpublished shapefiles {incomplete_names} of [{workspace_name}]"))
+
+
 @shared_task(bind=True, base=RequestTask, typing=True)
 def remove_shapefile(_task: Task[[Any, Any], None], workspace_name: str, shapefile_name: str) -> None:
     return Geoserver.get_instance().remove_shapefile(workspace_name, shapefile_name)
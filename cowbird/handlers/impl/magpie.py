@@ -1,5 +1,7 @@
+import re
+import threading
 import time
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple, TypeVar, Union
 
 import requests
 from magpie.models import Layer, Workspace
@@ -12,11 +14,18 @@ from cowbird.config import ConfigError
 from cowbird.handlers.handler import HANDLER_URL_PARAM, Handler
 from cowbird.permissions_synchronizer import PermissionSynchronizer
 from cowbird.typedefs import JSON, PermissionActionType, PermissionConfigItemType, SettingsType
-from cowbird.utils import CONTENT_TYPE_JSON, get_logger
+from cowbird.utils import CONTENT_TYPE_JSON, HTTPSessionPool, TTLCache, get_logger
 
 LOGGER = get_logger(__name__)
 
 COOKIES_TIMEOUT = 60
+UNKNOWN_USER_TTL = 5
+DEFAULT_RESOURCE_CACHE_TTL = 10
+
+# ids of the resources referenced by the path of a request
+RESOURCE_ID_PATH_REGEX = re.compile(r"/resources/(\d+)(?:/|$)")
+
+ReturnType = TypeVar("ReturnType")  # pylint: disable=invalid-name
 
 WFS_READ_PERMISSIONS = [Permission.DESCRIBE_FEATURE_TYPE.value,
                         Permission.DESCRIBE_STORED_QUERIES.value,
@@ -42,6 +51,82 @@ GEOSERVER_READ_PERMISSIONS = WFS_READ_PERMISSIONS + WMS_READ_PERMISSIONS
 GEOSERVER_WRITE_PERMISSIONS = WFS_WRITE_PERMISSIONS
 
 
+class GeoserverResourceIndex(object):
+    """
+    Resource ids of the workspaces and layers of the `geoserver` type services, by name.
+
+    Resources of a same name found in many services or workspaces are resolved as when searching the services in order,
+    using the last workspace and the first layer found.
+    """
+
+    def __init__(self, service_ids: List[int], expiry: float) -> None:
+        """
+        :param service_ids: Resource ids of the `geoserver` type services, in search order.
+        :param expiry: Monotonic time after which the index must be filled again.
+        """
+        self.service_ids = service_ids
+        self.expiry = expiry
+        self.workspaces: Dict[str, List[int]] = {}
+        self.layers: Dict[Tuple[str, str], List[int]] = {}
+        self.names: Dict[int, Tuple[str, ...]] = {}  # resource id -> workspace name, and layer name for a layer
+        self.workspace_layers: Dict[int, List[int]] = {}
+        self.layer_workspaces: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def get_workspace(self, workspace_name: str) -> Optional[int]:
+        with self._lock:
+            workspace_ids = self.workspaces.get(workspace_name)
+            return workspace_ids[-1] if workspace_ids else None
+
+    def get_layer(self, workspace_name: str, layer_name: str) -> Optional[int]:
+        with self._lock:
+            layer_ids = self.layers.get((workspace_name, layer_name))
+            return layer_ids[0] if layer_ids else None
+
+    def add(self, resource_name: str, resource_type: str, resource_id: int, parent_id: int) -> None:
+        """
+        Adds a resource to the index if it is a workspace of a `geoserver` service, or a layer of such a workspace.
+        """
+        with self._lock:
+            if resource_type == Workspace.resource_type_name and parent_id in self.service_ids:
+                self.workspaces.setdefault(resource_name, []).append(resource_id)
+                self.names[resource_id] = (resource_name,)
+                self.workspace_layers[resource_id] = []
+            elif resource_type == Layer.resource_type_name and parent_id in self.workspace_layers:
+                key = (self.names[parent_id][0], resource_name)
+                self.layers.setdefault(key, []).append(resource_id)
+                self.names[resource_id] = key
+                self.layer_workspaces[resource_id] = parent_id
+                self.workspace_layers[parent_id].append(resource_id)
+
+    def remove(self, resource_id: int) -> None:
+        """
+        Removes a resource from the index, along with the layers of a workspace.
+        """
+        with self._lock:
+            for res_id in self.workspace_layers.pop(resource_id, []) + [resource_id]:
+                key = self.names.pop(res_id, None)
+                if key is None:
+                    continue
+                if len(key) == 1:
+                    self._discard(self.workspaces, key[0], res_id)
+                else:
+                    self._discard(self.layers, key, res_id)
+                    workspace_id = self.layer_workspaces.pop(res_id)
+                    if workspace_id in self.workspace_layers:
+                        self.workspace_layers[workspace_id].remove(res_id)
+
+    @staticmethod
+    def _discard(resources: Dict[Any, List[int]], key: Any, resource_id: int) -> None:
+        resources[key].remove(resource_id)
+        if not resources[key]:
+            del resources[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"workspaces": len(self.workspaces), "layers": len(self.layers)}
+
+
 class Magpie(Handler):
     """
     Complete the Magpie's webhook call by calling Magpie temporary urls. Also keep service-shared resources in sync when
@@ -53,7 +138,21 @@ class Magpie(Handler):
     """
     required_params = [HANDLER_URL_PARAM]
 
-    def __init__(self, settings: SettingsType, name: str, admin_user: str, admin_password: str, **kwargs: Any) -> None:
+    def __init__(self,
+                 settings: SettingsType,
+                 name: str,
+                 admin_user: str,
+                 admin_password: str,
+                 pool_connections: int = 10,
+                 pool_maxsize: int = 10,
+                 pool_block: bool = False,
+                 keep_alive: bool = True,
+                 user_cache_ttl: float = 300,
+                 user_cache_size: int = 10000,
+                 resource_cache_ttl: float = DEFAULT_RESOURCE_CACHE_TTL,
+                 resource_cache_size: int = 10000,
+                 **kwargs: Any,
+                 ) -> None:
         """
         Create the magpie instance and instantiate the permission synchronizer that will handle the permission events.
 
@@ -61,6 +160,15 @@ class Magpie(Handler):
         :param name: Handler name
         :param admin_user: Magpie admin username used for login.
         :param admin_password: Magpie admin password used for login.
+        :param pool_connections: Number of distinct hosts for which a connection pool is kept.
+        :param pool_maxsize: Maximum number of connections kept open to Magpie, shared by concurrent threads.
+        :param pool_block: Wait for a connection to be released instead of opening a connection beyond the pool size.
+        :param keep_alive: Reuse the connections to Magpie between requests.
+        :param user_cache_ttl: Duration (in seconds) for which the user id/name index is kept, ``0`` to disable it.
+        :param user_cache_size: Maximum number of users kept in the user id/name index.
+        :param resource_cache_ttl: Duration (in seconds) for which fetched services and resources are cached, ``0`` to
+            disable the cache.
+        :param resource_cache_size: Maximum number of services and resources responses kept in cache.
         """
         super(Magpie, self).__init__(settings, name, **kwargs)
 
@@ -72,6 +180,24 @@ class Magpie(Handler):
         self.service_types = None
         self.cookies = None
         self.last_cookies_update_time = None
+        self.http = HTTPSessionPool(pool_connections=pool_connections,
+                                    pool_maxsize=pool_maxsize,
+                                    pool_block=pool_block,
+                                    keep_alive=keep_alive)
+        # bidirectional index of users, filled from bulk fetches of the user list
+        self.user_names_by_id = TTLCache(ttl=user_cache_ttl, maxsize=user_cache_size)
+        self.user_ids_by_name = TTLCache(ttl=user_cache_ttl, maxsize=user_cache_size)
+        # ids not found in the last bulk fetch, to avoid fetching all users again for each lookup of a same unknown id
+        self.unknown_user_ids = TTLCache(ttl=min(user_cache_ttl, UNKNOWN_USER_TTL), maxsize=user_cache_size)
+        # responses of services and resources requests, with the parent/child links between the cached resources
+        self.resource_cache = TTLCache(ttl=resource_cache_ttl, maxsize=resource_cache_size)
+        self.resource_parents: Dict[int, int] = {}
+        self.resource_children: Dict[int, Set[int]] = {}
+        self.service_ids: Dict[str, int] = {}
+        self._resource_links_lock = threading.RLock()
+        # workspace and layer resources of the geoserver services by name, updated by the created or deleted resources
+        self.geoserver_index: Optional[GeoserverResourceIndex] = None
+        self.geoserver_index_fills = 0
 
         self.permissions_synch = PermissionSynchronizer(self)
 
@@ -83,19 +209,145 @@ class Magpie(Handler):
                       ) -> requests.Response:
         """
         Wrapping function to send requests to Magpie, which also handles login and cookies.
+
+        Requests are sent through the pooled session of the handler, to reuse opened connections to Magpie.
         """
         cookies = self.login()
-        resp = requests.request(method=method, url=url, params=params, json=json,
-                                cookies=cookies, headers=self.headers, timeout=self.timeout)
+        resp = self.http.request(method=method, url=url, params=params, json=json,
+                                 cookies=cookies, headers=self.headers, timeout=self.timeout)
 
         if resp.status_code in [401, 403]:
             # try refreshing cookies in case of Unauthorized or Forbidden error
             self.cookies = None
             cookies = self.login()
-            resp = requests.request(method=method, url=url, params=params, json=json,
-                                    cookies=cookies, headers=self.headers, timeout=self.timeout)
+            resp = self.http.request(method=method, url=url, params=params, json=json,
+                                     cookies=cookies, headers=self.headers, timeout=self.timeout)
+        if method != "GET" and url.startswith(f"{self.url}/services"):
+            # services were created, modified or removed, cached resources could refer to any of them
+            self.invalidate_resources()
+        elif resp.status_code >= 400:
+            self._invalidate_referenced_resources(url, json)
         return resp
 
+    def _invalidate_referenced_resources(self, url: str, json: Optional[Any]) -> None:
+        """
+        Removes from the cache the resources referenced by a failed request.
+
+        Cached resources are only invalidated in the process that modified them, such that a resource deleted by
+        another process (e.g.: a `Celery` worker) could still be used until it expires from the cache. A failed request
+        referring to the resource is the first sign of such a change.
+        """
+        resource_ids = {int(res_id) for res_id in RESOURCE_ID_PATH_REGEX.findall(url)}
+        if isinstance(json, dict) and isinstance(json.get("parent_id"), int):
+            resource_ids.add(json["parent_id"])
+        for resource_id in resource_ids:
+            self.invalidate_resource(resource_id, removed=True)
+        if resource_ids:
+            self.geoserver_index = None
+
+    def json(self) -> JSON:
+        return {
+            "name": self.name,
+            "cache": {
+                "users": self.user_names_by_id.stats(),
+                "resources": self.resource_cache.stats(),
+                "geoserver_index": {
+                    "fills": self.geoserver_index_fills,
+                    **(self.geoserver_index.stats() if self.geoserver_index else {"workspaces": 0, "layers": 0}),
+                },
+            },
+        }
+
+    def _cache_resource_links(self, resource: JSON, parent_id: Optional[int] = None) -> None:
+        """
+        Registers the parent/child links between a resource and its nested children resources.
+        """
+        with self._resource_links_lock:
+            parent_id = resource.get("parent_id") if parent_id is None else parent_id
+            resources = [(resource, parent_id)]
+            while resources:
+                res, res_parent_id = resources.pop()
+                res_id = res["resource_id"]
+                if res_parent_id is not None:
+                    self.resource_parents[res_id] = res_parent_id
+                    self.resource_children.setdefault(res_parent_id, set()).add(res_id)
+                for child in (res.get("children") or {}).values():
+                    resources.append((child, res_id))
+
+    def _get_cached(self, key: Hashable) -> Any:
+        return self.resource_cache.get(key) if self.resource_cache.enabled else None
+
+    def invalidate_resource(self, resource_id: int, removed: bool = False) -> None:
+        """
+        Removes a resource from the cache, along with its parents, which list it as children, and its children, for
+        which it is part of the parents tree.
+
+        :param resource_id: Id of the modified resource.
+        :param removed: Indicates that the resource was deleted, to also forget the links of its children.
+        """
+        with self._resource_links_lock:
+            parent_ids = set()
+            res_id = self.resource_parents.get(resource_id)
+            while res_id is not None and res_id not in parent_ids:
+                parent_ids.add(res_id)
+                res_id = self.resource_parents.get(res_id)
+            children_ids = set()
+            pending_ids = list(self.resource_children.get(resource_id, ()))
+            while pending_ids:
+                child_id = pending_ids.pop()
+                if child_id not in children_ids:
+                    children_ids.add(child_id)
+                    pending_ids.extend(self.resource_children.get(child_id, ()))
+            if removed:
+                for res_id in children_ids | {resource_id}:
+                    parent_id = self.resource_parents.pop(res_id, None)
+                    self.resource_children.pop(res_id, None)
+                    if parent_id is not None and parent_id in self.resource_children:
+                        self.resource_children[parent_id].discard(res_id)
+        for res_id in parent_ids | children_ids | {resource_id}:
+            self.resource_cache.pop(("resource", res_id))
+            self.resource_cache.pop(("parents", res_id))
+
+    def invalidate_permission_resource(self, resource_id: int, service_name: Optional[str]) -> None:
+        """
+        Removes from the cache the resources affected by a permission event on a resource.
+
+        The resource is invalidated with its parents and children if it is known. Otherwise, its whole service is
+        invalidated, since the resource could have been created after its parent was cached.
+        """
+        with self._resource_links_lock:
+            is_known = (resource_id in self.resource_parents or resource_id in self.resource_children
+                        or resource_id in self.service_ids.values())
+        if is_known:
+            self.invalidate_resource(resource_id)
+        else:
+            self.invalidate_service(service_name)
+
+    def invalidate_service(self, service_name: Optional[str]) -> None:
+        """
+        Removes a service and all of its known children resources from the cache.
+
+        The whole cache is cleared if the service is not specified or was never resolved.
+        """
+        service_id = self.service_ids.get(service_name) if service_name else None
+        if service_id is None:
+            self.invalidate_resources()
+            return
+        self.resource_cache.pop(("service_info", service_name))
+        self.invalidate_resource(service_id)
+        self.geoserver_index = None
+
+    def invalidate_resources(self) -> None:
+        """
+        Clears all cached services and resources.
+        """
+        with self._resource_links_lock:
+            self.resource_cache.clear()
+            self.resource_parents.clear()
+            self.resource_children.clear()
+            self.service_ids.clear()
+            self.geoserver_index = None
+
     def get_service_types(self) -> List[str]:
         """
         Returns the list of service types available on Magpie.
@@ -109,18 +361,36 @@ class Magpie(Handler):
         return self.service_types
 
     def get_services_by_type(self, service_type: str) -> Dict[str, JSON]:
+        """
+        Returns the services of a given type, by service name.
+
+        Services and resources returned by the handler can be cached and should not be modified by the caller.
+        """
+        services = self._get_cached(("services_by_type", service_type))
+        if services is not None:
+            return services
         resp = self._send_request(method="GET", url=f"{self.url}/services/types/{service_type}")
         if resp.status_code != 200:
             raise MagpieHttpError(f"Failed to get the services of type `{service_type}`. "
                                   f"HttpError {resp.status_code} : {resp.text}")
-        return resp.json()["services"][service_type]
+        services = resp.json()["services"][service_type]
+        for svc_name, svc in services.items():
+            self.service_ids[svc_name] = svc["resource_id"]
+        self.resource_cache.set(("services_by_type", service_type), services)
+        return services
 
     def get_service_info(self, service_name: str) -> Dict[str, JSON]:
+        service = self._get_cached(("service_info", service_name))
+        if service is not None:
+            return service
         resp = self._send_request(method="GET", url=f"{self.url}/services/{service_name}")
         if resp.status_code != 200:
             raise MagpieHttpError(f"Could not find the `{service_name}` service info. "
                                   f"HttpError {resp.status_code} : {resp.text}")
-        return resp.json()["service"]
+        service = resp.json()["service"]
+        self.service_ids[service_name] = service["resource_id"]
+        self.resource_cache.set(("service_info", service_name), service)
+        return service
 
     def get_resources_by_service(self, service_name: str) -> Dict[str, JSON]:
         resp = self._send_request(method="GET", url=f"{self.url}/services/{service_name}/resources")
@@ -133,22 +403,80 @@ class Magpie(Handler):
         """
         Returns the associated Magpie Resource object and all its parents in a list ordered from parent to child.
         """
+        resources = self._get_cached(("parents", resource_id))
+        if resources is not None:
+            return resources
         data = {"parent": "true", "invert": "true", "flatten": "true"}
         resp = self._send_request(method="GET", url=f"{self.url}/resources/{resource_id}", params=data)
         if resp.status_code != 200:
             raise MagpieHttpError(f"Could not find the parent resources of the resource id `{resource_id}`. "
                                   f"HttpError {resp.status_code} : {resp.text}")
-        return resp.json()["resources"]
+        resources = resp.json()["resources"]
+        for parent, child in zip(resources, resources[1:]):
+            self._cache_resource_links(child, parent_id=parent["resource_id"])
+        self.resource_cache.set(("parents", resource_id), resources)
+        return resources
 
     def get_resource(self, resource_id: int) -> Dict[str, JSON]:
         """
         Returns the associated Magpie Resource object.
         """
+        resource = self._get_cached(("resource", resource_id))
+        if resource is not None:
+            return resource
         resp = self._send_request(method="GET", url=f"{self.url}/resources/{resource_id}", params={"parent": "false"})
         if resp.status_code != 200:
             raise MagpieHttpError(f"Could not find the resource with the id `{resource_id}. "
                                   f"HttpError {resp.status_code} : {resp.text}")
-        return resp.json()["resource"]
+        resource = resp.json()["resource"]
+        self._cache_resource_links(resource)
+        self.resource_cache.set(("resource", resource_id), resource)
+        return resource
+
+    def get_geoserver_resource_index(self) -> "GeoserverResourceIndex":
+        """
+        Returns the index of the workspace and layer resources of the `geoserver` type services.
+
+        The index is filled with a single pass over the resources of the services, and is then kept current by the
+        resources created or deleted with the handler, until it expires after the time-to-live of the resource cache,
+        such that the changes done on Magpie by other clients are eventually found. A new index is filled for each
+        lookup if the resource cache is disabled.
+        """
+        index = self.geoserver_index
+        if index is not None and index.expiry > time.monotonic():
+            return index
+        geoserver_type_services = self.get_services_by_type(ServiceGeoserver.service_type)
+        if not geoserver_type_services:
+            raise ValueError(f"No service of type `{ServiceGeoserver.service_type}` found on Magpie while trying to get"
+                             " the workspace and layer resources.")
+        index = GeoserverResourceIndex([svc["resource_id"] for svc in geoserver_type_services.values()],
+                                       expiry=time.monotonic() + self.resource_cache.ttl)
+        for svc_res_id in index.service_ids:
+            for workspace in self.get_resource(svc_res_id)["children"].values():
+                index.add(workspace["resource_name"], Workspace.resource_type_name, workspace["resource_id"],
+                          svc_res_id)
+                for layer in workspace["children"].values():
+                    index.add(layer["resource_name"], Layer.resource_type_name, layer["resource_id"],
+                              workspace["resource_id"])
+        if self.resource_cache.enabled:
+            self.geoserver_index = index
+            self.geoserver_index_fills += 1
+        return index
+
+    def _retry_with_current_resources(self, func: Callable[..., ReturnType], *args: Any) -> ReturnType:
+        """
+        Calls a function resolving resources from the `geoserver` index, calling it again with a new index if it fails
+        while the index was cached, since its resources could have been deleted by another process in the meantime.
+        """
+        if self.geoserver_index is None:
+            return func(*args)
+        try:
+            return func(*args)
+        except MagpieHttpError as exc:
+            LOGGER.warning("Failed to use the cached geoserver resources, retrying with the current resources : [%s]",
+                           exc)
+            self.geoserver_index = None
+            return func(*args)
 
     def get_geoserver_workspace_res_id(self,
                                        workspace_name: str,
@@ -157,23 +485,20 @@ class Magpie(Handler):
         """
         Finds the resource id of a workspace resource from the `geoserver` type services.
         """
-        workspace_res_id: Optional[int] = None
-        geoserver_type_services = self.get_services_by_type(ServiceGeoserver.service_type)
-        if not geoserver_type_services:
-            raise ValueError(f"No service of type `{ServiceGeoserver.service_type}` found on Magpie while trying to get"
-                             f" the workspace resource `{workspace_name}`.")
-        for svc in geoserver_type_services.values():
-            svc_res_id: int = svc["resource_id"]
-            svc_children: JSON = self.get_resource(svc_res_id)["children"]
-            for workspace in svc_children.values():
-                if workspace["resource_name"] == workspace_name:
-                    workspace_res_id = workspace["resource_id"]
+        return self._retry_with_current_resources(self._get_geoserver_workspace_res_id,
+                                                  workspace_name, create_if_missing)
+
+    def _get_geoserver_workspace_res_id(self,
+                                        workspace_name: str,
+                                        create_if_missing: Optional[bool] = False,
+                                        ) -> Optional[int]:
+        index = self.get_geoserver_resource_index()
+        workspace_res_id = index.get_workspace(workspace_name)
         if not workspace_res_id and create_if_missing:
-            parent_res_id: int = list(geoserver_type_services.values())[0]["resource_id"]
             workspace_res_id = self.create_resource(
                 resource_name=workspace_name,
                 resource_type=Workspace.resource_type_name,
-                parent_id=parent_res_id)
+                parent_id=index.service_ids[0])
         return workspace_res_id
 
     def get_geoserver_layer_res_id(self, workspace_name: str, layer_name: str, create_if_missing: bool = False) -> int:
@@ -181,37 +506,75 @@ class Magpie(Handler):
         Tries to get the resource id of a specific layer, on `geoserver` type services, and if requested, creates the
         resource and workspace if they do not exist yet.
         """
-        layer_res_id: Optional[int] = None
-        workspace_res_id: Optional[int] = None
-        geoserver_type_services = self.get_services_by_type(ServiceGeoserver.service_type)
-        if not geoserver_type_services:
-            raise ValueError(f"No service of type `{ServiceGeoserver.service_type}` found on Magpie while trying to get"
-                             f" the layer resource `{layer_name}`.")
-        for svc in geoserver_type_services.values():
+        return self.get_geoserver_layer_res_ids(workspace_name, [layer_name], create_if_missing).get(layer_name)
+
+    def get_geoserver_layer_res_ids(self,
+                                    workspace_name: str,
+                                    layer_names: List[str],
+                                    create_if_missing: bool = False,
+                                    ) -> Dict[str, int]:
+        """
+        Gets the resource ids of many layers of a workspace from the index of the `geoserver` type services, and if
+        requested, creates the workspace and the layers that do not exist yet.
+
+        Magpie does not provide any bulk creation of resources, so that each missing resource is still created by its
+        own request, but the services are only searched once for all the layers, instead of once per layer.
+
+        :returns: Resource ids by layer name, of the layers found or created.
+        """
+        return self._retry_with_current_resources(self._get_geoserver_layer_res_ids,
+                                                  workspace_name, layer_names, create_if_missing)
+
+    def _get_geoserver_layer_res_ids(self,
+                                     workspace_name: str,
+                                     layer_names: List[str],
+                                     create_if_missing: bool = False,
+                                     ) -> Dict[str, int]:
+        index = self.get_geoserver_resource_index()
+        layer_res_ids: Dict[str, int] = {}
+        for layer_name in layer_names:
+            layer_res_id = index.get_layer(workspace_name, layer_name)
             if layer_res_id:
-                break
-            svc_res_id: int = svc["resource_id"]
-            svc_children: JSON = self.get_resource(svc_res_id)["children"]
-            for workspace in svc_children.values():
-                if workspace["resource_name"] == workspace_name:
-                    workspace_res_id = workspace["resource_id"]
-                    for layer in workspace["children"].values():
-                        if layer["resource_name"] == layer_name:
-                            layer_res_id = layer["resource_id"]
-                            break
-                    break
-        if not layer_res_id and create_if_missing:
-            if not workspace_res_id:
-                parent_res_id: int = list(geoserver_type_services.values())[0]["resource_id"]
-                workspace_res_id = self.create_resource(
-                    resource_name=workspace_name,
-                    resource_type=Workspace.resource_type_name,
-                    parent_id=parent_res_id)
-            layer_res_id = self.create_resource(
-                resource_name=layer_name,
-                resource_type=Layer.resource_type_name,
-                parent_id=workspace_res_id)
-        return layer_res_id
+                layer_res_ids[layer_name] = layer_res_id
+        missing_layer_names = [name for name in dict.fromkeys(layer_names) if name not in layer_res_ids]
+        if missing_layer_names and create_if_missing:
+            workspace_res_id = self._get_geoserver_workspace_res_id(workspace_name, create_if_missing=True)
+            for layer_name in missing_layer_names:
+                layer_res_ids[layer_name] = self.create_resource(
+                    resource_name=layer_name,
+                    resource_type=Layer.resource_type_name,
+                    parent_id=workspace_res_id)
+        return layer_res_ids
+
+    def _fetch_users(self) -> Dict[int, str]:
+        """
+        Fetches the details of all Magpie users with a single request and refreshes the user id/name index with them.
+
+        :returns: User names of all users, by user id.
+        """
+        resp = self._send_request(method="GET", url=f"{self.url}/users", params={"detail": True})
+        if resp.status_code != 200:
+            raise MagpieHttpError(f"Could not find the list of users. HttpError {resp.status_code} : {resp.text}")
+        users = {user_info["user_id"]: user_info["user_name"]
+                 for user_info in resp.json()["users"] if "user_id" in user_info}
+        # swap the complete maps, to avoid concurrent lookups missing users and fetching them again during the refresh
+        self.user_names_by_id.reset(users)
+        self.user_ids_by_name.reset({user_name: user_id for user_id, user_name in users.items()})
+        self.unknown_user_ids.clear()
+        return users
+
+    def invalidate_users(self, user_name: Optional[str] = None) -> None:
+        """
+        Removes a user from the user id/name index, or clears the whole index if no user name is specified.
+        """
+        if user_name is None:
+            self.user_names_by_id.clear()
+            self.user_ids_by_name.clear()
+            self.unknown_user_ids.clear()
+            return
+        user_id = self.user_ids_by_name.pop(user_name)
+        if user_id is not None:
+            self.user_names_by_id.pop(user_id)
 
     def get_user_list(self) -> List[str]:
         """
@@ -226,21 +589,32 @@ class Magpie(Handler):
         """
         Finds the id of a user from his username.
         """
+        user_id = self.user_ids_by_name.get(user_name)
+        if user_id is not None:
+            return user_id
         resp = self._send_request(method="GET", url=f"{self.url}/users/{user_name}")
         if resp.status_code != 200:
             raise MagpieHttpError(f"Could not find the user `{user_name}`. HttpError {resp.status_code} : {resp.text}")
-        return resp.json()["user"]["user_id"]
+        user_id = resp.json()["user"]["user_id"]
+        self.user_ids_by_name.set(user_name, user_id)
+        self.user_names_by_id.set(user_id, user_name)
+        return user_id
 
     def get_user_name_from_user_id(self, user_id: int) -> str:
         """
         Finds the name of a user from his user id.
-        """
-        resp = self._send_request(method="GET", url=f"{self.url}/users", params={"detail": True})
-        if resp.status_code != 200:
-            raise MagpieHttpError(f"Could not find the list of users. HttpError {resp.status_code} : {resp.text}")
-        for user_info in resp.json()["users"]:
-            if "user_id" in user_info and user_info["user_id"] == user_id:
-                return user_info["user_name"]
+
+        Users are resolved from the user id/name index, which is refreshed with a single request listing all users
+        when the id is unknown, unless the same id was already missing from a recent refresh.
+        """
+        user_name = self.user_names_by_id.get(user_id)
+        if user_name is not None:
+            return user_name
+        if user_id not in self.unknown_user_ids:
+            user_name = self._fetch_users().get(user_id)
+            if user_name is not None:
+                return user_name
+            self.unknown_user_ids.set(user_id, True)
         raise MagpieHttpError(f"Could not find any user with the id `{user_id}`.")
 
     def get_user_permissions(self, user: str) -> Dict[str, JSON]:
@@ -290,10 +664,11 @@ class Magpie(Handler):
         return resp.json()
 
     def user_created(self, user_name: str) -> None:
-        raise NotImplementedError
+        # ids of recently unknown users might now be resolved
+        self.unknown_user_ids.clear()
 
     def user_deleted(self, user_name: str) -> None:
-        raise NotImplementedError
+        self.invalidate_users(user_name)
 
     def permission_created(self, permission: Permission) -> None:
         self.permissions_synch.create_permission(permission)
@@ -301,7 +676,7 @@ class Magpie(Handler):
     def permission_deleted(self, permission: Permission) -> None:
         self.permissions_synch.delete_permission(permission)
 
-    def resync(self) -> None:
+    def resync(self, dry_run: bool = False) -> None:
         # FIXME: this should be implemented in the eventual task addressing the resync mechanism.
         raise NotImplementedError
 
@@ -315,6 +690,8 @@ class Magpie(Handler):
 
             resp = self._send_request(method="PATCH", url=f"{self.url}/permissions",
                                       json={"permissions": permissions_data})
+            # missing resources of the permission path are created by Magpie under the service of the first segment
+            self.invalidate_service(permissions_data[0].get("resource_name"))
             if resp.status_code == 200:
                 LOGGER.info("Permission creation was successful.")
             else:
@@ -329,8 +706,14 @@ class Magpie(Handler):
                                     perm_scope: str,
                                     user_name: Optional[str] = "",
                                     grp_name: Optional[str] = "",
+                                    current_permissions: Optional[List[JSON]] = None,
                                     ) -> Union[Response, None]:
+        """
+        Creates a permission of a user or group on a resource, or updates the permission of the same name.
 
+        :param current_permissions: Permissions of the user or group set on the resource if already known, to avoid
+                                    fetching them before applying the permission.
+        """
         if user_name:
             url = f"{self.url}/users/{user_name}/resources/{res_id}/permissions"
         elif grp_name:
@@ -338,14 +721,16 @@ class Magpie(Handler):
         else:
             raise ValueError("Trying to create a permission, but missing an input user name or group name.")
 
-        resp = self._send_request(method="GET", url=url)
-        if resp.status_code != 200:
-            raise MagpieHttpError(f"HttpError {resp.status_code} - Failed to find resource: {resp.text}")
+        if current_permissions is None:
+            resp = self._send_request(method="GET", url=url)
+            if resp.status_code != 200:
+                raise MagpieHttpError(f"HttpError {resp.status_code} - Failed to find resource: {resp.text}")
+            current_permissions = resp.json()["permissions"]
 
         # By default, POST to create a new permission, but check before if the permission already exists, to avoid
         # unnecessary events in Magpie.
         method = "POST"
-        for perm in resp.json()["permissions"]:
+        for perm in current_permissions:
             if perm["name"] == perm_name:
                 if perm["access"] == perm_access and perm["scope"] == perm_scope:
                     LOGGER.debug("Similar permission already exist on resource for user/group.")
@@ -375,12 +760,14 @@ class Magpie(Handler):
                                              perm_name: str,
                                              perm_access: str,
                                              perm_scope: str,
+                                             current_permissions: Optional[List[JSON]] = None,
                                              ) -> Union[Response, None]:
         return self.create_permission_by_res_id(res_id=res_id,
                                                 perm_name=perm_name,
                                                 perm_access=perm_access,
                                                 perm_scope=perm_scope,
-                                                user_name=user_name)
+                                                user_name=user_name,
+                                                current_permissions=current_permissions)
 
     def create_permission_by_grp_and_res_id(self,
                                             grp_name: str,
@@ -388,12 +775,14 @@ class Magpie(Handler):
                                             perm_name: str,
                                             perm_access: str,
                                             perm_scope: str,
+                                            current_permissions: Optional[List[JSON]] = None,
                                             ) -> Union[Response, None]:
         return self.create_permission_by_res_id(res_id=res_id,
                                                 perm_name=perm_name,
                                                 perm_access=perm_access,
                                                 perm_scope=perm_scope,
-                                                grp_name=grp_name)
+                                                grp_name=grp_name,
+                                                current_permissions=current_permissions)
 
     def delete_permission_by_user_and_res_id(self, user_name: str, res_id: int, permission_name: str) -> None:
         resp = self._send_request(method="DELETE",
@@ -446,10 +835,20 @@ class Magpie(Handler):
         if resp.status_code != 201:
             raise MagpieHttpError(f"HttpError {resp.status_code} - Failed to create resource : {resp.text}")
         LOGGER.info("Resource creation was successful.")
-        return resp.json()["resource"]["resource_id"]
+        resource_id: int = resp.json()["resource"]["resource_id"]
+        if parent_id is not None:
+            self.invalidate_resource(parent_id)
+            index = self.geoserver_index
+            if index is not None:
+                index.add(resource_name, resource_type, resource_id, parent_id)
+        return resource_id
 
     def delete_resource(self, resource_id: int) -> None:
         resp = self._send_request(method="DELETE", url=f"{self.url}/resources/{resource_id}")
+        self.invalidate_resource(resource_id, removed=True)
+        index = self.geoserver_index
+        if index is not None:
+            index.remove(resource_id)
         if resp.status_code == 200:
             LOGGER.info("Delete resource successful.")
         elif resp.status_code == 404:
@@ -465,7 +864,9 @@ class Magpie(Handler):
                 or time.time() - self.last_cookies_update_time > COOKIES_TIMEOUT:
             data = {"user_name": self.admin_user, "password": self.admin_password}
             try:
-                resp = requests.post(f"{self.url}/signin", json=data, timeout=self.timeout)
+                # drop any previous authentication cookie kept by the session to avoid sending stale credentials
+                self.http.session.cookies.clear()
+                resp = self.http.request(method="POST", url=f"{self.url}/signin", json=data, timeout=self.timeout)
             except Exception as exc:
                 raise RuntimeError(f"Failed to sign in to Magpie (url: `{self.url}`) with user `{self.admin_user}`. "
                                    f"Exception : {exc}. ")
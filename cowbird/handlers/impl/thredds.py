@@ -32,6 +32,6 @@ class Thredds(Handler):
     def permission_deleted(self, permission: Permission) -> None:
         raise NotImplementedError
 
-    def resync(self) -> None:
+    def resync(self, dry_run: bool = False) -> None:
         # FIXME: this should be implemented in the eventual task addressing the resync mechanism.
         raise NotImplementedError
@@ -0,0 +1,164 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional, TypedDict
+
+from cowbird.utils import get_logger
+
+if TYPE_CHECKING:
+    from cowbird.monitoring.monitor import Monitor
+
+LOGGER = get_logger(__name__)
+
+# Maximum delay in seconds between two searches of the idle monitors
+IDLE_CHECK_INTERVAL = 60.0
+
+MonitorActivatorStats = TypedDict(
+    "MonitorActivatorStats",
+    {
+        "active": int,
+        "activations": int,
+        "deactivations": int,
+    },
+    total=True,
+)
+
+
+class MonitorActivator(object):
+    """
+    Activates the lazy monitors on demand, and deactivates those left idle.
+
+    An inactive recursive monitor only watches the direct entries of its path, instead of all the directories of its
+    tree. It is activated by a thread once an event of its path is received, or when it is requested (e.g.: by a
+    webhook event of the user owning the path), and sends the changes found in its tree since its deactivation, see
+    :meth:`Monitor.activate`.
+
+    Active monitors are kept in least recently used order. An active monitor without any event during the idle timeout
+    is deactivated, as well as the least recently used one when activating a monitor would exceed the maximum count of
+    active monitors.
+    """
+
+    def __init__(self, idle_timeout: float = 0, max_active: int = 0) -> None:
+        """
+        :param idle_timeout: Delay in seconds without any event after which an active monitor is deactivated, or zero
+                             to keep the monitors active.
+        :param max_active: Maximum count of active monitors, or zero for no limit.
+        """
+        self.idle_timeout = idle_timeout
+        self.max_active = max_active
+        self.activations = 0
+        self.deactivations = 0
+        self.__active: Dict["Monitor", float] = OrderedDict()  # monitor -> time of its last event
+        self.__requested: Dict["Monitor", None] = OrderedDict()
+        self.__condition = threading.Condition()
+        # serializes the changes of watches, which are never done while holding the condition, since the observers
+        # notify the events while holding their own lock
+        self.__transition_lock = threading.Lock()
+        self.__thread: Optional[threading.Thread] = None
+
+    def notify(self, monitor: "Monitor") -> None:
+        """
+        Marks a monitor as recently used, requesting its activation if it is inactive.
+        """
+        with self.__condition:
+            if monitor in self.__active:
+                self.__active[monitor] = time.monotonic()
+                self.__active.move_to_end(monitor)  # type: ignore[attr-defined]
+                return
+            if monitor in self.__requested:
+                return
+            self.__requested[monitor] = None
+            self._start_thread()
+            self.__condition.notify()
+
+    def activate(self, monitor: "Monitor") -> bool:
+        """
+        Activates a monitor immediately, deactivating the least recently used ones above the maximum count.
+
+        :returns: True if the monitor is active.
+        """
+        if not monitor.recursive:
+            # the whole path of a monitor that is not recursive is always watched
+            return monitor.is_alive
+        with self.__transition_lock:
+            if monitor.activate():
+                self.activations += 1
+            if not monitor.active or not monitor.is_alive:
+                return False
+            evicted: List["Monitor"] = []
+            with self.__condition:
+                self.__active[monitor] = time.monotonic()
+                self.__active.move_to_end(monitor)  # type: ignore[attr-defined]
+                while self.max_active and len(self.__active) > self.max_active:
+                    evicted.append(self.__active.popitem(last=False)[0])  # type: ignore[call-arg]
+                self._start_thread()
+            for evicted_monitor in evicted:
+                self._deactivate(evicted_monitor)
+        return True
+
+    def deactivate_idle(self) -> int:
+        """
+        Deactivates the monitors without any event during the idle timeout.
+
+        :returns: Number of deactivated monitors.
+        """
+        if not self.idle_timeout:
+            return 0
+        idle_time = time.monotonic() - self.idle_timeout
+        idle: List["Monitor"] = []
+        with self.__condition:
+            for monitor, last_time in self.__active.items():
+                if last_time > idle_time:
+                    break
+                idle.append(monitor)
+            for monitor in idle:
+                del self.__active[monitor]
+        with self.__transition_lock:
+            for monitor in idle:
+                self._deactivate(monitor)
+        return len(idle)
+
+    def remove(self, monitor: "Monitor") -> None:
+        """
+        Forgets a monitor that is stopped.
+        """
+        with self.__condition:
+            self.__active.pop(monitor, None)
+            self.__requested.pop(monitor, None)
+
+    def clear(self) -> None:
+        with self.__condition:
+            self.__active.clear()
+            self.__requested.clear()
+
+    def _deactivate(self, monitor: "Monitor") -> None:
+        if monitor.deactivate():
+            self.deactivations += 1
+
+    def _start_thread(self) -> None:
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self._run, name="MonitorActivator", daemon=True)
+            self.__thread.start()
+
+    def _run(self) -> None:
+        interval = min(self.idle_timeout, IDLE_CHECK_INTERVAL) if self.idle_timeout else None
+        while True:
+            with self.__condition:
+                if not self.__requested:
+                    self.__condition.wait(interval)
+                requested = list(self.__requested)
+                self.__requested.clear()
+            try:
+                for monitor in requested:
+                    self.activate(monitor)
+                self.deactivate_idle()
+            except Exception as exc:  # noqa
+                LOGGER.error("Failed to update the active monitors : [%r]", exc, exc_info=True)
+
+    def stats(self) -> MonitorActivatorStats:
+        with self.__condition:
+            return {
+                "active": len(self.__active),
+                "activations": self.activations,
+                "deactivations": self.deactivations,
+            }
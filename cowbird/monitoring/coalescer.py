@@ -0,0 +1,180 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cowbird.monitoring.fsmonitor import FSEvent, FSEventType
+from cowbird.utils import SingletonMeta, get_logger
+
+LOGGER = get_logger(__name__)
+
+# A path is delivered at the latest after this many debounce windows, even if its events never stop
+DEBOUNCE_MAX_WINDOWS = 10
+
+
+class PathEvents(object):
+    """
+    Pending events of a single path, reduced to the minimal sequence of events describing its changes.
+    """
+    __slots__ = ["deleted", "created", "modified", "first_time", "deadline"]
+
+    def __init__(self, first_time: float) -> None:
+        self.deleted = False  # the path that existed before the window was deleted
+        self.created = False  # the path was created (or re-created) during the window
+        self.modified = False  # the path that existed before the window was modified
+        self.first_time = first_time
+        self.deadline = first_time
+
+    def add(self, event_type: FSEventType) -> bool:
+        """
+        Merges a new event with the pending ones.
+
+        :returns: False if the events cancel each other, such that nothing is left to deliver for the path.
+        """
+        if event_type == FSEventType.CREATED:
+            self.created = True
+            self.modified = False
+        elif event_type == FSEventType.MODIFIED:
+            if self.deleted and not self.created:
+                # modified after being deleted, the path was re-created in between
+                self.created = True
+            elif not self.created:
+                self.modified = True
+        elif self.created:
+            # created then deleted during the window, nothing happened from the point of view of the callback
+            self.created = False
+            return self.deleted
+        else:
+            self.deleted = True
+            self.modified = False
+        return True
+
+    def events(self) -> List[FSEventType]:
+        events = []
+        if self.deleted:
+            events.append(FSEventType.DELETED)
+        if self.created:
+            events.append(FSEventType.CREATED)
+        elif self.modified:
+            events.append(FSEventType.MODIFIED)
+        return events
+
+
+class DebounceScheduler(metaclass=SingletonMeta):
+    """
+    Single thread flushing the pending events of all the coalescers when their debounce window expires.
+    """
+
+    def __init__(self) -> None:
+        self.__queue: List[Tuple[float, int, "EventCoalescer"]] = []
+        self.__counter = itertools.count()
+        self.__condition = threading.Condition()
+        self.__thread: Optional[threading.Thread] = None
+
+    def schedule(self, coalescer: "EventCoalescer", deadline: float) -> None:
+        with self.__condition:
+            heapq.heappush(self.__queue, (deadline, next(self.__counter), coalescer))
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self._run, name="DebounceScheduler", daemon=True)
+                self.__thread.start()
+            self.__condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self.__condition:
+                while not self.__queue or self.__queue[0][0] > time.monotonic():
+                    timeout = self.__queue[0][0] - time.monotonic() if self.__queue else None
+                    self.__condition.wait(timeout)
+                _, _, coalescer = heapq.heappop(self.__queue)
+            coalescer.flush_due()
+
+
+class EventCoalescer(object):
+    """
+    Coalesces the file system events of each path during a debounce window before delivering them by batch.
+
+    The window of a path is extended by every new event of that path, up to :data:`DEBOUNCE_MAX_WINDOWS` windows
+    after its first event. Events of a path are merged as follows:
+
+    - a creation followed by modifications is delivered as a single creation;
+    - many modifications are delivered as a single modification;
+    - a creation followed by a deletion is dropped;
+    - a deletion followed by a creation is delivered as a deletion and a creation.
+
+    Paths are delivered in the order of their first event.
+    """
+
+    def __init__(self, window: float, deliver: Callable[[List[FSEvent]], None]) -> None:
+        """
+        :param window: Delay in seconds without any new event of a path before delivering its events.
+        :param deliver: Function receiving each batch of coalesced events.
+        """
+        self.window = window
+        self.deliver = deliver
+        self.__pending: Dict[str, PathEvents] = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__scheduled = False
+
+    @property
+    def pending(self) -> int:
+        return len(self.__pending)
+
+    def add(self, path: str, event_type: FSEventType) -> None:
+        now = time.monotonic()
+        with self.__lock:
+            path_events = self.__pending.get(path)
+            if path_events is None:
+                path_events = self.__pending[path] = PathEvents(now)
+            if not path_events.add(event_type):
+                del self.__pending[path]
+                return
+            path_events.deadline = min(now + self.window, path_events.first_time + self.window * DEBOUNCE_MAX_WINDOWS)
+            # deadlines only move forward, the scheduled flush is always early enough
+            if self.__scheduled:
+                return
+            self.__scheduled = True
+        DebounceScheduler().schedule(self, path_events.deadline)
+
+    def _pop_events(self, due_time: Optional[float]) -> Tuple[List[FSEvent], Optional[float]]:
+        """
+        Removes the events of the paths due at the given time, or of all paths if no time is given.
+
+        :returns: Removed events and earliest deadline of the remaining paths.
+        """
+        batch: List[FSEvent] = []
+        next_deadline = None
+        with self.__lock:
+            for path, path_events in list(self.__pending.items()):
+                if due_time is None or path_events.deadline <= due_time:
+                    batch.extend(FSEvent(path, event_type) for event_type in path_events.events())
+                    del self.__pending[path]
+                elif next_deadline is None or path_events.deadline < next_deadline:
+                    next_deadline = path_events.deadline
+            self.__scheduled = next_deadline is not None
+        return batch, next_deadline
+
+    def flush_due(self) -> None:
+        """
+        Delivers the events of the paths whose window expired, and schedules the next flush if any path remains.
+        """
+        batch, next_deadline = self._pop_events(time.monotonic())
+        if next_deadline is not None:
+            DebounceScheduler().schedule(self, next_deadline)
+        if batch:
+            self._deliver(batch)
+
+    def flush(self) -> None:
+        """
+        Delivers immediately the events of all pending paths.
+        """
+        batch, _ = self._pop_events(None)
+        if batch:
+            self._deliver(batch)
+
+    def _deliver(self, batch: List[FSEvent]) -> None:
+        try:
+            self.deliver(batch)
+        except Exception as exc:  # noqa
+            LOGGER.error("Failed to deliver a batch of [%s] coalesced events : [%r]", len(batch), exc, exc_info=True)
@@ -0,0 +1,369 @@
+import itertools
+import threading
+import time
+import zlib
+from collections import deque
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple, TypedDict
+
+from cowbird.monitoring.fsmonitor import FSEvent, FSEventType
+from cowbird.utils import ExtendedEnum, SingletonMeta, get_logger
+
+if TYPE_CHECKING:
+    from cowbird.database.stores import MonitorEventJournalStore, MonitorEventStore
+    from cowbird.monitoring.monitor import Monitor
+
+LOGGER = get_logger(__name__)
+
+DEFAULT_QUEUE_SIZE = 1000
+
+# Maximum number of events sent to a callback at once by a worker
+DISPATCH_MAX_BATCH = 100
+
+QueuedEvent = Tuple[
+    "Monitor",
+    FSEvent,
+    Optional[int],  # sequence number of the event in the journal
+]
+MonitorResolver = Callable[
+    [
+        str,  # callback qualified class name
+        str,  # monitored path
+    ],
+    Optional["Monitor"]
+]
+EventDispatcherStats = TypedDict(
+    "EventDispatcherStats",
+    {
+        "workers": int,
+        "queue_size": int,
+        "overflow_policy": str,
+        "queued": int,
+        "spilled": int,
+        "max_queued": int,
+        "received": int,
+        "processed": int,
+        "overflows": int,
+        "blocked_seconds": float,
+        "dropped": int,
+        "spilled_total": int,
+        "replayed": int,
+    },
+    total=True,
+)
+
+
+class OverflowPolicy(ExtendedEnum):
+    """
+    Behavior of the :class:`EventDispatcher` when a new event is received while the queue of its worker is full.
+    """
+    BLOCK = "block"              # wait for space in the queue, slowing down the observer
+    DROP_OLDEST = "drop-oldest"  # discard the oldest queued event
+    SPILL = "spill"              # save the event in the database until the worker catches up
+
+
+class DispatchShard(object):
+    """
+    Bounded queue of events processed by a single worker thread.
+    """
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.events: Deque[QueuedEvent] = deque()
+        self.condition = threading.Condition()
+        self.spilled = 0     # events of this shard currently saved in the database
+        self.busy = False    # worker is currently sending events
+        self.overflowing = False
+        self.thread: Optional[threading.Thread] = None
+
+
+class EventDispatcher(metaclass=SingletonMeta):
+    """
+    Queue between the observers and the callbacks of the monitors, drained by a pool of worker threads.
+
+    Since the observer threads only have to queue the events, a slow callback does not delay the reading of the file
+    system events, which could otherwise overflow the kernel queue and be lost. Each event is assigned to a worker
+    according to its path, such that the events of a same path are always sent to the callbacks in the order in which
+    they occurred. Events of different paths can be sent concurrently by different workers.
+
+    The queue of each worker holds at most ``queue_size`` events, after which new events are handled according to the
+    :class:`OverflowPolicy`. With the ``spill`` policy, events are saved in the :class:`MonitorEventStore` once the
+    queue is full, and all subsequent events of the worker are also saved there until the worker has caught up, in
+    order to preserve their order.
+
+    Without any worker, events are sent directly to the callbacks by the thread that received them.
+
+    When a :class:`MonitorEventJournalStore` is given, each event is saved in the journal when it is received, and
+    acknowledged once it was sent to its callback, whether the callback succeeded or not. The events that were not
+    acknowledged because of a crash or a restart can then be replayed with :meth:`replay_journal`.
+
+    The dispatcher is a singleton, its configuration is defined by the first instantiation, which is done by
+    :class:`Monitoring`.
+    """
+
+    def __init__(self,
+                 workers: int = 0,
+                 queue_size: int = DEFAULT_QUEUE_SIZE,
+                 overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+                 spill_store: Optional["MonitorEventStore"] = None,
+                 monitor_resolver: Optional[MonitorResolver] = None,
+                 journal: Optional["MonitorEventJournalStore"] = None,
+                 ) -> None:
+        """
+        :param workers: Number of worker threads sending the events to the callbacks.
+        :param queue_size: Maximum number of events queued in memory for each worker.
+        :param overflow_policy: Handling of the events received while the queue of their worker is full.
+        :param spill_store: Store saving the overflowing events, required by the ``spill`` policy.
+        :param monitor_resolver: Function retrieving the monitor of the events reloaded from the stores.
+        :param journal: Store journaling the events until they are sent, requires a monitor resolver to replay them.
+        """
+        if overflow_policy == OverflowPolicy.SPILL and (spill_store is None or monitor_resolver is None):
+            LOGGER.warning("Cannot spill the overflowing monitoring events without a store, blocking instead.")
+            overflow_policy = OverflowPolicy.BLOCK
+        self.workers = workers
+        self.queue_size = max(1, queue_size)
+        self.overflow_policy = overflow_policy
+        self.spill_store = spill_store
+        self.monitor_resolver = monitor_resolver
+        self.journal = journal
+        self.__shards = [DispatchShard(index) for index in range(workers)]
+        self.__counter = itertools.count(spill_store.get_next_seq() if spill_store else 0)
+        self.__journal_counter = itertools.count(journal.get_next_seq() if journal else 0)
+        self.__started = False
+        self.__lock = threading.Lock()
+        self.__metrics: Dict[str, Any] = {
+            "max_queued": 0,
+            "received": 0,
+            "processed": 0,
+            "overflows": 0,
+            "blocked_seconds": 0.0,
+            "dropped": 0,
+            "spilled_total": 0,
+            "replayed": 0,
+        }
+        if spill_store:
+            # events left over by a previous process are sent once the workers are started
+            spill_store.assign_events(workers)
+            for shard in self.__shards:
+                shard.spilled = spill_store.count_events(shard.index)
+
+    @staticmethod
+    def _get_path_key(path: str) -> int:
+        """
+        Stable hash of a path, used to always assign the events of a path to the same worker, even after a restart.
+        """
+        return zlib.crc32(path.encode("utf-8"))
+
+    def _count(self, metric: str, value: float = 1) -> None:
+        with self.__lock:
+            self.__metrics[metric] += value
+
+    def start(self) -> None:
+        """
+        Starts the worker threads, if they are not already started.
+        """
+        with self.__lock:
+            if self.__started:
+                return
+            self.__started = True
+        for shard in self.__shards:
+            shard.thread = threading.Thread(target=self._run, args=(shard,),
+                                            name=f"EventDispatcher-{shard.index}", daemon=True)
+            shard.thread.start()
+
+    def put(self, monitor: "Monitor", events: List[FSEvent], journal_seqs: Optional[List[int]] = None) -> None:
+        """
+        Queues the events of a monitor, or sends them directly to its callback if there is no worker.
+
+        :param monitor: Monitor that received the events.
+        :param events: Events to send to the callback of the monitor.
+        :param journal_seqs: Sequence numbers of events already saved in the journal, they are journaled otherwise.
+        """
+        self._count("received", len(events))
+        seqs: List[Optional[int]] = [None] * len(events)
+        if self.journal:
+            if journal_seqs is None:
+                journal_seqs = [next(self.__journal_counter) for _ in events]
+                self.journal.save_events(journal_seqs, monitor.callback, monitor.path,
+                                         [(event.path, event.type.value) for event in events])
+            seqs = list(journal_seqs)
+        queued = [(monitor, event, seq) for event, seq in zip(events, seqs)]
+        if not self.__shards:
+            self._send(queued)
+            return
+        self.start()
+        shard_events: Dict[int, List[QueuedEvent]] = {}
+        for queued_event in queued:
+            shard_events.setdefault(self._get_path_key(queued_event[1].path) % self.workers, []).append(queued_event)
+        for index, batch in shard_events.items():
+            self._put_shard(self.__shards[index], batch)
+
+    def _put_shard(self, shard: DispatchShard, events: List[QueuedEvent]) -> None:
+        with shard.condition:
+            for queued_event in events:
+                if shard.spilled == 0 and len(shard.events) >= self.queue_size:
+                    self._overflow(shard)
+                if self.overflow_policy == OverflowPolicy.SPILL and (shard.spilled or
+                                                                     len(shard.events) >= self.queue_size):
+                    self._spill(shard, queued_event)
+                    continue
+                shard.events.append(queued_event)
+            queued = len(shard.events)
+            shard.condition.notify_all()
+        with self.__lock:
+            self.__metrics["max_queued"] = max(self.__metrics["max_queued"], queued)
+
+    def _overflow(self, shard: DispatchShard) -> None:
+        """
+        Applies the overflow policy to a full queue, while holding its lock.
+        """
+        self._count("overflows")
+        if not shard.overflowing:
+            shard.overflowing = True
+            LOGGER.warning("Queue of the monitoring events worker [%s] is full (%s events), applying the [%s] policy.",
+                           shard.index, self.queue_size, self.overflow_policy.value)
+        if self.overflow_policy == OverflowPolicy.BLOCK:
+            start = time.perf_counter()
+            while len(shard.events) >= self.queue_size:
+                # wake up the worker for the events queued by this call before waiting for it
+                shard.condition.notify_all()
+                shard.condition.wait()
+            self._count("blocked_seconds", time.perf_counter() - start)
+        elif self.overflow_policy == OverflowPolicy.DROP_OLDEST:
+            monitor, event, seq = shard.events.popleft()
+            self._drop(seq)
+            LOGGER.debug("Dropped the event [%s] of the monitor [path=%s, callback=%s].",
+                         event, monitor.path, monitor.callback)
+
+    def _drop(self, *journal_seqs: Optional[int]) -> None:
+        """
+        Counts dropped events, which are acknowledged in the journal since they must not be replayed.
+        """
+        self._count("dropped", len(journal_seqs))
+        self._acknowledge(journal_seqs)
+
+    def _acknowledge(self, journal_seqs: Iterable[Optional[int]]) -> None:
+        seqs = [seq for seq in journal_seqs if seq is not None]
+        if seqs:
+            self.journal.acknowledge_events(seqs)
+
+    def _spill(self, shard: DispatchShard, queued_event: QueuedEvent) -> None:
+        monitor, event, seq = queued_event
+        self.spill_store.save_event(next(self.__counter), shard.index, self._get_path_key(event.path),
+                                    monitor.callback, monitor.path, event.path, event.type.value, journal_seq=seq)
+        shard.spilled += 1
+        self._count("spilled_total")
+
+    def _load_spilled(self, shard: DispatchShard) -> List[QueuedEvent]:
+        """
+        Removes the oldest events saved in the database for a worker, and resolves their monitor.
+        """
+        entries = self.spill_store.pop_events(shard.index, DISPATCH_MAX_BATCH)
+        loaded: List[QueuedEvent] = []
+        for entry in entries:
+            monitor = self.monitor_resolver(entry["callback"], entry["monitor_path"])
+            if monitor is None:
+                LOGGER.warning("Dropped the spilled event [%s] of the [%s] path, since its monitor "
+                               "[path=%s, callback=%s] is not registered anymore.",
+                               entry["type"], entry["path"], entry["monitor_path"], entry["callback"])
+                self._drop(entry.get("journal_seq"))
+                continue
+            loaded.append((monitor, FSEvent(entry["path"], FSEventType(entry["type"])), entry.get("journal_seq")))
+        with shard.condition:
+            shard.spilled = max(0, shard.spilled - len(entries)) if entries else 0
+        return loaded
+
+    def _run(self, shard: DispatchShard) -> None:
+        while True:
+            with shard.condition:
+                while not shard.events and not shard.spilled:
+                    shard.overflowing = False
+                    shard.condition.wait()
+                events = [shard.events.popleft() for _ in range(min(len(shard.events), DISPATCH_MAX_BATCH))]
+                shard.busy = True
+                shard.condition.notify_all()
+            try:
+                if not events:
+                    # queued events are older than the spilled ones, only load these once the queue is empty
+                    events = self._load_spilled(shard)
+                self._send(events)
+            except Exception as exc:  # noqa
+                LOGGER.error("Failed to send the monitoring events of the worker [%s] : [%r]",
+                             shard.index, exc, exc_info=True)
+            finally:
+                with shard.condition:
+                    shard.busy = False
+                    shard.condition.notify_all()
+
+    def _send(self, events: List[QueuedEvent]) -> None:
+        """
+        Sends the events to their callbacks, grouping the consecutive events of a same monitor in a single batch.
+        """
+        for monitor, monitor_events in itertools.groupby(events, key=lambda queued: queued[0]):
+            queued_events = list(monitor_events)
+            monitor.send_events([event for _, event, _ in queued_events])
+            self._count("processed", len(queued_events))
+            self._acknowledge(seq for _, _, seq in queued_events)
+
+    def replay_journal(self) -> int:
+        """
+        Queues again the journaled events that were not acknowledged, in the order in which they were received.
+
+        This must be done before the monitors start receiving new events, to preserve the order of the events of a path.
+        Events of a monitor that is not registered anymore are dropped.
+
+        :returns: Number of replayed events.
+        """
+        if not self.journal:
+            return 0
+        replayed = 0
+        entries = self.journal.list_pending_events()
+        for (callback, monitor_path), monitor_entries in itertools.groupby(
+                entries, key=lambda entry: (entry["callback"], entry["monitor_path"])):
+            monitor_entries = list(monitor_entries)
+            monitor = self.monitor_resolver(callback, monitor_path)
+            if monitor is None:
+                LOGGER.warning("Dropped [%s] journaled events, since their monitor [path=%s, callback=%s] is not "
+                               "registered anymore.", len(monitor_entries), monitor_path, callback)
+                self._drop(*[entry["seq"] for entry in monitor_entries])
+                continue
+            self.put(monitor, [FSEvent(entry["path"], FSEventType(entry["type"])) for entry in monitor_entries],
+                     journal_seqs=[entry["seq"] for entry in monitor_entries])
+            replayed += len(monitor_entries)
+        self._count("replayed", replayed)
+        return replayed
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until all the queued and spilled events have been sent to the callbacks.
+
+        :returns: False if some events are still pending after the timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for shard in self.__shards:
+            with shard.condition:
+                while shard.events or shard.spilled or shard.busy:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    shard.condition.wait(remaining)
+        return True
+
+    def stats(self) -> EventDispatcherStats:
+        """
+        Reports the current depth of the queues and the counters of the events handled since the dispatcher started.
+        """
+        queued = spilled = 0
+        for shard in self.__shards:
+            with shard.condition:
+                queued += len(shard.events)
+                spilled += shard.spilled
+        with self.__lock:
+            metrics = dict(self.__metrics)
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "overflow_policy": self.overflow_policy.value,
+            "queued": queued,
+            "spilled": spilled,
+            **metrics,  # type: ignore[typeddict-item]
+        }
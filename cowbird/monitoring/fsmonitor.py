@@ -1,5 +1,26 @@
 import abc
-from typing import Optional
+from typing import List, NamedTuple, Optional
+
+from cowbird.utils import ExtendedEnum, get_logger
+
+LOGGER = get_logger(__name__)
+
+
+class FSEventType(ExtendedEnum):
+    """
+    Types of file system events notified to a :class:`FSMonitor`.
+    """
+    CREATED = "created"
+    DELETED = "deleted"
+    MODIFIED = "modified"
+
+
+class FSEvent(NamedTuple):
+    """
+    File system event of a path.
+    """
+    path: str
+    type: FSEventType
 
 
 class FSMonitor(abc.ABC):
@@ -41,3 +62,26 @@ class FSMonitor(abc.ABC):
         :param path: Absolute path of a new file/directory
         """
         raise NotImplementedError
+
+    def on_events(self, events: List[FSEvent]) -> None:
+        """
+        Called with a batch of events, ordered as they occurred.
+
+        Implementations can override this method to process many events at once, for example to share the requests
+        required by many paths. By default, each event is sent to the corresponding per-path method, an error for an
+        event being logged without preventing the following events from being processed.
+
+        :param events: Events of the batch. When events are coalesced (see :class:`EventCoalescer`), a path appears at
+                       most once, except for a deletion followed by a new creation of the same path.
+        """
+        for event in events:
+            try:
+                if event.type == FSEventType.CREATED:
+                    self.on_created(event.path)
+                elif event.type == FSEventType.DELETED:
+                    self.on_deleted(event.path)
+                else:
+                    self.on_modified(event.path)
+            except Exception as exc:  # noqa
+                LOGGER.error("Failed to handle the [%s] event of the path [%s] : [%r]",
+                             event.type.value, event.path, exc, exc_info=True)
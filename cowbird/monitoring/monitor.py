@@ -1,6 +1,7 @@
 import importlib
 import os
-from typing import Optional, Type, TypedDict, Union
+import time
+from typing import Iterator, List, Optional, Type, TypedDict, Union
 
 from watchdog.events import (
     DirCreatedEvent,
@@ -11,16 +12,22 @@ from watchdog.events import (
     FileDeletedEvent,
     FileModifiedEvent,
     FileMovedEvent,
+    FileSystemEvent,
     FileSystemEventHandler
 )
-from watchdog.observers import Observer
-from watchdog.observers.api import BaseObserver
 
-from cowbird.monitoring.fsmonitor import FSMonitor
+from cowbird.monitoring.activation import MonitorActivator
+from cowbird.monitoring.coalescer import EventCoalescer
+from cowbird.monitoring.dispatcher import EventDispatcher
+from cowbird.monitoring.fsmonitor import FSEvent, FSEventType, FSMonitor
+from cowbird.monitoring.observer import ObserverPool
 from cowbird.utils import bytes2str, get_logger
 
 LOGGER = get_logger(__name__)
 
+# Delay subtracted from the watermarks, covering the latency of the observers and the precision of the file times
+WATERMARK_MARGIN = 1.0
+
 MonitorKey = TypedDict(
     "MonitorKey",
     {
@@ -35,6 +42,8 @@ MonitorParameters = TypedDict(
         "callback": str,
         "path": str,
         "recursive": bool,
+        "debounce": float,
+        "watermark": Optional[float],
     },
     total=True,
 )
@@ -52,7 +61,13 @@ class Monitor(FileSystemEventHandler):
     send events to :class:`FSMonitor` callback.
     """
 
-    def __init__(self, path: str, recursive: bool, callback: Union[FSMonitor, Type[FSMonitor], str]) -> None:
+    def __init__(self,
+                 path: str,
+                 recursive: bool,
+                 callback: Union[FSMonitor, Type[FSMonitor], str],
+                 debounce: float = 0,
+                 watermark: Optional[float] = None,
+                 ) -> None:
         """
         Initialize the path monitoring and ready to be started.
 
@@ -62,6 +77,10 @@ class Monitor(FileSystemEventHandler):
                          Can be an object, a class type implementing :class:`FSMonitor` or a string containing module
                          and class name. The class type or string is used to instantiate an object using the class
                          method :meth:`FSMonitor.get_instance()`
+        :param debounce: Delay in seconds during which the events of a same path are coalesced before being sent to the
+                         callback, see :class:`EventCoalescer`. Events are sent immediately if zero.
+        :param watermark: Time until which all the events of the path were sent to the callback, used to find the
+                          changes that occurred while the path was not monitored, see :meth:`scan_changes`.
         """
         if not os.path.exists(path):
             raise MonitorException(f"Cannot monitor the following file or directory [{path}]: "
@@ -69,7 +88,14 @@ class Monitor(FileSystemEventHandler):
         self.__src_path = path
         self.__recursive = recursive
         self.__callback = self.get_fsmonitor_instance(callback)
-        self.__event_observer: Optional[BaseObserver] = None
+        self.__observer_pool: Optional[ObserverPool] = None
+        self.__coalescer: Optional[EventCoalescer] = None
+        self.__active = True
+        self.__inactive_since: Optional[float] = None
+        self.debounce = debounce
+        self.watermark = watermark
+        # notified of the events of a lazy monitor, see :meth:`start`
+        self.activator: Optional[MonitorActivator] = None
 
     @staticmethod
     def get_fsmonitor_instance(callback: Union[FSMonitor, Type[FSMonitor], str]) -> FSMonitor:
@@ -109,7 +135,35 @@ class Monitor(FileSystemEventHandler):
         if self.__recursive != value:
             self.stop()
             self.__recursive = value
-            self.start()
+            self.start(active=self.__active)
+
+    @property
+    def active(self) -> bool:
+        """
+        Indicates if the whole tree of the path is watched, which is always the case if the monitor is not recursive.
+        """
+        return self.__active
+
+    @property
+    def _watch_recursive(self) -> bool:
+        return self.__recursive and self.__active
+
+    @property
+    def debounce(self) -> float:
+        return self.__coalescer.window if self.__coalescer else 0
+
+    @debounce.setter
+    def debounce(self, value: float) -> None:
+        if self.__coalescer:
+            self.__coalescer.flush()
+        self.__coalescer = EventCoalescer(value, self._queue_events) if value > 0 else None
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of paths with events waiting for the debounce delay.
+        """
+        return self.__coalescer.pending if self.__coalescer else 0
 
     @property
     def path(self) -> str:
@@ -133,31 +187,39 @@ class Monitor(FileSystemEventHandler):
     @property
     def is_alive(self) -> bool:
         """
-        Returns true if the monitor observer exists and is currently running.
+        Returns true if the monitor is scheduled on a currently running observer.
         """
-        return bool(self.__event_observer) and self.__event_observer.is_alive()
+        return (bool(self.__observer_pool)
+                and self.__observer_pool.is_scheduled(self, self.__src_path, self._watch_recursive))
 
     def params(self) -> MonitorParameters:
         """
         Return a dict serializing this object from which a new :class:`Monitor` can be recreated using the init
         function.
         """
-        return {"callback": self.callback, "path": self.path, "recursive": self.__recursive}
+        return {"callback": self.callback, "path": self.path, "recursive": self.__recursive, "debounce": self.debounce,
+                "watermark": self.watermark}
 
-    def start(self) -> None:
+    def start(self, active: bool = True) -> None:
         """
         Start the monitoring so that events can be fired.
+
+        The path is watched by one of the observers shared by all monitors, see :class:`ObserverPool`.
+
+        :param active: Watch the whole tree of a recursive monitor. Otherwise, only the direct entries of its path are
+                       watched until it is activated, see :meth:`activate`.
         """
         if self.is_alive:
             msg = f"This monitor [path={self.path}, callback={self.callback}] is already started"
             LOGGER.error(msg)
             raise MonitorException(msg)
-        self.__event_observer = Observer()
-        self.__event_observer.schedule(self,
-                                       self.__src_path,
-                                       recursive=self.__recursive)
+        self.__active = active or not self.__recursive
+        if not self.__active:
+            self.__inactive_since = time.time() - WATERMARK_MARGIN
+        # keep the pool used to schedule this monitor, in case the singleton gets replaced before stopping it
+        self.__observer_pool = ObserverPool()
         try:
-            self.__event_observer.start()
+            self.__observer_pool.schedule(self, self.__src_path, self._watch_recursive)
         except OSError:
             LOGGER.warning("Cannot monitor the following file or directory [%s]: No such file or directory",
                            self.__src_path)
@@ -165,10 +227,140 @@ class Monitor(FileSystemEventHandler):
     def stop(self) -> None:
         """
         Stop the monitoring so that events stop to be fired.
+
+        Only the watch of this monitor is removed, the shared observer keeps running for the other monitors. Events
+        still waiting for their debounce delay are sent immediately.
+        """
+        if self.__observer_pool:
+            self.__observer_pool.unschedule(self, self.__src_path, self._watch_recursive)
+            self.__observer_pool = None
+        if self.__coalescer:
+            self.__coalescer.flush()
+
+    def activate(self) -> bool:
+        """
+        Watches the whole tree of an inactive monitor, and sends the changes found in its tree since its deactivation.
+
+        As for :meth:`catch_up`, the entries deleted while the monitor was inactive cannot be found, and the changes of
+        the direct entries of the path already sent while it was inactive may be sent again.
+
+        :returns: True if the monitor was activated.
+        """
+        if self.__active or not self.__observer_pool:
+            return False
+        try:
+            self.__observer_pool.schedule(self, self.__src_path, True)
+        except OSError as exc:
+            LOGGER.warning("Cannot activate the monitor [path=%s, callback=%s] : [%r]", self.path, self.callback, exc)
+            return False
+        # the direct entries stay watched until the whole tree is, such that none of their events is missed
+        self.__observer_pool.unschedule(self, self.__src_path, False)
+        self.__active = True
+        self.catch_up(self.__inactive_since)
+        return True
+
+    def deactivate(self) -> bool:
         """
-        self.__event_observer.stop()
-        self.__event_observer.join()
-        self.__event_observer = None
+        Watches only the direct entries of the path of an active recursive monitor.
+
+        :returns: True if the monitor was deactivated.
+        """
+        if not self._watch_recursive or not self.__observer_pool:
+            return False
+        try:
+            self.__observer_pool.schedule(self, self.__src_path, False)
+        except OSError as exc:
+            LOGGER.warning("Cannot deactivate the monitor [path=%s, callback=%s] : [%r]", self.path, self.callback, exc)
+            return False
+        self.__observer_pool.unschedule(self, self.__src_path, True)
+        self.__active = False
+        self.__inactive_since = time.time() - WATERMARK_MARGIN
+        return True
+
+    def scan_changes(self, since: float) -> Iterator[FSEvent]:
+        """
+        Browses the monitored path to find the entries that were created or modified since a given time.
+
+        Changed files are reported as created and changed directories as modified, since their creation time is not
+        available. Deleted entries cannot be found, but the modification of their parent directory is reported.
+
+        :param since: Time from which the status changes and modifications of the entries are reported.
+        """
+        try:
+            root_stat = os.stat(self.__src_path)
+        except OSError:
+            return
+        if max(root_stat.st_mtime, root_stat.st_ctime) > since:
+            yield FSEvent(self.__src_path, FSEventType.MODIFIED)
+        dirs = [self.__src_path]
+        while dirs:
+            try:
+                with os.scandir(dirs.pop()) as entries:
+                    for entry in entries:
+                        entry_stat = entry.stat(follow_symlinks=False)
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        if is_dir and self.__recursive:
+                            dirs.append(entry.path)
+                        if max(entry_stat.st_mtime, entry_stat.st_ctime) > since:
+                            yield FSEvent(entry.path, FSEventType.MODIFIED if is_dir else FSEventType.CREATED)
+            except OSError as exc:  # removed in the meantime or not accessible
+                LOGGER.warning("Cannot scan the changes of a directory of the monitor [path=%s, callback=%s] : [%s]",
+                               self.path, self.callback, exc)
+
+    def catch_up(self, since: Optional[float] = None) -> int:
+        """
+        Sends to the callback the changes that occurred since the watermark of the monitor, if any.
+
+        :param since: Time from which the changes are sent instead of the watermark.
+        :returns: Number of changed entries found.
+        """
+        since = self.watermark if since is None else since
+        if since is None:
+            return 0
+        count = 0
+        for event in self.scan_changes(since):
+            self._notify(event.path, event.type)
+            count += 1
+        return count
+
+    def _notify(self, path: str, event_type: FSEventType) -> None:
+        """
+        Sends an event to the callback, or to the coalescer if events are debounced.
+        """
+        if self.__coalescer:
+            self.__coalescer.add(path, event_type)
+        else:
+            self._queue_events([FSEvent(path, event_type)])
+
+    def _queue_events(self, events: List[FSEvent]) -> None:
+        """
+        Queues a batch of events to be sent to the callback by the workers of the :class:`EventDispatcher`.
+        """
+        EventDispatcher().put(self, events)
+
+    def send_events(self, events: List[FSEvent]) -> None:
+        """
+        Sends a batch of events to the callback.
+        """
+        try:
+            self.__callback.on_events(events)
+        except Exception as exc:  # noqa
+            LOGGER.error("Failed to handle a batch of [%s] events of the monitor [path=%s, callback=%s] : [%r]",
+                         len(events), self.path, self.callback, exc, exc_info=True)
+
+    def dispatch(self, event: FileSystemEvent) -> None:
+        """
+        Dispatches an event to the callback, logging its errors instead of raising them.
+
+        Since the observer thread is shared by many monitors, an error of a single callback must not stop it.
+        """
+        if self.activator and self.__recursive:
+            self.activator.notify(self)
+        try:
+            super().dispatch(event)
+        except Exception as exc:  # noqa
+            LOGGER.error("Failed to handle the event [%s] of the monitor [path=%s, callback=%s] : [%r]",
+                         event, self.path, self.callback, exc, exc_info=True)
 
     def on_moved(self, event: Union[DirMovedEvent, FileMovedEvent]) -> None:
         """
@@ -179,13 +371,13 @@ class Monitor(FileSystemEventHandler):
         event_dest_path = bytes2str(event.dest_path)
         event_src_path = bytes2str(event.src_path)
         self_src_path = bytes2str(self.__src_path)
-        self.__callback.on_deleted(event_src_path)
+        self._notify(event_src_path, FSEventType.DELETED)
         # If moved outside of __src_path don't send a create event
         if event_dest_path.startswith(self_src_path):
             # If move under subdirectory and recursive is False don't send a
             # create event neither
             if self.__recursive or os.path.dirname(event_dest_path) == os.path.dirname(self_src_path):
-                self.__callback.on_created(event_dest_path)
+                self._notify(event_dest_path, FSEventType.CREATED)
 
     def on_created(self, event: Union[DirCreatedEvent, FileCreatedEvent]) -> None:
         """
@@ -193,7 +385,7 @@ class Monitor(FileSystemEventHandler):
 
         :param event: Event representing file/directory creation.
         """
-        self.__callback.on_created(bytes2str(event.src_path))
+        self._notify(bytes2str(event.src_path), FSEventType.CREATED)
 
     def on_deleted(self, event: Union[DirDeletedEvent, FileDeletedEvent]) -> None:
         """
@@ -201,7 +393,7 @@ class Monitor(FileSystemEventHandler):
 
         :param event: Event representing file/directory deletion.
         """
-        self.__callback.on_deleted(bytes2str(event.src_path))
+        self._notify(bytes2str(event.src_path), FSEventType.DELETED)
 
     def on_modified(self, event: Union[DirModifiedEvent, FileModifiedEvent]) -> None:
         """
@@ -209,4 +401,4 @@ class Monitor(FileSystemEventHandler):
 
         :param event: Event representing file/directory modification.
         """
-        self.__callback.on_modified(bytes2str(event.src_path))
+        self._notify(bytes2str(event.src_path), FSEventType.MODIFIED)
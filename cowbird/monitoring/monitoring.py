@@ -1,16 +1,68 @@
+import os
+import threading
+import time
 from collections import defaultdict
-from typing import Dict, MutableMapping, Optional, Type, Union
+from typing import Dict, Iterable, List, MutableMapping, Optional, Tuple, Type, TypedDict, Union
 
+from cowbird.config import get_all_configs
 from cowbird.database import get_db
-from cowbird.database.stores import MonitoringStore
+from cowbird.database.stores import MonitorEventJournalStore, MonitorEventStore, MonitoringStore
 from cowbird.handlers import HandlerFactory
+from cowbird.monitoring.activation import MonitorActivator, MonitorActivatorStats
+from cowbird.monitoring.dispatcher import EventDispatcher, EventDispatcherStats, OverflowPolicy
 from cowbird.monitoring.fsmonitor import FSMonitor
-from cowbird.monitoring.monitor import Monitor, MonitorException
-from cowbird.typedefs import AnySettingsContainer
-from cowbird.utils import SingletonMeta, get_logger
+from cowbird.monitoring.monitor import WATERMARK_MARGIN, Monitor, MonitorException
+from cowbird.monitoring.observer import MonitorBackend, ObserverPool, ObserverPoolStats
+from cowbird.monitoring.polling import DEFAULT_POLL_INTERVAL, DEFAULT_POLL_MAX_INTERVAL
+from cowbird.typedefs import AnySettingsContainer, MonitoringConfig
+from cowbird.utils import (
+    SingletonMeta,
+    get_config_path,
+    get_logger,
+    get_monitoring_checkpoint_interval,
+    get_monitoring_idle_timeout,
+    get_monitoring_journal,
+    get_monitoring_journal_retention,
+    get_monitoring_lazy,
+    get_monitoring_max_active,
+    get_monitoring_observers,
+    get_monitoring_overflow_policy,
+    get_monitoring_queue_size,
+    get_monitoring_validation_workers,
+    get_monitoring_workers
+)
 
 LOGGER = get_logger(__name__)
 
+MonitorRegistration = Tuple[
+    str,  # path
+    bool,  # recursive
+    Union[FSMonitor, Type[FSMonitor], str],  # callback
+    float,  # debounce
+]
+MonitoringStartupStats = TypedDict(
+    "MonitoringStartupStats",
+    {
+        "load": float,
+        "start": float,
+        "catch_up": float,
+    },
+    total=True,
+)
+MonitoringStats = TypedDict(
+    "MonitoringStats",
+    {
+        "monitors": int,
+        "paths": int,
+        "inactive": int,
+        "startup": MonitoringStartupStats,
+        "activation": MonitorActivatorStats,
+        "observers": ObserverPoolStats,
+        "dispatcher": EventDispatcherStats,
+    },
+    total=True,
+)
+
 
 class MonitoringConfigurationException(Exception):
     """
@@ -39,66 +91,221 @@ class Monitoring(metaclass=SingletonMeta):
                                                    "obtains a proper database store.")
         self.monitors: MutableMapping[str, Dict[str, Monitor]] = defaultdict(lambda: {})
         self.store = get_db(config).get_store(MonitoringStore)
+        self.checkpoint_interval = get_monitoring_checkpoint_interval(config)
+        self.validation_workers = get_monitoring_validation_workers(config)
+        self.startup: MonitoringStartupStats = {"load": 0.0, "start": 0.0, "catch_up": 0.0}
+        self.lazy = get_monitoring_lazy(config)
+        self.activator = MonitorActivator(get_monitoring_idle_timeout(config), get_monitoring_max_active(config))
+        self.__checkpoint_thread: Optional[threading.Thread] = None
+        # instantiate the observers and the event workers shared by all monitors with the configured sizes
+        monitoring_cfg = self.get_monitoring_config(config)
+        backends = {path_cfg["path"]: path_cfg["backend"] for path_cfg in monitoring_cfg.get("paths", [])}
+        default_backend = monitoring_cfg.get("backend", MonitorBackend.INOTIFY.value)
+        for backend in [default_backend, *backends.values()]:
+            if MonitorBackend.get(backend) is None:
+                raise MonitoringConfigurationException(
+                    f"Invalid monitoring backend [{backend}], expected one of {MonitorBackend.values()}.")
+        ObserverPool(get_monitoring_observers(config), backends, default_backend,
+                     poll_interval=monitoring_cfg.get("poll_interval", DEFAULT_POLL_INTERVAL),
+                     poll_max_interval=monitoring_cfg.get("poll_max_interval", DEFAULT_POLL_MAX_INTERVAL))
+        overflow_policy = OverflowPolicy.get(get_monitoring_overflow_policy(config))
+        if overflow_policy is None:
+            raise MonitoringConfigurationException(
+                f"Invalid monitoring overflow policy [{get_monitoring_overflow_policy(config)}], "
+                f"expected one of {OverflowPolicy.values()}.")
+        spill_store = get_db(config).get_store(MonitorEventStore) if overflow_policy == OverflowPolicy.SPILL else None
+        journal = None
+        if get_monitoring_journal(config):
+            journal = get_db(config).get_store(MonitorEventJournalStore)
+            journal.set_retention(get_monitoring_journal_retention(config))
+            if spill_store:
+                # spilled events left over by a previous process are also pending in the journal, which replays them
+                spill_store.clear_events()
+        EventDispatcher(get_monitoring_workers(config), get_monitoring_queue_size(config), overflow_policy,
+                        spill_store=spill_store, monitor_resolver=self.get_monitor, journal=journal)
+
+    @staticmethod
+    def get_monitoring_config(config: AnySettingsContainer) -> MonitoringConfig:
+        """
+        Merges the ``monitoring`` sections of the configuration files, the paths of all files being combined.
+        """
+        monitoring_cfg: MonitoringConfig = {}
+        for cfg in get_all_configs(get_config_path(config), "monitoring", allow_missing=True):
+            paths = monitoring_cfg.get("paths", []) + cfg.get("paths", [])
+            monitoring_cfg.update(cfg)
+            monitoring_cfg["paths"] = paths
+        return monitoring_cfg
 
     def start(self) -> None:
         """
         Load existing monitors and start the monitoring.
         """
-        monitors = self.store.list_monitors()
+        start = time.perf_counter()
+        monitors = self.store.list_monitors(workers=self.validation_workers)
         for mon in monitors:
             self.monitors[mon.path][mon.callback] = mon
-            mon.start()
+        self.startup["load"] = time.perf_counter() - start
+        # events interrupted by a previous process are sent before any new event, now that their monitors are loaded
+        replayed = EventDispatcher().replay_journal()
+        if replayed:
+            LOGGER.info("Replayed [%s] monitoring events journaled by a previous process.", replayed)
+        EventDispatcher().start()
+        start = time.perf_counter()
+        for mon in monitors:
+            # in lazy mode, the monitors loaded on startup are only activated on demand
+            self._start_monitor(mon, activate=False)
+        self.startup["start"] = time.perf_counter() - start
+        LOGGER.info("Loaded [%s] monitors in [%.3f]s and started them in [%.3f]s.",
+                    len(monitors), self.startup["load"], self.startup["start"])
+        if self.checkpoint_interval:
+            # monitors are started first, so that no change is missed between the scan and the start of the watches
+            start = time.perf_counter()
+            changes = sum(mon.catch_up() for mon in monitors)
+            self.startup["catch_up"] = time.perf_counter() - start
+            LOGGER.info("Found [%s] changes of the monitored paths since their last watermark in [%.3f]s.",
+                        changes, self.startup["catch_up"])
+            self._start_checkpoints()
 
         # Initialize FileSystem handler which must monitor the WPS outputs folder on startup
         filesystem_handler = HandlerFactory().get_handler("FileSystem")
         if filesystem_handler:
             filesystem_handler.start_wps_outputs_monitoring(self)
+        LOGGER.info("Monitoring started : %s", self.stats())
+
+    def _start_checkpoints(self) -> None:
+        if self.__checkpoint_thread is not None:
+            return
+        self.__checkpoint_thread = threading.Thread(target=self._run_checkpoints, name="MonitoringCheckpoint",
+                                                    daemon=True)
+        self.__checkpoint_thread.start()
+
+    def _run_checkpoints(self) -> None:
+        while True:
+            time.sleep(self.checkpoint_interval)
+            try:
+                self.checkpoint()
+            except Exception as exc:  # noqa
+                LOGGER.error("Failed to save the watermarks of the monitors : [%r]", exc, exc_info=True)
+
+    def checkpoint(self) -> int:
+        """
+        Saves the current time as the watermark of the running monitors that have sent all their events.
+
+        Watermarks are only advanced while no event is waiting to be sent, such that any change older than the
+        watermark of a monitor was already sent to its callback. They are not advanced for the inactive lazy monitors,
+        whose changes deeper than the direct entries of their path are only sent once they get activated.
+
+        :returns: Number of monitors for which the watermark was saved.
+        """
+        watermark = time.time() - WATERMARK_MARGIN
+        if not EventDispatcher().join(timeout=0):
+            return 0
+        monitors = [mon for path_monitors in list(self.monitors.values()) for mon in list(path_monitors.values())
+                    if mon.is_alive and mon.active and not mon.pending]
+        self.store.save_watermarks([mon.key for mon in monitors], watermark)
+        for mon in monitors:
+            mon.watermark = watermark
+        return len(monitors)
+
+    def get_monitor(self, callback: str, path: str) -> Optional[Monitor]:
+        """
+        Returns the registered monitor of a path and callback qualified class name, if any.
+        """
+        return self.monitors.get(path, {}).get(callback)
 
     def register(self,
                  path: str,
                  recursive: bool,
                  cb_monitor: Union[FSMonitor, Type[FSMonitor], str],
+                 debounce: float = 0,
                  ) -> Optional[Monitor]:
         """
         Register a monitor for a specific path and start it. If a monitor already exists for the specific
         path/cb_monitor combination it is directly returned. If this monitor was not recursively monitoring its path and
         the `recursive` flag is now true, this one take precedence and the monitor is updated accordingly. If the
-        `recursive` flag was true, and now it is false it has no effect.
+        `recursive` flag was true, and now it is false it has no effect. The debounce delay of an existing monitor is
+        always updated.
 
         :param path: Path to monitor
         :param recursive: Monitor subdirectory recursively?
         :param cb_monitor: FSMonitor for which an instance is created and events are sent
                            Can be an object, a class type implementing FSMonitor or a string containing module and class
                            name.
+        :param debounce: Delay in seconds during which the events of a same path are coalesced before being sent to
+                         the FSMonitor.
         :returns: The monitor registered or already existing for the specific path/cb_monitor combination. Note that
                   the monitor is not created/returned if a MonitorException occurs.
         """
-        callback = None
-        try:
-            callback = Monitor.get_qualified_class_name(Monitor.get_fsmonitor_instance(cb_monitor))
-            if path in self.monitors and callback in self.monitors[path]:
-                mon = self.monitors[path][callback]
-                # If the monitor already exists but is not recursive, make it recursive if required
-                # (recursive takes precedence)
-                if not mon.recursive and recursive:
-                    mon.recursive = True
-            else:
-                # Doesn't already exist
-                mon = Monitor(path, recursive, cb_monitor)
-                self.monitors[mon.path][mon.callback] = mon
-
-            self.store.collection.update_one(
-                {"callback": mon.callback, "path": mon.path},
-                {"$set": {"callback": mon.callback, "path": mon.path, "recursive": mon.recursive}},
-                upsert=True)
+        return self.register_many([(path, recursive, cb_monitor, debounce)])[0]
+
+    def register_many(self, registrations: Iterable[MonitorRegistration]) -> List[Optional[Monitor]]:
+        """
+        Register and start many monitors, saving all of them in the database with a single request.
+
+        Each registration is handled as described by :meth:`register`.
+
+        :param registrations: Path, recursive flag, FSMonitor and debounce delay of each monitor.
+        :returns: The monitor registered or already existing for each registration, or None if a MonitorException
+                  occurs for it.
+        """
+        monitors: List[Optional[Monitor]] = []
+        for path, recursive, cb_monitor, debounce in registrations:
+            callback = None
+            try:
+                callback = Monitor.get_qualified_class_name(Monitor.get_fsmonitor_instance(cb_monitor))
+                if path in self.monitors and callback in self.monitors[path]:
+                    mon = self.monitors[path][callback]
+                    # If the monitor already exists but is not recursive, make it recursive if required
+                    # (recursive takes precedence)
+                    if not mon.recursive and recursive:
+                        mon.recursive = True
+                    if mon.debounce != debounce:
+                        mon.debounce = debounce
+                else:
+                    # Doesn't already exist
+                    mon = Monitor(path, recursive, cb_monitor, debounce=debounce)
+                    self.monitors[mon.path][mon.callback] = mon
+                monitors.append(mon)
+            except MonitorException as exc:
+                LOGGER.warning("Failed to start monitoring the following path [%s] with this monitor [%s] : [%s]",
+                               path, callback, exc)
+                monitors.append(None)
 
+        self.store.save_monitors(mon for mon in monitors if mon)
+        for mon in monitors:
+            if mon:
+                self._start_monitor(mon, activate=True)
+        return monitors
+
+    def _start_monitor(self, mon: Monitor, activate: bool) -> None:
+        """
+        Starts a monitor if it is not running yet, only watching the direct entries of its path in lazy mode until it
+        gets activated.
+        """
+        if not self.lazy:
             if not mon.is_alive:
                 mon.start()
-            return mon
-        except MonitorException as exc:
-            LOGGER.warning("Failed to start monitoring the following path [%s] with this monitor [%s] : [%s]",
-                           path, callback, exc)
-        return None
+            return
+        mon.activator = self.activator
+        if not mon.is_alive:
+            mon.start(active=False)
+        if activate:
+            self.activator.activate(mon)
+
+    def activate(self, path: str) -> int:
+        """
+        Requests the activation of the lazy monitors of a path and of its subpaths, whose files are expected to change.
+
+        :returns: Number of monitors for which the activation was requested.
+        """
+        if not self.lazy:
+            return 0
+        path = os.path.join(os.path.normpath(path), "")
+        monitors = [mon for mon_path, path_monitors in list(self.monitors.items())
+                    if os.path.join(mon_path, "").startswith(path) for mon in list(path_monitors.values())]
+        for mon in monitors:
+            self.activator.notify(mon)
+        return len(monitors)
 
     def unregister(self, path: str, cb_monitor: Union[FSMonitor, Type[FSMonitor], str]) -> bool:
         """
@@ -118,6 +325,7 @@ class Monitoring(metaclass=SingletonMeta):
                 mon = self.monitors[path].pop(mon_qualname)
                 if len(self.monitors[path]) == 0:
                     self.monitors.pop(path)
+                self.activator.remove(mon)
                 mon.stop()
                 return True
             except KeyError:
@@ -128,5 +336,24 @@ class Monitoring(metaclass=SingletonMeta):
         """
         Stops and unregisters all monitors.
         """
+        for path_monitors in self.monitors.values():
+            for mon in path_monitors.values():
+                mon.stop()
         self.monitors.clear()
+        self.activator.clear()
         self.store.clear_services(drop=False)
+
+    def stats(self) -> MonitoringStats:
+        """
+        Reports the count of registered monitors along with the usage of the shared observers and event workers.
+        """
+        monitors = [mon for path_monitors in list(self.monitors.values()) for mon in list(path_monitors.values())]
+        return {
+            "monitors": len(monitors),
+            "paths": len(self.monitors),
+            "inactive": sum(1 for mon in monitors if not mon.active),
+            "startup": self.startup,
+            "activation": self.activator.stats(),
+            "observers": ObserverPool().stats(),
+            "dispatcher": EventDispatcher().stats(),
+        }
@@ -0,0 +1,468 @@
+import os
+import threading
+from collections import defaultdict
+from functools import partial
+from typing import Callable, Dict, Iterator, List, Mapping, Optional, Set, Tuple, TypedDict, Union
+
+from watchdog.events import (
+    EVENT_TYPE_MODIFIED,
+    EVENT_TYPE_MOVED,
+    DirCreatedEvent,
+    DirDeletedEvent,
+    FileCreatedEvent,
+    FileDeletedEvent,
+    FileSystemEvent,
+    FileSystemEventHandler
+)
+from watchdog.observers import Observer
+from watchdog.observers.api import BaseObserver, ObservedWatch
+
+from cowbird.monitoring.polling import (
+    DEFAULT_POLL_INTERVAL,
+    DEFAULT_POLL_MAX_INTERVAL,
+    DirectoryPollingEmitter,
+    DirectoryPollingObserver
+)
+from cowbird.monitoring.trie import PathTrie
+from cowbird.utils import ExtendedEnum, SingletonMeta, get_logger
+
+LOGGER = get_logger(__name__)
+
+DEFAULT_OBSERVER_COUNT = 1
+
+WatchKey = Tuple[
+    str,  # watched path
+    bool,  # recursive
+]
+InotifyUsage = TypedDict(
+    "InotifyUsage",
+    {
+        "instances": int,
+        "watches": int,
+    },
+    total=True,
+)
+ObserverBackendsUsage = TypedDict(
+    "ObserverBackendsUsage",
+    {
+        "inotify": int,
+        "polling": int,
+    },
+    total=True,
+)
+ObserverPoolStats = TypedDict(
+    "ObserverPoolStats",
+    {
+        "observers": int,
+        "threads": int,
+        "process_threads": int,
+        "watches": int,
+        "merged_watches": int,
+        "handlers": int,
+        "inotify": InotifyUsage,
+        "backends": ObserverBackendsUsage,
+        "polled_directories": int,
+    },
+    total=True,
+)
+
+
+class MonitorBackend(ExtendedEnum):
+    """
+    Mechanisms used to find the changes of the monitored paths.
+    """
+    INOTIFY = "inotify"      # native observer of the platform, inotify on Linux
+    POLLING = "polling"      # directory snapshots, see DirectoryPollingEmitter
+    FANOTIFY = "fanotify"    # not provided by watchdog, replaced by inotify
+
+
+def get_available_backend(backend: MonitorBackend) -> MonitorBackend:
+    """
+    Returns the backend used in place of the requested one, which is the same unless it is not available.
+    """
+    if backend == MonitorBackend.FANOTIFY:
+        LOGGER.warning("The [%s] monitoring backend is not available, [%s] is used instead.",
+                       backend.value, MonitorBackend.INOTIFY.value)
+        return MonitorBackend.INOTIFY
+    return backend
+
+
+def get_inotify_usage() -> InotifyUsage:
+    """
+    Counts the inotify instances opened by the current process and the watch descriptors that they hold.
+
+    Both counts are bounded by the ``fs.inotify.max_user_instances`` and ``fs.inotify.max_user_watches`` kernel
+    settings. Zero counts are returned on platforms where they cannot be read from ``/proc``.
+    """
+    usage: InotifyUsage = {"instances": 0, "watches": 0}
+    try:
+        fds = os.listdir("/proc/self/fd")
+    except OSError:
+        return usage
+    for fd in fds:
+        try:
+            if os.readlink(f"/proc/self/fd/{fd}") != "anon_inode:inotify":
+                continue
+            with open(f"/proc/self/fdinfo/{fd}", encoding="utf-8") as fdinfo:
+                usage["watches"] += sum(1 for line in fdinfo if line.startswith("inotify wd:"))
+            usage["instances"] += 1
+        except OSError:  # fd closed in the meantime
+            continue
+    return usage
+
+
+class WatchRouter(FileSystemEventHandler):
+    """
+    Single handler of a watch, dispatching its events to the handlers of all the paths served by the watch.
+    """
+
+    def __init__(self, pool: "ObserverPool", key: WatchKey) -> None:
+        self.pool = pool
+        self.key = key
+
+    def dispatch(self, event: FileSystemEvent) -> None:
+        self.pool.route(self.key, event)
+
+
+class ObserverPool(metaclass=SingletonMeta):
+    """
+    Fixed pool of watchdog observers shared by all the monitors.
+
+    Each observer dispatches the events of many watches on a single thread, instead of running one observer thread per
+    monitor. New watches are scheduled on the least loaded observer of the backend configured for their path.
+
+    The paths requested by the handlers are kept in a path trie, such that a single watch is used for all the handlers
+    of a path and of its subpaths: a recursive watch also serves the handlers of the paths found under it (using the
+    same backend), instead of watching their directories a second time. Each event of a watch is routed to the
+    handlers of the paths that contain it, found by prefix lookup, so that a handler never receives the same event
+    from two watches. When the handlers of a watch are all removed, the paths that it served are watched again
+    separately.
+
+    Note that events of all the watches of an observer are dispatched sequentially, such that a slow callback delays
+    the events of the other monitors of the same observer.
+
+    The pool is a singleton, its size is defined by the first instantiation, which is done by :class:`Monitoring`.
+    """
+
+    def __init__(self,
+                 observer_count: int = DEFAULT_OBSERVER_COUNT,
+                 backends: Optional[Mapping[str, Union[MonitorBackend, str]]] = None,
+                 default_backend: Union[MonitorBackend, str] = MonitorBackend.INOTIFY,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 poll_max_interval: float = DEFAULT_POLL_MAX_INTERVAL,
+                 ) -> None:
+        """
+        :param observer_count: Number of observers of each backend, each running its own dispatch thread.
+        :param backends: Backend used for each path, applied to its whole tree unless a subpath has its own backend.
+        :param default_backend: Backend used for the paths without any configured backend.
+        :param poll_interval: Minimum interval in seconds between two polls of a path using the polling backend.
+        :param poll_max_interval: Maximum interval in seconds between two polls of a path without any change.
+        """
+        self.observer_count = observer_count
+        self.default_backend = get_available_backend(MonitorBackend.get(default_backend))
+        self.backends = {os.path.normpath(path): get_available_backend(MonitorBackend.get(backend))
+                         for path, backend in (backends or {}).items()}
+        self.observer_classes: Dict[MonitorBackend, Callable[[], BaseObserver]] = {
+            MonitorBackend.INOTIFY: Observer,
+            MonitorBackend.POLLING: partial(DirectoryPollingObserver, poll_interval, poll_max_interval),
+        }
+        self.__observers: Dict[MonitorBackend, List[BaseObserver]] = defaultdict(list)
+        # watches scheduled on the observers, and their recursive flags indexed by path
+        self.__watches: Dict[WatchKey, Tuple[BaseObserver, ObservedWatch]] = {}
+        self.__watch_paths: PathTrie[Set[bool]] = PathTrie()
+        # handlers of each requested path and recursive flag, and their recursive flags indexed by path
+        self.__handlers: Dict[WatchKey, Set[FileSystemEventHandler]] = {}
+        self.__handler_paths: PathTrie[Set[bool]] = PathTrie()
+        # watch serving each requested path and recursive flag, and the reverse mapping
+        self.__serving: Dict[WatchKey, WatchKey] = {}
+        self.__served: Dict[WatchKey, Set[WatchKey]] = {}
+        self.__lock = threading.RLock()
+        # protects the handlers and the served paths used to route the events, without being held while calling the
+        # observers, since they dispatch the events while holding their own lock
+        self.__route_lock = threading.Lock()
+
+    def get_backend(self, path: str) -> MonitorBackend:
+        """
+        Returns the backend configured for the path or its closest parent.
+        """
+        path = os.path.normpath(path)
+        while path not in self.backends:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return self.default_backend
+            path = parent
+        return self.backends[path]
+
+    def _get_observer(self, backend: MonitorBackend) -> BaseObserver:
+        """
+        Returns the observer of the backend with the fewest watches, creating and starting a new one if the pool of the
+        backend is not full yet.
+        """
+        observers = self.__observers[backend]
+        loads = {id(observer): 0 for observer in observers}
+        for observer, _ in self.__watches.values():
+            if id(observer) in loads:
+                loads[id(observer)] += 1
+        if len(observers) < self.observer_count and all(loads.values()):
+            observer = self.observer_classes[backend]()
+            observer.daemon = True
+            observer.start()
+            observers.append(observer)
+            return observer
+        return min(observers, key=lambda obs: loads[id(obs)])
+
+    @staticmethod
+    def _add_path(paths: PathTrie[Set[bool]], key: WatchKey) -> None:
+        flags = paths.get(key[0])
+        if flags is None:
+            flags = paths[key[0]] = set()
+        flags.add(key[1])
+
+    @staticmethod
+    def _remove_path(paths: PathTrie[Set[bool]], key: WatchKey) -> None:
+        flags = paths.get(key[0])
+        if flags is not None:
+            flags.discard(key[1])
+            if not flags:
+                paths.pop(key[0])
+
+    def _find_covering_watch(self, key: WatchKey) -> Optional[WatchKey]:
+        """
+        Finds the watch reporting all the events of a path and recursive flag, if any.
+        """
+        path, recursive = key
+        backend = self.get_backend(path)
+        for watch_path, flags in self.__watch_paths.ancestors(path):
+            if True in flags and self.get_backend(watch_path) == backend:
+                return watch_path, True
+        if not recursive and False in (self.__watch_paths.get(path) or ()):
+            return key
+        return None
+
+    def _add_watch(self, key: WatchKey) -> None:
+        """
+        Schedules a new watch on an observer of the backend of its path.
+
+        :raises OSError: If the path cannot be watched.
+        """
+        path, recursive = key
+        observer = self._get_observer(self.get_backend(path))
+        router = WatchRouter(self, key)
+        try:
+            watch = observer.schedule(router, path, recursive=recursive)
+        except OSError:
+            # the emitter could not be started, remove the handler left behind by the observer
+            observer.remove_handler_for_watch(router, ObservedWatch(path, recursive=recursive))
+            raise
+        self.__watches[key] = (observer, watch)
+        self.__served[key] = set()
+        self._add_path(self.__watch_paths, key)
+
+    def _remove_watch(self, key: WatchKey) -> None:
+        observer, watch = self.__watches.pop(key)
+        observer.unschedule(watch)
+        self.__served.pop(key, None)
+        self._remove_path(self.__watch_paths, key)
+
+    def _serve(self, key: WatchKey, watch_key: WatchKey) -> None:
+        with self.__route_lock:
+            previous_key = self.__serving.get(key)
+            if previous_key in self.__served:
+                self.__served[previous_key].discard(key)
+            self.__serving[key] = watch_key
+            self.__served[watch_key].add(key)
+
+    def _merge_covered_watches(self, key: WatchKey) -> None:
+        """
+        Moves the paths served by the watches found under a new recursive watch to that watch, and removes them.
+        """
+        backend = self.get_backend(key[0])
+        covered_keys = [(path, recursive) for path, flags in self.__watch_paths.descendants(key[0])
+                        for recursive in flags if (path, recursive) != key and self.get_backend(path) == backend]
+        for covered_key in covered_keys:
+            for served_key in list(self.__served[covered_key]):
+                self._serve(served_key, key)
+            self._remove_watch(covered_key)
+
+    def _split_watch(self, key: WatchKey) -> None:
+        """
+        Watches again separately the paths served by a watch, before removing it.
+
+        Parents are handled before their subpaths, such that a new recursive watch also serves the paths under it.
+        """
+        served_keys = sorted(self.__served[key], key=lambda served_key: (len(served_key[0]), not served_key[1]))
+        # the watch keeps running until the paths are watched again, but must not be found as covering them
+        self._remove_path(self.__watch_paths, key)
+        for served_key in served_keys:
+            watch_key = self._find_covering_watch(served_key)
+            if watch_key is None:
+                try:
+                    self._add_watch(served_key)
+                except OSError as exc:
+                    LOGGER.warning("Cannot monitor the following file or directory [%s]: [%r]", served_key[0], exc)
+                    with self.__route_lock:
+                        del self.__serving[served_key]
+                    continue
+                watch_key = served_key
+            self._serve(served_key, watch_key)
+        self._add_path(self.__watch_paths, key)
+        self._remove_watch(key)
+
+    def schedule(self, handler: FileSystemEventHandler, path: str, recursive: bool) -> None:
+        """
+        Schedules a handler for the events of a path, reusing the watch of the same path or of a parent path if any.
+
+        :raises OSError: If the path cannot be watched.
+        """
+        key = (os.path.normpath(path), recursive)
+        with self.__lock:
+            if key in self.__handlers:
+                with self.__route_lock:
+                    self.__handlers[key].add(handler)
+                return
+            watch_key = self._find_covering_watch(key)
+            if watch_key is None:
+                self._add_watch(key)
+                watch_key = key
+                if recursive:
+                    self._merge_covered_watches(key)
+            with self.__route_lock:
+                self.__handlers[key] = {handler}
+                self._add_path(self.__handler_paths, key)
+            self._serve(key, watch_key)
+
+    def unschedule(self, handler: FileSystemEventHandler, path: str, recursive: bool) -> None:
+        """
+        Removes a handler of a path, and stops watching the path if no other handler remains for it.
+
+        The observer thread keeps running to dispatch the events of its other watches.
+        """
+        key = (os.path.normpath(path), recursive)
+        with self.__lock:
+            handlers = self.__handlers.get(key)
+            if not handlers or handler not in handlers:
+                return
+            with self.__route_lock:
+                handlers.remove(handler)
+                if handlers:
+                    return
+                del self.__handlers[key]
+                self._remove_path(self.__handler_paths, key)
+                watch_key = self.__serving.pop(key, None)
+                if watch_key in self.__served:
+                    self.__served[watch_key].discard(key)
+            if key in self.__watches:
+                self._split_watch(key)
+
+    def is_scheduled(self, handler: FileSystemEventHandler, path: str, recursive: bool) -> bool:
+        """
+        Indicates if the handler receives the events of the path from a running observer.
+        """
+        key = (os.path.normpath(path), recursive)
+        with self.__lock:
+            if handler not in self.__handlers.get(key, ()) or key not in self.__serving:
+                return False
+            observer, _ = self.__watches[self.__serving[key]]
+            return observer.is_alive()
+
+    @staticmethod
+    def _contains(key: WatchKey, path: str, event: FileSystemEvent) -> bool:
+        key_path, recursive = key
+        if path == key_path:
+            return True
+        if recursive:
+            return path.startswith(os.path.join(key_path, ""))
+        # modifications of a subdirectory come from the changes of its content, which is not part of the path
+        return (os.path.dirname(path) == key_path
+                and not (event.is_directory and event.event_type == EVENT_TYPE_MODIFIED))
+
+    def _get_handler_keys(self, path: str) -> Iterator[WatchKey]:
+        """
+        Finds the requested paths and recursive flags that may contain a path.
+        """
+        parent = os.path.dirname(path)
+        for handler_path, flags in self.__handler_paths.ancestors(path):
+            for recursive in flags:
+                if recursive or handler_path in (path, parent):
+                    yield handler_path, recursive
+
+    def _get_routed_event(self, key: WatchKey, watch_key: WatchKey, event: FileSystemEvent
+                          ) -> Optional[FileSystemEvent]:
+        """
+        Adapts an event of a watch to a path that it serves, as it would be reported by a watch of that path.
+        """
+        if key == watch_key:
+            return event
+        in_src = self._contains(key, event.src_path, event)
+        if event.event_type != EVENT_TYPE_MOVED:
+            return event if in_src else None
+        in_dest = self._contains(key, event.dest_path, event)
+        if in_src and in_dest:
+            return event
+        if in_src:
+            return (DirDeletedEvent if event.is_directory else FileDeletedEvent)(event.src_path)
+        if in_dest:
+            return (DirCreatedEvent if event.is_directory else FileCreatedEvent)(event.dest_path)
+        return None
+
+    def route(self, watch_key: WatchKey, event: FileSystemEvent) -> None:
+        """
+        Dispatches an event of a watch to the handlers of the paths that contain it and that are served by the watch.
+        """
+        paths = [event.src_path, event.dest_path] if event.event_type == EVENT_TYPE_MOVED else [event.src_path]
+        routed_events = []
+        with self.__route_lock:
+            keys = {key for path in paths for key in self._get_handler_keys(path)
+                    if self.__serving.get(key) == watch_key}
+            for key in keys:
+                routed_event = self._get_routed_event(key, watch_key, event)
+                if routed_event is not None:
+                    routed_events.append((routed_event, list(self.__handlers[key])))
+        for routed_event, handlers in routed_events:
+            for handler in handlers:
+                handler.dispatch(routed_event)
+
+    def stop(self) -> None:
+        """
+        Stops all the observers, unscheduling all of their watches.
+        """
+        with self.__lock:
+            observers = [observer for backend_observers in self.__observers.values() for observer in backend_observers]
+            self.__observers.clear()
+            self.__watches.clear()
+            self.__watch_paths = PathTrie()
+            with self.__route_lock:
+                self.__handlers.clear()
+                self.__handler_paths = PathTrie()
+                self.__serving.clear()
+                self.__served.clear()
+        for observer in observers:
+            observer.stop()
+        for observer in observers:
+            observer.join()
+
+    def stats(self) -> ObserverPoolStats:
+        """
+        Reports the usage of the observers, their watches and the related resources of the process.
+        """
+        with self.__lock:
+            observers = [observer for backend_observers in self.__observers.values() for observer in backend_observers
+                         if observer.is_alive()]
+            # each observer runs a dispatch thread, and each watch an emitter thread (excluding its reader thread)
+            emitters = [emitter for observer in observers for emitter in observer.emitters if emitter.is_alive()]
+            backends: ObserverBackendsUsage = {"inotify": 0, "polling": 0}
+            for backend, backend_observers in self.__observers.items():
+                backends[backend.value] = sum(  # type: ignore[literal-required]
+                    1 for observer, _ in self.__watches.values() if observer in backend_observers)
+            return {
+                "observers": len(observers),
+                "threads": len(observers) + len(emitters),
+                "process_threads": threading.active_count(),
+                "watches": len(self.__watches),
+                "merged_watches": sum(1 for key, watch_key in self.__serving.items() if key != watch_key),
+                "handlers": sum(len(handlers) for handlers in self.__handlers.values()),
+                "inotify": get_inotify_usage(),
+                "backends": backends,
+                "polled_directories": sum(emitter.directories for emitter in emitters
+                                          if isinstance(emitter, DirectoryPollingEmitter)),
+            }
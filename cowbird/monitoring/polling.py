@@ -0,0 +1,273 @@
+import os
+import stat
+import time
+from functools import partial
+from typing import Dict, List, NamedTuple, Optional, Tuple, Type
+
+from watchdog.events import (
+    DirCreatedEvent,
+    DirDeletedEvent,
+    DirModifiedEvent,
+    FileCreatedEvent,
+    FileDeletedEvent,
+    FileModifiedEvent,
+    FileSystemEvent
+)
+from watchdog.observers.api import BaseObserver, EventEmitter, EventQueue, ObservedWatch
+
+from cowbird.utils import get_logger
+
+LOGGER = get_logger(__name__)
+
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_POLL_MAX_INTERVAL = 30.0
+
+# Delay during which the entries that changed are checked on every poll, since writing into an existing file does not
+# modify its directory, and changes done within the time precision of a directory could otherwise go unnoticed
+POLL_HOT_DELAY = 60.0
+
+
+class EntrySnapshot(NamedTuple):
+    is_dir: bool
+    inode: int
+    mtime: int  # nanoseconds
+    ctime: int  # nanoseconds
+    size: int
+
+
+def get_entry_snapshot(entry_stat: os.stat_result) -> EntrySnapshot:
+    return EntrySnapshot(stat.S_ISDIR(entry_stat.st_mode), entry_stat.st_ino,
+                         entry_stat.st_mtime_ns, entry_stat.st_ctime_ns, entry_stat.st_size)
+
+
+class DirectoryPollingEmitter(EventEmitter):
+    """
+    Emitter polling a directory tree, for the file systems on which inotify does not report all changes, such as NFS
+    mounts modified by other hosts.
+
+    A snapshot of the entries of each directory is kept in cache. On each poll, only the directories are checked, and
+    only those whose status changed since the previous poll are listed again to find their created, deleted and
+    modified entries. The cost of a poll therefore grows with the number of directories and of changed directories,
+    instead of with the number of files, as for the :class:`watchdog.observers.polling.PollingEmitter`.
+
+    Since writing into an existing file does not modify its directory, the entries that changed recently are also
+    checked on every poll during :data:`POLL_HOT_DELAY`, such that a file being written is reported as modified.
+    Files modified long after their creation without any change of their directory are not reported.
+
+    The polling interval is reset to its minimum value when changes are found, and doubled after each poll without
+    any change, up to its maximum value. Moved entries are reported as deleted and created.
+    """
+
+    def __init__(self,
+                 event_queue: EventQueue,
+                 watch: ObservedWatch,
+                 *,
+                 timeout: float = DEFAULT_POLL_INTERVAL,
+                 event_filter: Optional[List[Type[FileSystemEvent]]] = None,
+                 max_interval: float = DEFAULT_POLL_MAX_INTERVAL,
+                 ) -> None:
+        """
+        :param timeout: Minimum interval in seconds between two polls.
+        :param max_interval: Maximum interval in seconds between two polls, reached when no change is found.
+        """
+        super().__init__(event_queue, watch, timeout=timeout, event_filter=event_filter)
+        self.max_interval = max(max_interval, timeout)
+        self.interval = timeout
+        self.__dirs: Dict[str, Tuple[EntrySnapshot, Dict[str, EntrySnapshot]]] = {}
+        self.__hot: Dict[str, float] = {}  # recently changed path -> time of its last change
+
+    @property
+    def directories(self) -> int:
+        """
+        Number of directories kept in the snapshot cache.
+        """
+        return len(self.__dirs)
+
+    def on_thread_start(self) -> None:
+        # the initial snapshot is taken before starting the thread, such that any later change is reported
+        self._scan_tree()
+
+    def queue_events(self, timeout: float) -> None:
+        # the interval between the polls is adapted to the changes instead of using the fixed timeout
+        if self.stopped_event.wait(self.interval):
+            return
+        if self.poll() or self.__hot:
+            self.interval = self.timeout
+        else:
+            self.interval = min(self.interval * 2, self.max_interval)
+
+    def poll(self) -> int:
+        """
+        Finds the changes since the previous poll and queues their events.
+
+        :returns: Number of queued events.
+        """
+        now = time.monotonic()
+        try:
+            os.stat(self.watch.path)
+        except OSError:
+            self.queue_event(DirDeletedEvent(self.watch.path))
+            self.stop()
+            return 1
+        events = 0
+        for path in list(self.__dirs):
+            if path not in self.__dirs:  # removed by the rescan of its parent
+                continue
+            try:
+                dir_snapshot = get_entry_snapshot(os.stat(path))
+            except OSError:  # deleted, reported by the rescan of its parent
+                continue
+            if dir_snapshot != self.__dirs[path][0] or path in self.__hot:
+                events += self._rescan(path, dir_snapshot, now)
+        for path, changed_time in list(self.__hot.items()):
+            if now - changed_time > POLL_HOT_DELAY:
+                del self.__hot[path]
+            elif path not in self.__dirs:
+                events += self._check_file(path, now)
+        return events
+
+    def _list(self, path: str) -> Optional[Dict[str, EntrySnapshot]]:
+        try:
+            with os.scandir(path) as dir_entries:
+                entries = {}
+                for entry in dir_entries:
+                    try:
+                        entries[entry.name] = get_entry_snapshot(entry.stat(follow_symlinks=False))
+                    except OSError:  # removed in the meantime
+                        continue
+                return entries
+        except OSError as exc:
+            LOGGER.debug("Cannot list the directory [%s] : [%r]", path, exc)
+            return None
+
+    def _scan_tree(self) -> None:
+        """
+        Takes the initial snapshot of the watched tree, without reporting any event.
+        """
+        now = time.monotonic()
+        recent = time.time_ns() - int(POLL_HOT_DELAY * 1e9)
+        dirs = [self.watch.path]
+        while dirs:
+            path = dirs.pop()
+            try:
+                dir_snapshot = get_entry_snapshot(os.stat(path))
+            except OSError:
+                continue
+            entries = self._list(path)
+            if entries is None:
+                continue
+            self.__dirs[path] = (dir_snapshot, entries)
+            if dir_snapshot.mtime > recent:
+                self.__hot[path] = now
+            for name, entry in entries.items():
+                if entry.is_dir:
+                    if self.watch.is_recursive:
+                        dirs.append(os.path.join(path, name))
+                elif entry.mtime > recent:
+                    self.__hot[os.path.join(path, name)] = now
+
+    def _rescan(self, path: str, dir_snapshot: EntrySnapshot, now: float) -> int:
+        """
+        Lists a directory again and queues the events of its entries that changed since its previous listing.
+        """
+        entries = self._list(path)
+        if entries is None:
+            return 0
+        previous_snapshot, previous_entries = self.__dirs[path]
+        self.__dirs[path] = (dir_snapshot, entries)
+        events = 0
+        for name, previous in previous_entries.items():
+            entry = entries.get(name)
+            if entry is None or entry.inode != previous.inode or entry.is_dir != previous.is_dir:
+                events += self._deleted(os.path.join(path, name), previous)
+        for name, entry in entries.items():
+            previous = previous_entries.get(name)
+            if previous is None or entry.inode != previous.inode or entry.is_dir != previous.is_dir:
+                events += self._created(os.path.join(path, name), entry, now)
+        # writing into a file does not modify its directory, unlike the creation or deletion of its entries
+        if events or dir_snapshot != previous_snapshot:
+            self.queue_event(DirModifiedEvent(path))
+            self.__hot[path] = now
+            events += 1
+        for name, entry in entries.items():
+            previous = previous_entries.get(name)
+            # modified subdirectories are reported by their own rescan
+            if previous and entry != previous and entry.inode == previous.inode and not entry.is_dir:
+                entry_path = os.path.join(path, name)
+                self.queue_event(FileModifiedEvent(entry_path))
+                self.__hot[entry_path] = now
+                events += 1
+        return events
+
+    def _check_file(self, path: str, now: float) -> int:
+        """
+        Checks a recently changed file whose directory did not change.
+        """
+        parent, name = os.path.split(path)
+        previous = self.__dirs[parent][1].get(name) if parent in self.__dirs else None
+        if previous is None:
+            del self.__hot[path]
+            return 0
+        try:
+            entry = get_entry_snapshot(os.stat(path, follow_symlinks=False))
+        except OSError:  # deleted, reported by the rescan of its parent
+            return 0
+        if entry == previous or entry.inode != previous.inode or entry.is_dir:
+            return 0
+        self.__dirs[parent][1][name] = entry
+        self.queue_event(FileModifiedEvent(path))
+        self.__hot[path] = now
+        return 1
+
+    def _created(self, path: str, entry: EntrySnapshot, now: float) -> int:
+        self.__hot[path] = now
+        if not entry.is_dir:
+            self.queue_event(FileCreatedEvent(path))
+            return 1
+        self.queue_event(DirCreatedEvent(path))
+        events = 1
+        if not self.watch.is_recursive:
+            return events
+        try:
+            dir_snapshot = get_entry_snapshot(os.stat(path))
+        except OSError:
+            return events
+        entries = self._list(path)
+        if entries is None:
+            return events
+        self.__dirs[path] = (dir_snapshot, entries)
+        # entries created before the directory was found are reported as created along with it
+        for name, sub_entry in entries.items():
+            events += self._created(os.path.join(path, name), sub_entry, now)
+        return events
+
+    def _deleted(self, path: str, entry: EntrySnapshot) -> int:
+        self.__hot.pop(path, None)
+        if not entry.is_dir:
+            self.queue_event(FileDeletedEvent(path))
+            return 1
+        events = 0
+        removed = self.__dirs.pop(path, None)
+        if removed:
+            # the entries of the deleted directory are reported before it, as when they are removed one by one
+            for name, sub_entry in removed[1].items():
+                events += self._deleted(os.path.join(path, name), sub_entry)
+        self.queue_event(DirDeletedEvent(path))
+        return events + 1
+
+
+class DirectoryPollingObserver(BaseObserver):
+    """
+    Observer polling its watches with a :class:`DirectoryPollingEmitter`.
+    """
+
+    def __init__(self,
+                 interval: float = DEFAULT_POLL_INTERVAL,
+                 max_interval: float = DEFAULT_POLL_MAX_INTERVAL,
+                 ) -> None:
+        """
+        :param interval: Minimum interval in seconds between two polls of a watch.
+        :param max_interval: Maximum interval in seconds between two polls of a watch without any change.
+        """
+        super().__init__(partial(DirectoryPollingEmitter, max_interval=max_interval),  # type: ignore[arg-type]
+                         timeout=interval)
@@ -0,0 +1,100 @@
+import os
+from typing import Any, Dict, Generic, Iterator, List, Optional, Tuple, TypeVar
+
+TrieValue = TypeVar("TrieValue")
+
+_VALUE = object()  # key of the value of a node, distinct from any path component
+
+
+class PathTrie(Generic[TrieValue]):
+    """
+    Values indexed by path, from which the values of the ancestors or of the descendants of a path are found without
+    comparing it with every other path.
+
+    Paths are normalized, such that ``/a/b/`` and ``/a/b`` refer to the same value.
+    """
+
+    def __init__(self) -> None:
+        # nested nodes by path component, each holding its normalized path and value under a distinct key
+        self.__root: Dict[Any, Any] = {}
+        self.__count = 0
+
+    def __len__(self) -> int:
+        return self.__count
+
+    @staticmethod
+    def _split(path: str) -> Tuple[str, List[str]]:
+        path = os.path.normpath(path)
+        return path, [part for part in path.split(os.sep) if part]
+
+    def _find(self, parts: List[str]) -> Optional[Dict[Any, Any]]:
+        node = self.__root
+        for part in parts:
+            node = node.get(part)
+            if node is None:
+                return None
+        return node
+
+    def __setitem__(self, path: str, value: TrieValue) -> None:
+        path, parts = self._split(path)
+        node = self.__root
+        for part in parts:
+            node = node.setdefault(part, {})
+        if _VALUE not in node:
+            self.__count += 1
+        node[_VALUE] = (path, value)
+
+    def get(self, path: str, default: Optional[TrieValue] = None) -> Optional[TrieValue]:
+        node = self._find(self._split(path)[1])
+        if node is None or _VALUE not in node:
+            return default
+        return node[_VALUE][1]
+
+    def pop(self, path: str, default: Optional[TrieValue] = None) -> Optional[TrieValue]:
+        """
+        Removes the value of a path, along with the nodes left without any value or descendant.
+        """
+        parts = self._split(path)[1]
+        nodes = [self.__root]
+        for part in parts:
+            node = nodes[-1].get(part)
+            if node is None:
+                return default
+            nodes.append(node)
+        if _VALUE not in nodes[-1]:
+            return default
+        _, value = nodes[-1].pop(_VALUE)
+        self.__count -= 1
+        for depth in range(len(parts), 0, -1):
+            if nodes[depth]:
+                break
+            del nodes[depth - 1][parts[depth - 1]]
+        return value
+
+    def ancestors(self, path: str) -> Iterator[Tuple[str, TrieValue]]:
+        """
+        Iterates over the values of a path and of its ancestors, from the root down to the path itself.
+        """
+        node = self.__root
+        if _VALUE in node:
+            yield node[_VALUE]
+        for part in self._split(path)[1]:
+            node = node.get(part)
+            if node is None:
+                return
+            if _VALUE in node:
+                yield node[_VALUE]
+
+    def descendants(self, path: str) -> Iterator[Tuple[str, TrieValue]]:
+        """
+        Iterates over the values of a path and of all the paths found under it.
+        """
+        node = self._find(self._split(path)[1])
+        nodes = [node] if node is not None else []
+        while nodes:
+            node = nodes.pop()
+            for part, child in node.items():
+                if part is _VALUE:
+                    yield child
+                else:
+                    nodes.append(child)
@@ -1,6 +1,19 @@
 import re
 from copy import deepcopy
-from typing import TYPE_CHECKING, Callable, Collection, Dict, Iterator, List, MutableMapping, Tuple, Union, cast
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    Iterator,
+    List,
+    MutableMapping,
+    Pattern,
+    Tuple,
+    Union,
+    cast
+)
 
 from cowbird.config import (
     BIDIRECTIONAL_ARROW,
@@ -44,6 +57,11 @@ PermissionMapping = MutableMapping[
     ]
 ]
 
+ResourceMatcher = Tuple[
+    Pattern[str],  # compiled regex of the resource key
+    int,  # named segments count (-1 for a custom regex)
+]
+
 LOGGER = get_logger(__name__)
 
 SEGMENT_NAME_REGEX = r"[\w:-]+"
@@ -101,6 +119,71 @@ class Permission:
         return f"{self.name}-{self.access}-{self.scope}"
 
 
+class ResourceKeyIndex:
+    """
+    Index of the resource keys of a service, organized as a tree of their leading literal segments.
+
+    Resource keys of a same service usually share some literal segments before they diverge (ex.: the service name,
+    followed by a specific directory). Walking a resource tree along the index gives the only keys that could match it,
+    instead of evaluating the matcher of every key in the config.
+    """
+
+    def __init__(self, service_resources: Dict[str, List[ConfigSegment]]) -> None:
+        self.order = {res_key: index for index, res_key in enumerate(service_resources)}
+        # Each node is composed of the keys whose literal prefix ends at this node, and of its children nodes indexed by
+        # resource field, then by the name and type of the segment.
+        self.root = ResourceKeyIndex._create_node()
+        for res_key, res_segments in service_resources.items():
+            node = self.root
+            # Custom regexes are searched anywhere in the path, so their literal segments cannot be used.
+            if all(segment.get("regex") is None for segment in res_segments):
+                for segment in res_segments:
+                    if not ResourceKeyIndex._is_literal_segment(segment):
+                        break
+                    field_nodes = node["children"].setdefault(segment.get("field") or "resource_name", {})
+                    node = field_nodes.setdefault((segment["name"], segment["type"]), ResourceKeyIndex._create_node())
+            node["keys"].append(res_key)
+
+    @staticmethod
+    def _create_node() -> Dict[str, Any]:
+        return {"keys": [], "children": {}}
+
+    @staticmethod
+    def _is_literal_segment(segment: ConfigSegment) -> bool:
+        """
+        Indicates if a segment matches a single name and type, without any token or special regex character.
+        """
+        name = segment["name"]
+        if name == MULTI_TOKEN or re.match(NAMED_TOKEN_REGEX, name):
+            return False
+        return re.escape(name) == name and re.escape(segment["type"]) == segment["type"]
+
+    def get_candidates(self, src_resource_tree: ResourceTree) -> List[str]:
+        """
+        Gets the resource keys that could match the resource tree, in the same order as found in the config.
+        """
+        res_keys = []
+        nodes = [self.root]
+        for res in src_resource_tree:
+            if not nodes:
+                break
+            children = []
+            for node in nodes:
+                res_keys.extend(node["keys"])
+                for field, field_nodes in node["children"].items():
+                    res_name = str(res[field])
+                    if "/" in res_name or RES_NAMETYPE_SEPARATOR in res_name:
+                        # name would span over multiple segments of the generated path, the index cannot be used
+                        return list(self.order)
+                    child = field_nodes.get((res_name, res["resource_type"]))
+                    if child:
+                        children.append(child)
+            nodes = children
+        for node in nodes:
+            res_keys.extend(node["keys"])
+        return sorted(res_keys, key=self.order.__getitem__)
+
+
 class SyncPoint:
     """
     A sync point contains services sharing resources via multiple APIs.
@@ -124,6 +207,17 @@ class SyncPoint:
         self.services: SyncPointServicesType = services
         self.resources = {res_key: res for svc in self.services.values() for res_key, res in svc.items()}
 
+        # Precompiled matchers of each resource key, along with an index of the keys by their leading literal segments,
+        # to only evaluate the matchers of the keys that could match a given resource tree.
+        self.resource_matchers: Dict[str, Dict[str, ResourceMatcher]] = {}
+        self.resource_index: Dict[str, ResourceKeyIndex] = {}
+        for service_type, service_resources in self.services.items():
+            self.resource_matchers[service_type] = {}
+            for res_key, res_segments in service_resources.items():
+                res_regex, named_segments_count = SyncPoint._generate_regex_from_segments(res_segments)
+                self.resource_matchers[service_type][res_key] = (re.compile(res_regex), named_segments_count)
+            self.resource_index[service_type] = ResourceKeyIndex(service_resources)
+
         # Save mapping config using this format:
         # {<src_resource_key> :
         #     {<src_permission> :
@@ -284,16 +378,17 @@ class SyncPoint:
             matched_length_by_res = {}
             matched_groups_by_res = {}
             service_resources = self.services[service_type]
-            for res_key, res_segments in service_resources.items():
-                res_regex, named_segments_count = SyncPoint._generate_regex_from_segments(res_segments)
+            for res_key in self.resource_index[service_type].get_candidates(src_resource_tree):
+                res_segments = service_resources[res_key]
+                res_regex, named_segments_count = self.resource_matchers[service_type][res_key]
                 resource_nametype_path = SyncPoint._generate_nametype_path_from_segments(res_segments,
                                                                                          src_resource_tree)
                 if named_segments_count == -1:
                     # To be able to match a path anywhere in the resource_nametype_path we need to use search
                     # only when the field regex is passed in the res_segments. This allow to stay backward compatible.
-                    matches = re.search(res_regex, resource_nametype_path)
+                    matches = res_regex.search(resource_nametype_path)
                 else:
-                    matches = re.match(res_regex, resource_nametype_path)
+                    matches = res_regex.match(resource_nametype_path)
                 if matches:
                     exact_match = matches.group()
                     matched_groups = matches.groupdict() if named_segments_count != -1 else exact_match
@@ -114,6 +114,25 @@ HandlerConfig = TypedDict(
     total=True,
 )
 
+MonitoringPathConfig = TypedDict(
+    "MonitoringPathConfig",
+    {
+        "path": str,
+        "backend": str,
+    },
+    total=True,
+)
+MonitoringConfig = TypedDict(
+    "MonitoringConfig",
+    {
+        "backend": NotRequired[str],
+        "poll_interval": NotRequired[float],
+        "poll_max_interval": NotRequired[float],
+        "paths": NotRequired[List[MonitoringPathConfig]],
+    },
+    total=True,
+)
+
 # registered configurations
 ConfigItem = Dict[str, JSON]
 ConfigList = List[ConfigItem]
@@ -1,17 +1,38 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import bisect
 import importlib
+import itertools
 import json
 import logging
 import os
+import queue
 import stat
 import subprocess  # nosec B404
 import sys
+import threading
+import time
 import types
+from collections import OrderedDict
 from configparser import ConfigParser
 from enum import Enum
 from inspect import isclass, isfunction
-from typing import Any, Callable, Dict, List, NoReturn, Optional, Type, TypeVar, Union, cast
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Mapping,
+    NoReturn,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+    cast
+)
 from typing_extensions import TypeAlias
 
 from celery.app import Celery
@@ -24,6 +45,9 @@ from pyramid.response import Response
 from pyramid.settings import asbool, truthy
 from pyramid.threadlocal import get_current_registry
 from pyramid_celery import celery_app as pyramid_celery_app
+from requests import Response as RequestsResponse
+from requests import Session
+from requests.adapters import HTTPAdapter
 from requests.structures import CaseInsensitiveDict
 from webob.headers import EnvironHeaders, ResponseHeaders
 
@@ -70,6 +94,9 @@ CLI_MODE_CFG = "cli_mode"
 # This setting is set to true before creating the test app, the pyramid app use the default false value
 USE_TEST_CELERY_APP_CFG = "use_test_celery_app"
 
+# Upper bounds (in seconds) of the buckets of the latency histograms of the requests sent to the web services
+DEFAULT_LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
 EnumClassType = TypeVar("EnumClassType", bound=Enum)  # pylint: disable=invalid-name
 
 
@@ -591,12 +618,360 @@ def get_ssl_verify(container: Optional[AnySettingsContainer] = None) -> bool:
                                print_missing=True))
 
 
+def get_webhook_async(container: Optional[AnySettingsContainer] = None) -> bool:
+    return asbool(get_constant("COWBIRD_WEBHOOK_ASYNC", container,
+                               default_value=False,
+                               raise_missing=False,
+                               raise_not_set=False))
+
+
+def get_dispatch_workers(container: Optional[AnySettingsContainer] = None) -> int:
+    return max(1, int(get_constant("COWBIRD_DISPATCH_WORKERS", container,
+                                   default_value=1,
+                                   raise_missing=False, raise_not_set=False)))
+
+
+def get_monitoring_observers(container: Optional[AnySettingsContainer] = None) -> int:
+    return max(1, int(get_constant("COWBIRD_MONITORING_OBSERVERS", container,
+                                   default_value=1,
+                                   raise_missing=False, raise_not_set=False)))
+
+
+def get_monitoring_validation_workers(container: Optional[AnySettingsContainer] = None) -> int:
+    return max(1, int(get_constant("COWBIRD_MONITORING_VALIDATION_WORKERS", container,
+                                   default_value=1,
+                                   raise_missing=False, raise_not_set=False)))
+
+
+def get_monitoring_workers(container: Optional[AnySettingsContainer] = None) -> int:
+    return max(0, int(get_constant("COWBIRD_MONITORING_WORKERS", container,
+                                   default_value=0,
+                                   raise_missing=False, raise_not_set=False)))
+
+
+def get_monitoring_queue_size(container: Optional[AnySettingsContainer] = None) -> int:
+    return max(1, int(get_constant("COWBIRD_MONITORING_QUEUE_SIZE", container,
+                                   default_value=1000,
+                                   raise_missing=False, raise_not_set=False)))
+
+
+def get_monitoring_overflow_policy(container: Optional[AnySettingsContainer] = None) -> str:
+    return str(get_constant("COWBIRD_MONITORING_OVERFLOW_POLICY", container,
+                            default_value="block",
+                            raise_missing=False, raise_not_set=False))
+
+
+def get_monitoring_journal(container: Optional[AnySettingsContainer] = None) -> bool:
+    return asbool(get_constant("COWBIRD_MONITORING_JOURNAL", container,
+                               default_value=False,
+                               raise_missing=False, raise_not_set=False))
+
+
+def get_monitoring_journal_retention(container: Optional[AnySettingsContainer] = None) -> int:
+    return max(1, int(get_constant("COWBIRD_MONITORING_JOURNAL_RETENTION", container,
+                                   default_value=86400,
+                                   raise_missing=False, raise_not_set=False)))
+
+
+def get_monitoring_checkpoint_interval(container: Optional[AnySettingsContainer] = None) -> int:
+    return max(0, int(get_constant("COWBIRD_MONITORING_CHECKPOINT_INTERVAL", container,
+                                   default_value=60,
+                                   raise_missing=False, raise_not_set=False)))
+
+
+def get_monitoring_lazy(container: Optional[AnySettingsContainer] = None) -> bool:
+    return asbool(get_constant("COWBIRD_MONITORING_LAZY", container,
+                               default_value=False,
+                               raise_missing=False, raise_not_set=False))
+
+
+def get_monitoring_idle_timeout(container: Optional[AnySettingsContainer] = None) -> int:
+    return max(0, int(get_constant("COWBIRD_MONITORING_IDLE_TIMEOUT", container,
+                                   default_value=3600,
+                                   raise_missing=False, raise_not_set=False)))
+
+
+def get_monitoring_max_active(container: Optional[AnySettingsContainer] = None) -> int:
+    return max(0, int(get_constant("COWBIRD_MONITORING_MAX_ACTIVE", container,
+                                   default_value=0,
+                                   raise_missing=False, raise_not_set=False)))
+
+
 def get_timeout(container: Optional[AnySettingsContainer] = None) -> int:
     return int(get_constant("COWBIRD_REQUEST_TIMEOUT", container,
                             default_value=5,
                             raise_missing=False, raise_not_set=False))
 
 
+class HTTPSessionPool(object):
+    """
+    Persistent :class:`requests.Session` with a bounded connection pool, to reuse connections to a same web service.
+
+    The session is only created on first use, and is recreated whenever the current process is not the one that created
+    it. This way, a pool inherited through a ``fork`` (e.g.: `Celery` prefork workers) never shares its sockets with the
+    parent process. Within a process, the underlying :mod:`urllib3` pools are safe to use concurrently from threads.
+    """
+
+    def __init__(self,
+                 pool_connections: int = 10,
+                 pool_maxsize: int = 10,
+                 pool_block: bool = False,
+                 keep_alive: bool = True,
+                 auth: Optional[Tuple[str, str]] = None,
+                 ) -> None:
+        """
+        :param pool_connections: Number of distinct hosts for which connection pools are cached.
+        :param pool_maxsize: Maximum number of connections kept open in the pool of each host.
+        :param pool_block: Block when all connections of a host pool are in use instead of opening an extra one.
+        :param keep_alive: Reuse connections between requests. Otherwise, connections are closed after each request.
+        :param auth: Basic authentication credentials sent with every request of the session.
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.auth = auth
+        self._session: Optional[Session] = None
+        self._session_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> Session:
+        """
+        Session of the current process, created if missing.
+        """
+        session = self._session
+        if session is not None and self._session_pid == os.getpid():
+            return session
+        with self._lock:
+            if self._session is None or self._session_pid != os.getpid():
+                # do not close an inherited session, its sockets still belong to the parent process
+                self._session = self._create_session()
+                self._session_pid = os.getpid()
+            return self._session
+
+    def _create_session(self) -> Session:
+        session = Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize,
+                              pool_block=self.pool_block)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        if not self.keep_alive:
+            session.headers["Connection"] = "close"
+        if self.auth:
+            session.auth = self.auth
+        return session
+
+    def request(self, method: str, url: str, **kwargs: Any) -> RequestsResponse:
+        """
+        Sends a request using the pooled session. Arguments are the same as :meth:`requests.Session.request`.
+        """
+        return self.session.request(method=method, url=url, **kwargs)
+
+    def close(self) -> None:
+        """
+        Closes all connections of the session owned by the current process.
+        """
+        with self._lock:
+            if self._session is not None and self._session_pid == os.getpid():
+                self._session.close()
+            self._session = None
+            self._session_pid = None
+
+
+class TTLCache(object):
+    """
+    Thread-safe cache of values that expire after a time-to-live, bounded in size by evicting the least recently used
+    entries. Hits and misses are counted to evaluate how many lookups the cache avoids.
+
+    A cache defined with a null time-to-live or size is disabled, and never retains any value.
+    """
+
+    def __init__(self, ttl: float, maxsize: int) -> None:
+        """
+        :param ttl: Duration (in seconds) after which a cached value expires.
+        :param maxsize: Maximum number of cached values.
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.maxsize > 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Returns the cached value of the key if it did not expire, or the default value otherwise.
+        """
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._items[key]
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Removes the key from the cache, returning its value if it was cached.
+        """
+        with self._lock:
+            item = self._items.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def reset(self, items: Mapping[Hashable, Any]) -> None:
+        """
+        Replaces all cached values by the specified ones at once, such that concurrent lookups never find the cache
+        partially filled.
+        """
+        if not self.enabled:
+            return
+        expiry = time.monotonic() + self.ttl
+        # keep the last values when they exceed the size, as if set one after the other
+        cached_items = OrderedDict((key, (expiry, value)) for key, value in list(items.items())[-self.maxsize:])
+        with self._lock:
+            self._items = cached_items
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            item = self._items.get(key)
+            return item is not None and item[0] >= time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """
+        Summary of the cache usage.
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self), "maxsize": self.maxsize, "ttl": self.ttl}
+
+
+class LatencyHistogram(object):
+    """
+    Thread-safe histogram of durations, counting the durations that fit in each bucket along with their total.
+
+    Buckets are cumulative, each one counting the durations lower or equal to its upper bound, as done by `Prometheus`.
+    """
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS) -> None:
+        """
+        :param buckets: Upper bounds (in seconds) of the buckets, an extra bucket counting all the durations.
+        """
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, duration: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, duration)] += 1
+            self.total += duration
+            self.max = max(self.max, duration)
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Summary of the observed durations, with the cumulative count of each bucket labelled by its upper bound.
+        """
+        with self._lock:
+            counts = list(itertools.accumulate(self._counts))
+            return {
+                "count": counts[-1],
+                "total": self.total,
+                "max": self.max,
+                "buckets": {**{str(bound): count for bound, count in zip(self.buckets, counts)}, "+Inf": counts[-1]},
+            }
+
+
+def run_partitioned_tasks(items: Iterable[Tuple[Hashable, Any]],
+                          func: Callable[[Any], None],
+                          workers: int,
+                          queue_size: int,
+                          ) -> Tuple[int, List[Exception]]:
+    """
+    Processes items with a pool of worker threads, where each item is processed by the worker owning its partition key.
+
+    Items of a same partition are processed sequentially and in order by a single worker, such that workers never
+    contend on the same partition. Items are streamed through bounded queues, blocking the producer while the workers
+    fall behind, so the iterable is never loaded in memory all at once. Using a single worker processes all items in
+    the calling thread.
+
+    :param items: Pairs of partition key and item to process.
+    :param func: Function applied to each item. Raised exceptions are collected without interrupting the processing.
+    :param workers: Number of worker threads.
+    :param queue_size: Maximum number of pending items, shared between the queues of all workers.
+    :returns: Number of processed items and the exceptions raised while processing them.
+    """
+    errors: List[Exception] = []
+    if workers <= 1:
+        count = 0
+        for _, item in items:
+            try:
+                func(item)
+            except Exception as exc:  # noqa
+                errors.append(exc)
+            count += 1
+        return count, errors
+
+    stop = object()
+    queues: List["queue.Queue[Any]"] = [queue.Queue(maxsize=max(1, queue_size // workers)) for _ in range(workers)]
+    counts = [0] * workers
+    errors_lock = threading.Lock()
+
+    def work(index: int) -> None:
+        worker_queue = queues[index]
+        while True:
+            item = worker_queue.get()
+            if item is stop:
+                return
+            try:
+                func(item)
+            except Exception as exc:  # noqa
+                with errors_lock:
+                    errors.append(exc)
+            counts[index] += 1
+
+    threads = [threading.Thread(target=work, args=(index,), name=f"partitioned-worker-{index}", daemon=True)
+               for index in range(workers)]
+    for thread in threads:
+        thread.start()
+    try:
+        for key, item in items:
+            queues[hash(key) % workers].put(item)
+    finally:
+        for worker_queue in queues:
+            worker_queue.put(stop)
+        for thread in threads:
+            thread.join()
+    return sum(counts), errors
+
+
 def apply_new_path_permissions(path: str, is_readable: bool, is_writable: bool, is_executable: bool) -> None:
     """
     Applies new permissions to a path, if required.
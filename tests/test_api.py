@@ -10,17 +10,31 @@ Tests for :mod:`cowbird.api` module.
 import contextlib
 import os
 import tempfile
+import time
 import unittest
 
 import mock
+import mongomock
 import pytest
 import yaml
+from celery import chain
+from pymongo.collection import Collection
 
+from cowbird.api.webhooks import tasks
+from cowbird.api.webhooks.views import WebhookDispatchException, dispatch
+from cowbird.database.stores import WebhookEventStatus, WebhookEventStore
 from cowbird.handlers.handler_factory import HandlerFactory
 from cowbird.utils import CONTENT_TYPE_JSON
 from tests import utils
 
 
+def eager_chain(*signatures):
+    """
+    Replaces the asynchronous execution of a chain of tasks by its immediate execution in the current process.
+    """
+    return mock.MagicMock(delay=lambda: chain(*signatures).apply())
+
+
 @pytest.mark.api
 class TestAPI(unittest.TestCase):
     # pylint: disable=C0103,invalid-name
@@ -50,6 +64,20 @@ class TestAPI(unittest.TestCase):
         utils.check_val_is_in("documentation", body)
         utils.check_val_is_in("cowbird", body["name"])
 
+    def test_monitoring(self):
+        resp = utils.test_request(self.app, "GET", "/monitoring")
+        body = utils.check_response_basic_info(resp)
+        utils.check_val_is_in("monitoring", body)
+        utils.check_val_is_in("monitors", body["monitoring"])
+        for stat in ["observers", "threads", "watches", "handlers", "inotify"]:
+            utils.check_val_is_in(stat, body["monitoring"]["observers"])
+        for stat in ["workers", "queued", "spilled", "processed", "dropped"]:
+            utils.check_val_is_in(stat, body["monitoring"]["dispatcher"])
+        for stat in ["load", "start", "catch_up"]:
+            utils.check_val_is_in(stat, body["monitoring"]["startup"])
+        for stat in ["active", "activations", "deactivations"]:
+            utils.check_val_is_in(stat, body["monitoring"]["activation"])
+
     def test_webhooks(self):
         """
         Test that sends a webhook request from Magpie to cowbird.
@@ -98,6 +126,187 @@ class TestAPI(unittest.TestCase):
             utils.check_response_basic_info(resp, 200, expected_method="POST")
             assert len(magpie.json()["event_perms"]) == 0
 
+    def test_webhooks_async(self):
+        """
+        Test that sends a webhook request from Magpie to cowbird, dispatched asynchronously.
+        """
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(mock.patch("cowbird.handlers.impl.magpie.Magpie",
+                                           side_effect=utils.MockMagpieHandler))
+            stack.enter_context(mock.patch.dict(os.environ, {"COWBIRD_WEBHOOK_ASYNC": "true"}))
+            stack.enter_context(mock.patch("cowbird.api.webhooks.tasks.chain", side_effect=eager_chain))
+            # the test celery app does not reference the application registry, use the same database as the app
+            registry = self.app.app.registry
+            stack.enter_context(mock.patch("cowbird.api.webhooks.tasks._get_task_store",
+                                           side_effect=lambda task: tasks.get_webhook_event_store(registry)))
+            data = {
+                "event": "created",
+                "user_name": "test_user",
+                "callback_url": "http://magpie.domain.ca/tmp/109e1d0d-e27c-4601-9d45-984c9b61ebff"
+            }
+            resp = utils.test_request(self.app, "POST", "/webhooks/users", json=data)
+            body = utils.check_response_basic_info(resp, 202, expected_method="POST")
+            magpie = HandlerFactory().get_handler("Magpie")
+            assert magpie.json()["event_users"] == [data["user_name"]]
+
+            resp = utils.test_request(self.app, "GET", f"/webhooks/events/{body['event_id']}")
+            body = utils.check_response_basic_info(resp)
+            assert body["event"]["status"] == WebhookEventStatus.SUCCEEDED.value
+            assert body["event"]["handlers"] == {"Magpie": {"status": WebhookEventStatus.SUCCEEDED.value}}
+
+            resp = utils.test_request(self.app, "GET", "/webhooks/events/unknown", expect_errors=True)
+            utils.check_response_basic_info(resp, 404)
+
+    def test_webhooks_async_application_work(self):
+        """
+        Test that the monitors and the Magpie cached resources are updated by the application before the asynchronous
+        dispatch of the webhook events, since the Celery workers cannot do it for the application.
+        """
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(mock.patch("cowbird.handlers.impl.magpie.Magpie",
+                                           side_effect=utils.MockMagpieHandler))
+            stack.enter_context(mock.patch.dict(os.environ, {"COWBIRD_WEBHOOK_ASYNC": "true"}))
+            # the tasks are never executed, as if the workers were not available
+            chain_mock = stack.enter_context(mock.patch("cowbird.api.webhooks.tasks.chain"))
+            start_mock = stack.enter_context(mock.patch.object(utils.MockMagpieHandler, "start_user_monitoring"))
+            stop_mock = stack.enter_context(mock.patch.object(utils.MockMagpieHandler, "stop_user_monitoring"))
+            invalidate_mock = stack.enter_context(mock.patch("cowbird.api.webhooks.views.invalidate_magpie_resources"))
+
+            magpie = HandlerFactory().get_handler("Magpie")
+            event_users = list(magpie.json()["event_users"])
+            callback_url = "http://magpie.domain.ca/tmp/109e1d0d-e27c-4601-9d45-984c9b61ebff"
+            for event, monitor_mock in [("created", start_mock), ("deleted", stop_mock)]:
+                data = {"event": event, "user_name": "test_user", "callback_url": callback_url}
+                resp = utils.test_request(self.app, "POST", "/webhooks/users", json=data)
+                utils.check_response_basic_info(resp, 202, expected_method="POST")
+                monitor_mock.assert_called_once_with(user_name="test_user")
+            # the handlers were not notified by the application
+            assert magpie.json()["event_users"] == event_users
+
+            data = {
+                "event": "created",
+                "service_name": "thredds",
+                "service_type": "thredds",
+                "resource_id": 1,
+                "resource_full_name": "thredds/birdhouse/file.nc",
+                "name": "read",
+                "access": "allow",
+                "scope": "recursive",
+                "user": "test_user",
+                "group": None
+            }
+            resp = utils.test_request(self.app, "POST", "/webhooks/permissions", json=data)
+            utils.check_response_basic_info(resp, 202, expected_method="POST")
+            invalidate_mock.assert_called_once_with(1, "thredds")
+            assert chain_mock.return_value.delay.call_count == 3
+
+
+@pytest.mark.api
+class TestWebhookAsyncDispatch(unittest.TestCase):
+    """
+    Test the asynchronous dispatch of webhook events, using an in-memory database and mocked handlers.
+    """
+
+    def setUp(self):
+        self.store = WebhookEventStore(collection=mock.Mock(spec=Collection,
+                                                            wraps=mongomock.MongoClient().db.webhook_events))
+        self.handlers = [mock.MagicMock(), mock.MagicMock()]
+        self.handlers[0].name = "FileSystem"
+        self.handlers[1].name = "Geoserver"
+        self.patchers = [
+            mock.patch("cowbird.api.webhooks.tasks.get_webhook_event_store", return_value=self.store),
+            mock.patch("cowbird.api.webhooks.tasks.get_handlers", return_value=self.handlers),
+            mock.patch("cowbird.api.webhooks.tasks.chain", side_effect=eager_chain),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test_dispatch_user_event(self):
+        event_id = tasks.dispatch_async({}, tasks.USER_WEBHOOK, "created", {"user_name": "test_user"})
+
+        for handler in self.handlers:
+            handler.user_created.assert_called_once_with(user_name="test_user")
+        event = self.store.get_event(event_id)
+        assert event["status"] == WebhookEventStatus.SUCCEEDED.value
+        assert event["handlers"] == {"FileSystem": {"status": WebhookEventStatus.SUCCEEDED.value},
+                                     "Geoserver": {"status": WebhookEventStatus.SUCCEEDED.value}}
+
+    def test_dispatch_permission_event(self):
+        payload = {"service_name": "thredds", "service_type": "thredds", "resource_id": 1,
+                   "resource_full_name": "thredds/birdhouse/file.nc", "resource_display_name": None,
+                   "name": "read", "access": "allow", "scope": "recursive", "user": "test_user", "group": None}
+        tasks.dispatch_async({}, tasks.PERMISSION_WEBHOOK, "deleted", payload)
+
+        for handler in self.handlers:
+            assert vars(handler.permission_deleted.call_args.kwargs["permission"]) == payload
+
+    @mock.patch("cowbird.api.webhooks.tasks.call_magpie_callback")
+    def test_dispatch_handler_failure(self, callback_mock):
+        self.handlers[0].user_created.side_effect = ValueError("failed")
+        callback_url = "http://magpie.domain.ca/tmp/109e1d0d-e27c-4601-9d45-984c9b61ebff"
+        event_id = tasks.dispatch_async({}, tasks.USER_WEBHOOK, "created", {"user_name": "test_user"},
+                                        callback_url=callback_url)
+
+        # other handlers are still notified
+        self.handlers[1].user_created.assert_called_once_with(user_name="test_user")
+        event = self.store.get_event(event_id)
+        assert event["status"] == WebhookEventStatus.FAILED.value
+        assert event["handlers"]["FileSystem"] == {"status": WebhookEventStatus.FAILED.value,
+                                                   "error": "ValueError('failed')"}
+        assert event["handlers"]["Geoserver"] == {"status": WebhookEventStatus.SUCCEEDED.value}
+        assert callback_mock.call_args.args[0] == callback_url
+
+
+@pytest.mark.api
+class TestWebhookDispatch(unittest.TestCase):
+    """
+    Test the synchronous dispatch of webhook events to the handlers, using mocked handlers.
+    """
+
+    def setUp(self):
+        self.calls = {}
+        self.handlers = []
+        for name, priority, error in [("Magpie", 1, None), ("FileSystem", 1, ValueError("failed")),
+                                      ("Geoserver", 2, RuntimeError("failed"))]:
+            handler = mock.MagicMock(priority=priority)
+            handler.name = name
+            handler.process.side_effect = self.get_process(name, error)
+            self.handlers.append(handler)
+
+    def get_process(self, name, error):
+        def process():
+            start = time.perf_counter()
+            time.sleep(0.2)
+            self.calls[name] = (start, time.perf_counter())
+            if error:
+                raise error
+        return process
+
+    def dispatch(self, workers):
+        with mock.patch.dict(os.environ, {"COWBIRD_DISPATCH_WORKERS": str(workers)}):
+            with mock.patch("cowbird.api.webhooks.views.get_handlers", return_value=self.handlers):
+                with pytest.raises(WebhookDispatchException) as exc_info:
+                    dispatch(lambda handler: handler.process())
+        # exceptions are collected in the order of the handlers, and every handler is notified
+        assert [repr(exc) for exc in exc_info.value.args[0]] == ["ValueError('failed')", "RuntimeError('failed')"]
+        assert set(self.calls) == {"Magpie", "FileSystem", "Geoserver"}
+
+    def test_dispatch_serial(self):
+        self.dispatch(workers=1)
+        assert self.calls["Magpie"][1] <= self.calls["FileSystem"][0]
+        assert self.calls["FileSystem"][1] <= self.calls["Geoserver"][0]
+
+    def test_dispatch_concurrent_tiers(self):
+        self.dispatch(workers=4)
+        # handlers of a same priority run concurrently, the next priority tier only starts once they are completed
+        assert self.calls["Magpie"][0] < self.calls["FileSystem"][1]
+        assert self.calls["FileSystem"][0] < self.calls["Magpie"][1]
+        assert max(self.calls["Magpie"][1], self.calls["FileSystem"][1]) <= self.calls["Geoserver"][0]
+
 
 @pytest.mark.api
 def test_response_metadata():
@@ -5,19 +5,24 @@ import shutil
 import tempfile
 import unittest
 from pathlib import Path
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
+import mongomock
 import pytest
 import yaml
 from dotenv import load_dotenv
 from magpie.models import Permission, Route
 from magpie.permissions import Access, Scope
 from magpie.services import ServiceAPI
+from pymongo.collection import Collection
 from webtest.app import TestApp
 
 from cowbird.api.schemas import ValidOperations
+from cowbird.database.stores import HardlinkIndexStatusStore, HardlinkIndexStore
 from cowbird.handlers import HandlerFactory
-from cowbird.handlers.impl.filesystem import DEFAULT_NOTEBOOKS_DIR_NAME
+from cowbird.handlers.impl.filesystem import DEFAULT_NOTEBOOKS_DIR_NAME, FileSystem
+from cowbird.monitoring.fsmonitor import FSEvent, FSEventType
+from cowbird.permissions_synchronizer import Permission as CowbirdPermission
 from cowbird.typedefs import JSON
 from tests import test_magpie, utils
 
@@ -99,7 +104,7 @@ class TestFileSystemBasic(BaseTestFileSystem):
     """
     Test FileSystem generic operations.
     """
-    @patch("cowbird.api.webhooks.views.requests.head")
+    @patch("cowbird.api.webhooks.tasks.requests.head")
     def test_manage_user_workspace(self, mock_head_request):
         """
         Tests creating and deleting a user workspace.
@@ -178,7 +183,7 @@ class TestFileSystemBasic(BaseTestFileSystem):
         utils.check_response_basic_info(resp, 200, expected_method="POST")
         assert not self.user_workspace_dir.exists()
 
-    @patch("cowbird.api.webhooks.views.requests.head")
+    @patch("cowbird.api.webhooks.tasks.requests.head")
     def test_create_user_missing_workspace_dir(self, mock_head_request):
         """
         Tests creating a user directory with a missing workspace directory.
@@ -366,6 +371,28 @@ class TestFileSystemBasic(BaseTestFileSystem):
         # Check that previous file still exists, since resyncing was skipped because of the missing source folder
         assert os.path.exists(old_nested_file)
 
+    def test_resync_dry_run(self):
+        """
+        Tests the resync operation requested in dry-run mode.
+        """
+        app = self.get_test_app({
+            "handlers": {
+                "FileSystem": {
+                    "active": True,
+                    "workspace_dir": self.workspace_dir,
+                    "jupyterhub_user_data_dir": self.jupyterhub_user_data_dir,
+                    "wps_outputs_dir": self.wps_outputs_dir}}})
+
+        with patch.object(FileSystem, "resync") as resync:
+            resp = utils.test_request(app, "PUT", "/handlers/FileSystem/resync?dry_run=true")
+            assert resp.status_code == 200
+            resync.assert_called_once_with(dry_run=True)
+
+            resync.reset_mock()
+            resp = utils.test_request(app, "PUT", "/handlers/FileSystem/resync")
+            assert resp.status_code == 200
+            resync.assert_called_once_with(dry_run=False)
+
 
 @pytest.mark.filesystem
 class TestFileSystemWpsOutputsUser(BaseTestFileSystem):
@@ -866,3 +893,355 @@ class TestFileSystemWpsOutputsUser(BaseTestFileSystem):
         resp = utils.test_request(self.app, "POST", "/webhooks/permissions", json=data)
         assert resp.status_code == 200
         utils.check_path_permissions(self.test_file, 0o664)
+
+
+@pytest.mark.filesystem
+class TestFileSystemPermissionResolver(BaseTestFileSystem):
+    """
+    Tests the batch resolution of the ``secure-data-proxy`` permissions, using a mocked Magpie handler.
+    """
+    def setUp(self):
+        super().setUp()
+        self.filesystem = FileSystem({}, "FileSystem", workspace_dir=self.workspace_dir,
+                                     jupyterhub_user_data_dir=self.jupyterhub_user_data_dir,
+                                     wps_outputs_dir=self.wps_outputs_dir)
+        # secure-data-proxy routes : /wps_outputs/weaver/users/1 and /wps_outputs/weaver/users/2
+        users_route = {"resource_id": 4, "resource_name": "users", "children": {
+            "5": {"resource_id": 5, "resource_name": "1", "children": {}},
+            "6": {"resource_id": 6, "resource_name": "2", "children": {}},
+        }}
+        service = {"resource_id": 1, "resource_name": self.secure_data_proxy_name, "children": {
+            "2": {"resource_id": 2, "resource_name": "wps_outputs", "children": {
+                "3": {"resource_id": 3, "resource_name": "weaver", "children": {"4": users_route}}}}}}
+        self.magpie_handler = MagicMock()
+        self.magpie_handler.get_service_info.return_value = {"resource_id": 1}
+        self.magpie_handler.get_resource.return_value = service
+        self.magpie_handler.get_user_permissions_by_res_id.side_effect = lambda user, res_id, effective: {
+            "permissions": [{"name": Permission.READ.value, "access": Access.ALLOW.value if res_id == 5
+                             else Access.DENY.value},
+                            {"name": Permission.WRITE.value, "access": Access.DENY.value}]}
+        self.factory_patcher = patch("cowbird.handlers.impl.filesystem.HandlerFactory")
+        self.factory_patcher.start().return_value.get_handler.return_value = self.magpie_handler
+
+    def tearDown(self):
+        self.factory_patcher.stop()
+        super().tearDown()
+
+    def test_resolve_permissions_batch(self):
+        user_paths = []
+        for user_id, user_name in [(1, "user1"), (2, "user2")]:
+            for job in range(50):
+                user_paths.append((user_name, f"{self.wps_outputs_dir}/weaver/users/{user_id}/{job}/output.txt"))
+        user_paths.append(("user1", f"{self.wps_outputs_dir}/other_bird/users/1/output.txt"))
+
+        perms = self.filesystem.resolve_secure_data_proxy_perms(user_paths)
+
+        assert len(perms) == len(user_paths)
+        assert perms[("user1", f"{self.wps_outputs_dir}/weaver/users/1/0/output.txt")] == (True, False)
+        assert perms[("user2", f"{self.wps_outputs_dir}/weaver/users/2/0/output.txt")] == (False, False)
+        # closest route is the 'wps_outputs' resource, not allowed by the mocked permissions
+        assert perms[("user1", f"{self.wps_outputs_dir}/other_bird/users/1/output.txt")] == (False, False)
+        # a single effective permissions request per distinct user and closest route resource
+        requested = sorted((call.kwargs["user"], call.kwargs["res_id"])
+                           for call in self.magpie_handler.get_user_permissions_by_res_id.call_args_list)
+        assert requested == [("user1", 2), ("user1", 5), ("user2", 6)]
+        self.magpie_handler.get_resource.assert_called_once()
+
+    def test_on_events_batch(self):
+        self.magpie_handler.get_user_name_from_user_id.side_effect = lambda user_id: f"user{user_id}"
+        self.magpie_handler.get_services_by_type.return_value = {self.secure_data_proxy_name: {}}
+        os.mkdir(os.path.join(self.workspace_dir, "user1"))
+        output_dir = os.path.join(self.wps_outputs_dir, "weaver/users/1/job")
+        os.makedirs(output_dir)
+        events = [FSEvent(output_dir, FSEventType.CREATED)]
+        src_paths = []
+        for i in range(100):
+            src_paths.append(os.path.join(output_dir, f"output{i}.txt"))
+            Path(src_paths[-1]).touch()
+            events.append(FSEvent(src_paths[-1], FSEventType.CREATED))
+        events.append(FSEvent(output_dir, FSEventType.MODIFIED))
+        public_path = os.path.join(self.wps_outputs_dir, "weaver/public_output.txt")
+        Path(public_path).touch()
+        events.append(FSEvent(public_path, FSEventType.CREATED))
+
+        self.filesystem.on_events(events)
+
+        for i, src_path in enumerate(src_paths):
+            hardlink = self.filesystem.get_user_hardlink(src_path=src_path, bird_name="weaver", user_name="user1",
+                                                         subpath=f"job/output{i}.txt")
+            assert os.stat(hardlink).st_nlink == 2
+        assert os.stat(self.filesystem._get_public_hardlink(public_path)).st_nlink == 2
+        # the user and the permissions of all the files are only resolved once
+        self.magpie_handler.get_user_name_from_user_id.assert_called_once_with(1)
+        self.magpie_handler.get_user_permissions_by_res_id.assert_called_once()
+
+
+class TestFileSystemResyncReconcile(BaseTestFileSystem):
+    """
+    Tests the resync operation reconciling the WPS outputs hardlinks with multiple workers, using a mocked Magpie
+    handler.
+    """
+    def setUp(self):
+        super().setUp()
+        self.filesystem = FileSystem({}, "FileSystem", workspace_dir=self.workspace_dir,
+                                     jupyterhub_user_data_dir=self.jupyterhub_user_data_dir,
+                                     wps_outputs_dir=self.wps_outputs_dir, resync_workers=3, resync_queue_size=4)
+        self.magpie_handler = MagicMock()
+        self.magpie_handler.get_user_list.return_value = ["user1", "user2"]
+        self.magpie_handler.get_user_name_from_user_id.side_effect = lambda user_id: f"user{user_id}"
+        self.magpie_handler.get_services_by_type.return_value = {}  # no secure-data-proxy, user files are readable
+        self.factory_patcher = patch("cowbird.handlers.impl.filesystem.HandlerFactory")
+        self.factory_patcher.start().return_value.get_handler.return_value = self.magpie_handler
+
+    def tearDown(self):
+        self.factory_patcher.stop()
+        super().tearDown()
+
+    def test_resync_partitioned(self):
+        for user_name in self.magpie_handler.get_user_list.return_value:
+            os.mkdir(os.path.join(self.workspace_dir, user_name))
+        hardlinks = []
+        for bird in ["weaver", "finch", "hummingbird"]:
+            for user_id in [1, 2]:
+                for job in range(10):
+                    src_path = os.path.join(self.wps_outputs_dir, f"{bird}/users/{user_id}/{job}/output.txt")
+                    os.makedirs(os.path.dirname(src_path))
+                    Path(src_path).touch()
+                    hardlinks.append(self.filesystem.get_user_hardlink(src_path=src_path, bird_name=bird,
+                                                                       user_name=f"user{user_id}",
+                                                                       subpath=f"{job}/output.txt"))
+            public_path = os.path.join(self.wps_outputs_dir, f"{bird}/public_output.txt")
+            Path(public_path).touch()
+            hardlinks.append(self.filesystem._get_public_hardlink(public_path))
+        root_path = os.path.join(self.wps_outputs_dir, "root_output.txt")
+        Path(root_path).touch()
+        hardlinks.append(self.filesystem._get_public_hardlink(root_path))
+
+        assert self.filesystem._get_wps_outputs_partition(root_path) == ("",)
+        assert self.filesystem._get_wps_outputs_partition(public_path) == ("hummingbird",)
+        assert self.filesystem._get_wps_outputs_partition(
+            os.path.join(self.wps_outputs_dir, "weaver/users/2/0/output.txt")) == ("weaver", "2")
+
+        self.filesystem.resync()
+
+        for hardlink in hardlinks:
+            assert os.stat(hardlink).st_nlink == 2
+        report = self.filesystem.json()["resync"]
+        assert report["files"] == len(hardlinks)
+        assert report["errors"] == 0
+        assert report["diff"]["created"] == len(hardlinks)
+        assert set(report["phases"]) == {"hardlinks", "prune"}
+
+    def test_resync_permissions_by_directory(self):
+        os.mkdir(os.path.join(self.workspace_dir, "user1"))
+        service = {"resource_id": 1, "resource_name": self.secure_data_proxy_name, "children": {}}
+        self.magpie_handler.get_services_by_type.return_value = {self.secure_data_proxy_name: {}}
+        self.magpie_handler.get_service_info.return_value = {"resource_id": 1}
+        self.magpie_handler.get_resource.return_value = service
+        self.magpie_handler.get_user_permissions_by_res_id.return_value = {
+            "permissions": [{"name": Permission.READ.value, "access": Access.ALLOW.value},
+                            {"name": Permission.WRITE.value, "access": Access.DENY.value}]}
+        hardlinks = []
+        for job in range(3):
+            for output in range(10):
+                src_path = os.path.join(self.wps_outputs_dir, f"weaver/users/1/{job}/output{output}.txt")
+                os.makedirs(os.path.dirname(src_path), exist_ok=True)
+                Path(src_path).touch()
+                hardlinks.append(self.filesystem.get_user_hardlink(src_path=src_path, bird_name="weaver",
+                                                                   user_name="user1",
+                                                                   subpath=f"{job}/output{output}.txt"))
+
+        # no route matches the files, they are only resolved to not be accessible
+        self.filesystem.resync()
+        assert self.filesystem.resync_report["files"] == 30
+        for hardlink in hardlinks:
+            assert not os.path.exists(hardlink)
+
+        service["children"] = {"2": {"resource_id": 2, "resource_name": "wps_outputs", "children": {}}}
+        self.filesystem.resync()
+        for hardlink in hardlinks:
+            assert os.stat(hardlink).st_nlink == 2
+        # the permissions of the files are resolved once per directory instead of once per file
+        assert self.magpie_handler.get_user_permissions_by_res_id.call_count == 3
+        assert self.magpie_handler.get_resource.call_count == 6
+
+    def test_resync_partitioned_errors(self):
+        for job in range(5):
+            src_path = os.path.join(self.wps_outputs_dir, f"weaver/users/1/{job}/output.txt")
+            os.makedirs(os.path.dirname(src_path))
+            Path(src_path).touch()
+        self.magpie_handler.get_user_name_from_user_id.side_effect = RuntimeError("unknown user")
+
+        with pytest.raises(RuntimeError):
+            self.filesystem.resync()
+        # every file was processed even if errors occurred
+        assert self.filesystem.resync_report["files"] == 5
+        assert self.filesystem.resync_report["errors"] == 5
+
+    def test_resync_incremental(self):
+        os.mkdir(os.path.join(self.workspace_dir, "user1"))
+        src_paths = []
+        for job in range(3):
+            src_path = os.path.join(self.wps_outputs_dir, f"weaver/users/1/{job}/output.txt")
+            os.makedirs(os.path.dirname(src_path))
+            Path(src_path).touch()
+            src_paths.append(src_path)
+        hardlinks = [self.filesystem.get_user_hardlink(src_path=src_path, bird_name="weaver", user_name="user1",
+                                                       subpath=f"{job}/output.txt")
+                     for job, src_path in enumerate(src_paths)]
+        self.filesystem.resync()
+        valid_inode = os.stat(hardlinks[0]).st_ino
+
+        # invalid hardlink, extraneous file and extraneous directory
+        os.remove(hardlinks[1])
+        Path(hardlinks[1]).touch()
+        os.remove(hardlinks[2])
+        extraneous_file = os.path.join(os.path.dirname(hardlinks[0]), "old_output.txt")
+        Path(extraneous_file).touch()
+        extraneous_dir = os.path.join(self.filesystem.get_public_workspace_wps_outputs_dir(), "old_dir")
+        os.makedirs(extraneous_dir)
+
+        self.filesystem.resync(dry_run=True)
+        assert self.filesystem.resync_report["diff"] == {"created": 1, "replaced": 1, "removed": 2, "chmod": 0}
+        assert not os.path.exists(hardlinks[2])
+        assert os.path.exists(extraneous_file)
+        assert os.path.exists(extraneous_dir)
+
+        self.filesystem.resync()
+        assert self.filesystem.resync_report["diff"] == {"created": 1, "replaced": 1, "removed": 2, "chmod": 0}
+        assert os.stat(hardlinks[0]).st_ino == valid_inode
+        for src_path, hardlink in zip(src_paths, hardlinks):
+            assert os.path.samefile(src_path, hardlink)
+        assert not os.path.exists(extraneous_file)
+        assert not os.path.exists(extraneous_dir)
+
+        self.filesystem.resync()
+        assert sum(self.filesystem.resync_report["diff"].values()) == 0
+
+
+class TestFileSystemHardlinkIndex(BaseTestFileSystem):
+    """
+    Tests the index of the WPS outputs hardlinks, using a mocked Magpie handler and an in-memory database.
+    """
+    def setUp(self):
+        super().setUp()
+        self.filesystem = FileSystem({}, "FileSystem", workspace_dir=self.workspace_dir,
+                                     jupyterhub_user_data_dir=self.jupyterhub_user_data_dir,
+                                     wps_outputs_dir=self.wps_outputs_dir, hardlink_index=True)
+        self.filesystem._hardlink_store = HardlinkIndexStore(
+            collection=MagicMock(spec=Collection, wraps=mongomock.MongoClient().db.hardlinks))
+        self.filesystem._hardlink_status_store = HardlinkIndexStatusStore(
+            collection=MagicMock(spec=Collection, wraps=mongomock.MongoClient().db.hardlinks_status))
+        service = {"resource_id": 1, "resource_name": self.secure_data_proxy_name, "children": {
+            "2": {"resource_id": 2, "resource_name": "wps_outputs", "children": {
+                "3": {"resource_id": 3, "resource_name": "weaver", "children": {}}}}}}
+        self.magpie_handler = MagicMock()
+        self.magpie_handler.get_user_list.return_value = ["user1", "user2"]
+        self.magpie_handler.get_user_name_from_user_id.side_effect = lambda user_id: f"user{user_id}"
+        self.magpie_handler.get_user_id_from_user_name.side_effect = lambda user_name: int(user_name[-1])
+        self.magpie_handler.get_services_by_type.return_value = {self.secure_data_proxy_name: {}}
+        self.magpie_handler.get_service_info.return_value = {"resource_id": 1, "service_type": ServiceAPI.service_type}
+        self.magpie_handler.get_resource.return_value = service
+        self.magpie_handler.get_parents_resource_tree.return_value = [
+            service, service["children"]["2"], service["children"]["2"]["children"]["3"]]
+        self.allowed = True
+        self.magpie_handler.get_user_permissions_by_res_id.side_effect = lambda user, res_id, effective: {
+            "permissions": [{"name": Permission.READ.value,
+                             "access": Access.ALLOW.value if self.allowed else Access.DENY.value},
+                            {"name": Permission.WRITE.value, "access": Access.DENY.value}]}
+        self.factory_patcher = patch("cowbird.handlers.impl.filesystem.HandlerFactory")
+        self.factory_patcher.start().return_value.get_handler.return_value = self.magpie_handler
+
+        self.src_paths = {}
+        for user_id in [1, 2]:
+            os.mkdir(os.path.join(self.workspace_dir, f"user{user_id}"))
+            for job in range(3):
+                src_path = os.path.join(self.wps_outputs_dir, f"weaver/users/{user_id}/{job}/output.txt")
+                os.makedirs(os.path.dirname(src_path))
+                Path(src_path).touch()
+                self.src_paths[src_path] = self.filesystem.get_user_hardlink(
+                    src_path=src_path, bird_name="weaver", user_name=f"user{user_id}", subpath=f"{job}/output.txt")
+
+    def tearDown(self):
+        self.factory_patcher.stop()
+        super().tearDown()
+
+    def test_index_resync(self):
+        public_path = os.path.join(self.wps_outputs_dir, "weaver/public_output.txt")
+        Path(public_path).touch()
+        self.filesystem.hardlink_store.save_hardlink(os.path.join(self.wps_outputs_dir, "old_output.txt"), 1, [])
+
+        self.filesystem.resync()
+
+        store = self.filesystem.hardlink_store
+        entries = {entry["src_path"]: entry for entry in store.list_hardlinks(self.wps_outputs_dir)}
+        assert set(entries) == set(self.src_paths) | {public_path}
+        for src_path, hardlink_path in self.src_paths.items():
+            assert entries[src_path]["links"] == [hardlink_path]
+            assert entries[src_path]["inode"] == os.stat(src_path).st_ino
+        assert entries[public_path]["links"] == [self.filesystem._get_public_hardlink(public_path)]
+        assert entries[public_path]["user_id"] is None
+
+    def test_index_on_deleted(self):
+        self.filesystem.resync()
+        self.magpie_handler.get_user_name_from_user_id.reset_mock()
+        src_path, hardlink_path = next(iter(self.src_paths.items()))
+
+        os.remove(src_path)
+        self.filesystem.on_deleted(src_path)
+
+        assert not os.path.exists(hardlink_path)
+        assert self.filesystem.hardlink_store.get_hardlink(src_path) is None
+        # the hardlink is found from the index without resolving the user name
+        self.magpie_handler.get_user_name_from_user_id.assert_not_called()
+
+    def test_index_permission_update(self):
+        self.filesystem.resync()
+        self.allowed = False
+        permission = CowbirdPermission(service_name=self.secure_data_proxy_name,
+                                       service_type=ServiceAPI.service_type, resource_id=3,
+                                       resource_full_name=f"/{self.secure_data_proxy_name}/wps_outputs/weaver",
+                                       name=Permission.READ.value, access=Access.DENY.value,
+                                       scope=Scope.RECURSIVE.value, user="user1")
+
+        with patch("cowbird.handlers.impl.filesystem.os.walk") as mock_walk:
+            self.filesystem.permission_created(permission)
+        mock_walk.assert_not_called()
+
+        for src_path, hardlink_path in self.src_paths.items():
+            expected_links = [] if "/users/1/" in src_path else [hardlink_path]
+            assert os.path.exists(hardlink_path) == bool(expected_links)
+            assert self.filesystem.hardlink_store.get_hardlink(src_path)["links"] == expected_links
+
+    def test_index_permission_update_incomplete(self):
+        permission = CowbirdPermission(service_name=self.secure_data_proxy_name,
+                                       service_type=ServiceAPI.service_type, resource_id=3,
+                                       resource_full_name=f"/{self.secure_data_proxy_name}/wps_outputs/weaver",
+                                       name=Permission.READ.value, access=Access.ALLOW.value,
+                                       scope=Scope.RECURSIVE.value, user="user1")
+        user_src_paths = {src_path: hardlink_path for src_path, hardlink_path in self.src_paths.items()
+                          if "/users/1/" in src_path}
+
+        # files created before the index was enabled are found by browsing the directory, and are then indexed
+        self.filesystem.permission_created(permission)
+        for src_path, hardlink_path in user_src_paths.items():
+            assert os.path.exists(hardlink_path)
+            assert self.filesystem.hardlink_store.get_hardlink(src_path)["links"] == [hardlink_path]
+        assert not self.filesystem.hardlink_status_store.is_complete(self.wps_outputs_dir)
+
+        self.filesystem.resync()
+        assert self.filesystem.hardlink_status_store.is_complete(self.wps_outputs_dir)
+
+        # a file that failed to be indexed makes the index incomplete until the next resync
+        src_path = os.path.join(self.wps_outputs_dir, "weaver/users/1/3/output.txt")
+        os.makedirs(os.path.dirname(src_path))
+        Path(src_path).touch()
+        with patch.object(self.filesystem.hardlink_store, "save_hardlink", side_effect=RuntimeError("database error")):
+            with pytest.raises(RuntimeError):
+                self.filesystem.on_created(src_path)
+        assert not self.filesystem.hardlink_status_store.is_complete(self.wps_outputs_dir)
+        hardlink_path = self.filesystem.get_user_hardlink(src_path=src_path, bird_name="weaver", user_name="user1",
+                                                          subpath="3/output.txt")
+        os.remove(hardlink_path)
+        self.filesystem.permission_created(permission)
+        assert os.path.exists(hardlink_path)
@@ -10,7 +10,8 @@ import logging
 import os
 import shutil
 from pathlib import Path
-from typing import List, Tuple, cast
+from time import sleep
+from typing import Dict, List, Tuple, cast
 
 import mock
 import pytest
@@ -23,8 +24,16 @@ from magpie.services import ServiceGeoserver
 
 from cowbird.constants import COWBIRD_ROOT, DEFAULT_ADMIN_GID, DEFAULT_ADMIN_UID
 from cowbird.handlers import HandlerFactory
-from cowbird.handlers.impl.geoserver import SHAPEFILE_MAIN_EXTENSION, Geoserver, GeoserverError
+from cowbird.handlers.impl.geoserver import (
+    DEFAULT_MONITOR_DEBOUNCE,
+    SHAPEFILE_MAIN_EXTENSION,
+    SHAPEFILE_REQUIRED_EXTENSIONS,
+    Geoserver,
+    GeoserverError,
+    ShapefileReadinessTracker
+)
 from cowbird.handlers.impl.magpie import GEOSERVER_READ_PERMISSIONS, GEOSERVER_WRITE_PERMISSIONS, MagpieHttpError
+from cowbird.monitoring.fsmonitor import FSEvent, FSEventType
 from cowbird.permissions_synchronizer import Permission
 from cowbird.typedefs import JSON
 from tests import test_magpie, utils
@@ -751,3 +760,325 @@ class TestGeoserverPermissions(TestGeoserver):
         # Permission events on groups are not supported by the Geoserver handler.
         with pytest.raises(NotImplementedError):
             self.geoserver.permission_created(layer_read_permission)
+
+
+@pytest.mark.geoserver
+class TestGeoserverEvents:
+    """
+    Tests the grouping of a batch of file system events, without requiring a Geoserver instance.
+    """
+    def test_monitor_debounce(self):
+        # the events of the shapefiles are collected during a short window by default, to publish them together
+        geoserver = Geoserver(settings={}, name="Geoserver", **TestGeoserver.geoserver_settings)
+        assert geoserver.monitor_debounce == DEFAULT_MONITOR_DEBOUNCE > 0
+        settings = dict(TestGeoserver.geoserver_settings, monitor_debounce=0)
+        geoserver = Geoserver(settings={}, name="Geoserver", **settings)
+        assert geoserver.monitor_debounce == 0
+
+    def test_on_events_grouping(self):
+        geoserver = TestGeoserver.get_geoserver()
+        datastore_path = get_datastore_path(f"{geoserver.workspace_dir}/user1")
+        shapefile_path = f"{datastore_path}/{TestGeoserver.test_shapefile_name}{SHAPEFILE_MAIN_EXTENSION}"
+        other_datastore_path = get_datastore_path(f"{geoserver.workspace_dir}/user2")
+        events = [
+            FSEvent(shapefile_path, FSEventType.CREATED),
+            FSEvent(f"{datastore_path}/{TestGeoserver.test_shapefile_name}.shx", FSEventType.CREATED),
+            FSEvent(datastore_path, FSEventType.MODIFIED),
+            FSEvent(other_datastore_path, FSEventType.MODIFIED),
+            FSEvent(shapefile_path, FSEventType.MODIFIED),
+            FSEvent(datastore_path, FSEventType.MODIFIED),
+            FSEvent(other_datastore_path, FSEventType.MODIFIED),
+            FSEvent(shapefile_path, FSEventType.DELETED),
+        ]
+        with mock.patch.object(geoserver, "on_created") as on_created, \
+                mock.patch.object(geoserver, "on_modified") as on_modified, \
+                mock.patch.object(geoserver, "on_deleted") as on_deleted:
+            geoserver.on_events(events)
+
+        on_created.assert_called_once_with(shapefile_path)
+        assert on_modified.call_args_list == [mock.call(datastore_path), mock.call(other_datastore_path)]
+        on_deleted.assert_called_once_with(shapefile_path)
+
+    def test_on_events_created_shapefiles(self):
+        geoserver = TestGeoserver.get_geoserver()
+        datastore_path = get_datastore_path(f"{geoserver.workspace_dir}/user1")
+        other_datastore_path = get_datastore_path(f"{geoserver.workspace_dir}/user2")
+        events = [
+            FSEvent(f"{datastore_path}/layer1{SHAPEFILE_MAIN_EXTENSION}", FSEventType.DELETED),
+            FSEvent(f"{datastore_path}/layer1{SHAPEFILE_MAIN_EXTENSION}", FSEventType.CREATED),
+            FSEvent(f"{datastore_path}/layer2{SHAPEFILE_MAIN_EXTENSION}", FSEventType.CREATED),
+            FSEvent(f"{datastore_path}/layer2.shx", FSEventType.CREATED),
+            FSEvent(f"{other_datastore_path}/layer3{SHAPEFILE_MAIN_EXTENSION}", FSEventType.CREATED),
+            FSEvent(f"{datastore_path}/layer2{SHAPEFILE_MAIN_EXTENSION}", FSEventType.MODIFIED),
+        ]
+        with mock.patch.object(geoserver, "on_created") as on_created, \
+                mock.patch.object(geoserver, "on_deleted") as on_deleted, \
+                mock.patch.object(geoserver, "on_shapefiles_created") as on_shapefiles_created, \
+                mock.patch.object(geoserver.shapefile_tracker, "update") as update_shapefiles:
+            geoserver.on_events(events)
+
+        # the created shapefiles are handled together per workspace, after the deletion of a replaced layer
+        on_created.assert_not_called()
+        on_deleted.assert_called_once_with(f"{datastore_path}/layer1{SHAPEFILE_MAIN_EXTENSION}")
+        assert on_shapefiles_created.call_args_list == [mock.call("user1", ["layer1", "layer2"]),
+                                                        mock.call("user2", ["layer3"])]
+        # the files of the batch complete the shapefiles waiting for them
+        assert f"{datastore_path}/layer2.shx" in list(update_shapefiles.call_args.args[0])
+
+    def test_on_shapefiles_created(self):
+        geoserver = TestGeoserver.get_geoserver()
+        magpie = mock.Mock()
+        magpie.get_geoserver_layer_res_ids.return_value = {"layer1": 10, "layer2": 11}
+        with mock.patch("cowbird.handlers.impl.geoserver.HandlerFactory") as handler_factory, \
+                mock.patch.object(geoserver.shapefile_tracker, "add") as add_shapefiles, \
+                mock.patch.object(geoserver, "_update_magpie_layer_permissions") as update_permissions:
+            handler_factory.return_value.get_handler.return_value = magpie
+            geoserver.on_shapefiles_created("user1", ["layer1", "layer2"])
+
+        # the shapefiles are published once complete
+        add_shapefiles.assert_called_once_with("user1", ["layer1", "layer2"])
+        magpie.get_geoserver_layer_res_ids.assert_called_once_with("user1", ["layer1", "layer2"],
+                                                                   create_if_missing=True)
+        magpie.get_geoserver_layer_res_id.assert_not_called()
+        assert update_permissions.call_args_list == [mock.call("user1", "layer1", layer_res_id=10),
+                                                     mock.call("user1", "layer2", layer_res_id=11)]
+
+
+class TestShapefileReadinessTracker:
+    """
+    Tests the tracking of the required files of new shapefiles, without requiring a Geoserver instance.
+    """
+    @staticmethod
+    def get_tracker(tmp_path, timeout=60):
+        geoserver = Geoserver(settings={}, name="Geoserver",
+                              **dict(TestGeoserver.geoserver_settings, workspace_dir=str(tmp_path)))
+        on_ready = mock.Mock()
+        tracker = ShapefileReadinessTracker(on_ready=on_ready, get_missing_files=geoserver._get_missing_shapefile_files,
+                                            timeout=timeout)
+        datastore_path = get_datastore_path(str(tmp_path / "user1"))
+        os.makedirs(datastore_path)
+        return tracker, on_ready, datastore_path
+
+    def test_ready_on_events(self, tmp_path):
+        tracker, on_ready, datastore_path = self.get_tracker(tmp_path)
+        for ext in SHAPEFILE_REQUIRED_EXTENSIONS:
+            Path(f"{datastore_path}/complete{ext}").touch()
+        Path(f"{datastore_path}/layer1{SHAPEFILE_MAIN_EXTENSION}").touch()
+        Path(f"{datastore_path}/layer2{SHAPEFILE_MAIN_EXTENSION}").touch()
+
+        # complete shapefiles are sent immediately, without waiting any event
+        tracker.add("user1", ["complete", "layer1", "layer2"])
+        on_ready.assert_called_once_with("user1", ["complete"])
+        on_ready.reset_mock()
+
+        other_paths = [f"{datastore_path}/layer1{ext}" for ext in SHAPEFILE_REQUIRED_EXTENSIONS[1:]]
+        for path in other_paths:
+            Path(path).touch()
+        tracker.update(other_paths[:-1] + [f"{datastore_path}/layer1.cpg"])
+        on_ready.assert_not_called()
+        # the event of a file that does not exist yet is ignored
+        tracker.update([f"{datastore_path}/layer2.shx"])
+        tracker.update(other_paths[-1:])
+        on_ready.assert_called_once_with("user1", ["layer1"])
+        assert tracker.stats() == {"pending": 1, "ready": 2, "expired": 0}
+
+        tracker.remove("user1", "layer2")
+        assert tracker.stats()["pending"] == 0
+
+    def test_expired(self, tmp_path):
+        tracker, on_ready, datastore_path = self.get_tracker(tmp_path, timeout=0.1)
+        Path(f"{datastore_path}/layer1{SHAPEFILE_MAIN_EXTENSION}").touch()
+        tracker.add("user1", ["layer1"])
+        assert tracker.stats()["pending"] == 1
+        sleep(1)
+        assert tracker.stats() == {"pending": 0, "ready": 0, "expired": 1}
+
+        # an expired shapefile is no longer published by the events of its files
+        for ext in SHAPEFILE_REQUIRED_EXTENSIONS[1:]:
+            Path(f"{datastore_path}/layer1{ext}").touch()
+        tracker.update([f"{datastore_path}/layer1{ext}" for ext in SHAPEFILE_REQUIRED_EXTENSIONS[1:]])
+        on_ready.assert_not_called()
+
+
+@pytest.mark.geoserver
+class TestGeoserverSession:
+    """
+    Tests the pooled session of the Geoserver requests, using a local server emulating the Geoserver REST API.
+    """
+    def test_pooled_session_and_latency(self):
+        routes = {
+            ("POST", "/geoserver/rest/workspaces/"): lambda query, body: (201, {}),
+            ("DELETE", "/geoserver/rest/workspaces/test"): lambda query, body: (200, {}),
+        }
+        with utils.StubHTTPServer(routes) as server:
+            settings = dict(TestGeoserver.geoserver_settings, url=f"{server.url}/geoserver")
+            geoserver = Geoserver(settings={}, name="Geoserver", **settings)
+            with mock.patch("cowbird.handlers.impl.geoserver.LOGGER") as logger:
+                for _ in range(3):
+                    geoserver._create_workspace_request(workspace_name="test")
+                geoserver._remove_workspace_request(workspace_name="test")
+            # all requests of the handler reuse a single connection
+            assert server.connections == 1
+        latency = geoserver.json()["latency"]
+        assert list(latency) == ["_create_workspace_request", "_remove_workspace_request"]
+        assert latency["_create_workspace_request"]["count"] == 3
+        assert latency["_create_workspace_request"]["buckets"]["+Inf"] == 3
+        assert latency["_remove_workspace_request"]["count"] == 1
+        # the latency of each request is also logged, to be collected from the Celery workers
+        latency_logs = [call.args for call in logger.info.call_args_list
+                        if call.args[0].startswith("Geoserver request latency")]
+        assert [args[1:3] for args in latency_logs] == [("_create_workspace_request", 201)] * 3 + [
+            ("_remove_workspace_request", 200)]
+
+    def test_publish_shapefiles(self, tmp_path):
+        datastore_name = Geoserver._get_datastore_name("user1")
+        featuretypes_path = f"/geoserver/rest/workspaces/user1/datastores/{datastore_name}/featuretypes"
+        routes = {
+            ("GET", f"{featuretypes_path}.json"): lambda query, body: (200, {"featureTypes": {"featureType": [
+                {"name": "published", "href": "published.json"}]}}),
+            ("POST", featuretypes_path): lambda query, body: (201, {}),
+        }
+        datastore_path = get_datastore_path(str(tmp_path / "user1"))
+        os.makedirs(datastore_path)
+        for shapefile_name in ["published", "new1", "new2", "incomplete"]:
+            extensions = [SHAPEFILE_MAIN_EXTENSION] if shapefile_name == "incomplete" else SHAPEFILE_REQUIRED_EXTENSIONS
+            for ext in extensions:
+                Path(f"{datastore_path}/{shapefile_name}{ext}").touch()
+        with utils.StubHTTPServer(routes) as server:
+            settings = dict(TestGeoserver.geoserver_settings, url=f"{server.url}/geoserver", workspace_dir=str(tmp_path))
+            geoserver = Geoserver(settings={}, name="Geoserver", **settings)
+            incomplete = geoserver.publish_shapefiles("user1", ["published", "new1", "incomplete", "new2"])
+            assert incomplete == ["incomplete"]
+            # the published layers are listed once, and only the new ones are published
+            assert server.requests == [("GET", f"{featuretypes_path}.json"),
+                                       ("POST", featuretypes_path),
+                                       ("POST", featuretypes_path)]
+
+            routes[("GET", f"{featuretypes_path}.json")] = lambda query, body: (200, {"featureTypes": ""})
+            server.requests.clear()
+            assert not geoserver.publish_shapefiles("user1", ["new1"])
+            assert server.requests == [("GET", f"{featuretypes_path}.json"), ("POST", featuretypes_path)]
+
+            # a layer rejected by Geoserver does not prevent publishing the other ones, but fails once they are handled
+            def publish_layer(_, body):
+                return (500, {}) if body["featureType"]["name"] == "rejected" else (201, {})
+            routes[("POST", featuretypes_path)] = publish_layer
+            for ext in SHAPEFILE_REQUIRED_EXTENSIONS:
+                Path(f"{datastore_path}/rejected{ext}").touch()
+            server.requests.clear()
+            with pytest.raises(GeoserverError, match="rejected"):
+                geoserver.publish_shapefiles("user1", ["rejected", "new1"])
+            assert server.requests == [("GET", f"{featuretypes_path}.json"),
+                                       ("POST", featuretypes_path),
+                                       ("POST", featuretypes_path)]
+
+            # the rejected layer is published again with the incomplete shapefiles
+            assert geoserver.publish_shapefiles("user1", ["rejected", "incomplete"]) == ["incomplete", "rejected"]
+
+
+class TestGeoserverPermissionUpdates:
+    """
+    Tests the update of the Magpie permissions of the Geoserver resources, using a local server emulating Magpie.
+    """
+    res_id = 3
+    perm_names = GEOSERVER_READ_PERMISSIONS + GEOSERVER_WRITE_PERMISSIONS
+
+    def get_routes(self, resource_perms: Dict[str, JSON], inherited_access: Dict[str, str]) -> Dict:
+        """
+        Routes of the permissions of a user on a resource, resolving the permissions set on the resource before the
+        ones inherited from its parents.
+        """
+        path = f"/users/user/resources/{self.res_id}/permissions"
+
+        def get_permissions(query, _):
+            if query.get("effective") == ["True"]:
+                return 200, {"permissions": [
+                    {"name": name, "scope": Scope.MATCH.value,
+                     "access": resource_perms[name]["access"] if name in resource_perms
+                     else inherited_access.get(name, Access.DENY.value)}
+                    for name in self.perm_names]}
+            return 200, {"permissions": list(resource_perms.values())}
+
+        def create_permission(_, body):
+            assert body["permission"]["name"] not in resource_perms
+            resource_perms[body["permission"]["name"]] = body["permission"]
+            return 201, {}
+
+        def update_permission(_, body):
+            assert body["permission"]["name"] in resource_perms
+            resource_perms[body["permission"]["name"]] = body["permission"]
+            return 200, {}
+
+        routes = test_magpie.get_magpie_stub_routes()
+        routes[("GET", path)] = get_permissions
+        routes[("POST", path)] = create_permission
+        routes[("PUT", path)] = update_permission
+        return routes
+
+    def update_permissions(self, routes: Dict, perm_scope: str, is_readable: bool, is_writable: bool
+                           ) -> List[Tuple[str, str]]:
+        with utils.StubHTTPServer(routes) as server:
+            magpie = test_magpie.get_stub_magpie(server)
+            with mock.patch("cowbird.handlers.impl.geoserver.HandlerFactory") as handler_factory:
+                handler_factory.return_value.get_handler.return_value = magpie
+                Geoserver._update_magpie_permissions("user", self.res_id, perm_scope, is_readable, is_writable)
+            return [req for req in server.requests if req[1] != "/signin"]
+
+    @staticmethod
+    def get_perms(perm_names: List[str], access: str, scope: str) -> Dict[str, JSON]:
+        return {name: {"name": name, "access": access, "scope": scope} for name in perm_names}
+
+    def test_permissions_in_sync(self):
+        path = f"/users/user/resources/{self.res_id}/permissions"
+        resource_perms = self.get_perms(self.perm_names, Access.ALLOW.value, Scope.MATCH.value)
+        requests = self.update_permissions(self.get_routes(resource_perms, {}), Scope.MATCH.value, True, True)
+        # the resolved permissions are enough to find that no update is required
+        assert requests == [("GET", path)]
+
+        # a `recursive` permission also requires the scope of the permissions set on the resource
+        resource_perms = self.get_perms(self.perm_names, Access.ALLOW.value, Scope.RECURSIVE.value)
+        requests = self.update_permissions(self.get_routes(resource_perms, {}), Scope.RECURSIVE.value, True, True)
+        assert requests == [("GET", path), ("GET", path)]
+
+        # permissions inherited from the parent resources do not require any permission on the resource
+        inherited_access = {name: Access.ALLOW.value for name in GEOSERVER_READ_PERMISSIONS}
+        requests = self.update_permissions(self.get_routes({}, inherited_access), Scope.MATCH.value, True, False)
+        assert requests == [("GET", path)]
+
+    def test_permissions_update(self):
+        path = f"/users/user/resources/{self.res_id}/permissions"
+        read_perm_name = GEOSERVER_READ_PERMISSIONS[0]
+        write_perm_name, other_write_perm_name = GEOSERVER_WRITE_PERMISSIONS[:2]
+        resource_perms = self.get_perms(self.perm_names, Access.ALLOW.value, Scope.RECURSIVE.value)
+        resource_perms[read_perm_name]["scope"] = Scope.MATCH.value
+        resource_perms[write_perm_name]["access"] = Access.DENY.value
+        resource_perms.pop(other_write_perm_name)
+        requests = self.update_permissions(self.get_routes(resource_perms, {}), Scope.RECURSIVE.value, True, True)
+
+        # the permissions are read once, the permissions set on the resource are updated in place, and the missing
+        # one is created, without reading the resolved permissions again
+        methods = {read_perm_name: "PUT", write_perm_name: "PUT", other_write_perm_name: "POST"}
+        assert requests == [("GET", path), ("GET", path), *[(methods[name], path) for name in sorted(methods)]]
+        assert resource_perms == self.get_perms(self.perm_names, Access.ALLOW.value, Scope.RECURSIVE.value)
+
+        # the permission inherited from the parent resources is not duplicated on the resource
+        resource_perms.pop(write_perm_name)
+        inherited_access = {write_perm_name: Access.ALLOW.value}
+        requests = self.update_permissions(self.get_routes(resource_perms, inherited_access),
+                                           Scope.RECURSIVE.value, True, True)
+        assert requests == [("GET", path), ("GET", path)]
+        assert write_perm_name not in resource_perms
+
+    def test_layer_permissions_under_recursive_workspace_permission(self):
+        path = f"/users/user/resources/{self.res_id}/permissions"
+        read_perm_name = GEOSERVER_READ_PERMISSIONS[0]
+        resource_perms = self.get_perms([read_perm_name], Access.DENY.value, Scope.MATCH.value)
+        # the workspace gives the read permissions to its layers with a `recursive` permission
+        inherited_access = {name: Access.ALLOW.value for name in GEOSERVER_READ_PERMISSIONS}
+        requests = self.update_permissions(self.get_routes(resource_perms, inherited_access),
+                                           Scope.MATCH.value, True, False)
+
+        # the denied permission set on the layer is updated in place, and kept even if the workspace resolves the same
+        # access, while the other inherited permissions are not duplicated on the layer
+        assert requests == [("GET", path), ("GET", path), ("PUT", path)]
+        assert resource_perms == self.get_perms([read_perm_name], Access.ALLOW.value, Scope.MATCH.value)
@@ -1,8 +1,10 @@
 # pylint: disable=protected-access
 import os
+import time
 from pathlib import Path
 from typing import Dict
 
+import mock
 import pytest
 import yaml
 from dotenv import load_dotenv
@@ -11,8 +13,12 @@ from magpie.permissions import Access, Permission, Scope
 from magpie.services import ServiceGeoserver
 
 from cowbird.handlers import HandlerFactory
-from cowbird.handlers.impl.magpie import Magpie
+from cowbird.handlers.impl.magpie import Magpie, MagpieHttpError
+from cowbird.utils import get_logger
 from tests import utils
+from tests.utils import StubHTTPServer
+
+LOGGER = get_logger(__name__)
 
 CURR_DIR = Path(__file__).resolve().parent
 
@@ -212,3 +218,272 @@ class TestMagpie:
                                                        user_name=self.usr)
         # Existing permission updated successfully
         assert resp.status_code == 200
+
+
+def get_magpie_stub_routes() -> Dict:
+    """
+    Routes of a minimal Magpie stub, returning a geoserver service with a single workspace and layer.
+    """
+    layer = {"resource_id": 3, "resource_name": "layer", "resource_type": "layer", "children": {}}
+    workspace = {"resource_id": 2, "resource_name": "workspace", "resource_type": "workspace",
+                 "children": {"3": layer}}
+    service = {"resource_id": 1, "service_name": "geoserver", "resource_type": "service",
+               "children": {"2": workspace}}
+    return {
+        ("POST", "/signin"): lambda query, body: (200, {}),
+        ("GET", "/services/types/geoserver"): lambda query, body: (200, {"services": {"geoserver": {
+            "geoserver": service}}}),
+        ("GET", "/resources/1"): lambda query, body: (200, {"resource": service}),
+        ("GET", "/resources/3"): lambda query, body: (200, {"resources": [service, workspace, layer]}),
+        ("GET", "/users/user/resources/3/permissions"): lambda query, body: (200, {"permissions": []}),
+    }
+
+
+def get_stub_magpie(server: StubHTTPServer, **kwargs) -> Magpie:
+    """
+    Creates a Magpie handler sending its requests to a local Magpie stub.
+    """
+    utils.clear_handlers_instances()
+    with mock.patch("cowbird.handlers.impl.magpie.PermissionSynchronizer"):
+        return Magpie({}, "Magpie", url=server.url, admin_user="admin", admin_password="qwertyqwerty", **kwargs)
+
+
+class TestMagpieUserIndex:
+    """
+    Tests the user id/name index of the Magpie handler against a local Magpie stub.
+    """
+    users = [{"user_id": 1, "user_name": "admin"}, {"user_id": 2, "user_name": "user1"}]
+
+    def get_routes(self) -> Dict:
+        return {
+            ("POST", "/signin"): lambda query, body: (200, {}),
+            ("GET", "/users"): lambda query, body: (200, {"users": self.users} if query.get("detail") == ["True"]
+                                                    else {"user_names": [u["user_name"] for u in self.users]}),
+            ("GET", "/users/user1"): lambda query, body: (200, {"user": self.users[1]}),
+        }
+
+    def test_user_lookups_use_single_bulk_fetch(self):
+        with StubHTTPServer(self.get_routes()) as server:
+            magpie = get_stub_magpie(server)
+            for _ in range(100):
+                assert magpie.get_user_name_from_user_id(1) == "admin"
+                assert magpie.get_user_name_from_user_id(2) == "user1"
+                assert magpie.get_user_id_from_user_name("user1") == 2
+            assert server.requests.count(("GET", "/users")) == 1
+            assert ("GET", "/users/user1") not in server.requests
+
+            # an unknown id refreshes the index once, but not for every following lookup of the same id
+            for _ in range(10):
+                with pytest.raises(MagpieHttpError):
+                    magpie.get_user_name_from_user_id(3)
+            assert server.requests.count(("GET", "/users")) == 2
+
+            # a newly created user is found again after the corresponding webhook
+            self.users.append({"user_id": 3, "user_name": "user2"})
+            magpie.user_created("user2")
+            assert magpie.get_user_name_from_user_id(3) == "user2"
+            assert server.requests.count(("GET", "/users")) == 3
+            self.users.pop()
+
+    def test_user_deleted_invalidates_index(self):
+        with StubHTTPServer(self.get_routes()) as server:
+            magpie = get_stub_magpie(server)
+            assert magpie.get_user_name_from_user_id(2) == "user1"
+            assert magpie.get_user_id_from_user_name("user1") == 2
+            magpie.user_deleted("user1")
+            assert magpie.get_user_id_from_user_name("user1") == 2
+            assert server.requests.count(("GET", "/users/user1")) == 1
+
+    def test_user_list(self):
+        with StubHTTPServer(self.get_routes()) as server:
+            magpie = get_stub_magpie(server)
+            assert magpie.get_user_list() == ["admin", "user1"]
+            # the user list does not fill the index, which is only refreshed by the lookups of unknown users
+            assert magpie.get_user_name_from_user_id(2) == "user1"
+            assert server.requests.count(("GET", "/users")) == 2
+
+    def test_user_index_disabled(self):
+        with StubHTTPServer(self.get_routes()) as server:
+            magpie = get_stub_magpie(server, user_cache_ttl=0)
+            for _ in range(3):
+                assert magpie.get_user_name_from_user_id(2) == "user1"
+            assert server.requests.count(("GET", "/users")) == 3
+
+
+class TestMagpieResourceCache:
+    """
+    Tests the services and resources cache of the Magpie handler against a local Magpie stub.
+    """
+
+    @staticmethod
+    def get_routes() -> Dict:
+        routes = get_magpie_stub_routes()
+        routes[("POST", "/resources")] = lambda query, body: (201, {"resource": {"resource_id": 4}})
+        routes[("DELETE", "/resources/3")] = lambda query, body: (200, {})
+        routes[("DELETE", "/services/geoserver")] = lambda query, body: (200, {})
+        return routes
+
+    def test_cached_resources(self):
+        with StubHTTPServer(self.get_routes()) as server:
+            magpie = get_stub_magpie(server)
+            for _ in range(5):
+                assert magpie.get_geoserver_workspace_res_id("workspace") == 2
+                assert magpie.get_geoserver_layer_res_id("workspace", "layer") == 3
+                assert [res["resource_id"] for res in magpie.get_parents_resource_tree(3)] == [1, 2, 3]
+            assert server.requests.count(("GET", "/services/types/geoserver")) == 1
+            assert server.requests.count(("GET", "/resources/1")) == 1
+            assert server.requests.count(("GET", "/resources/3")) == 1
+            stats = magpie.json()["cache"]["resources"]
+            assert stats["misses"] == 3
+            # workspaces and layers are then found from the geoserver resources index, without any cache lookup
+            assert stats["hits"] == 4
+            assert magpie.json()["cache"]["geoserver_index"] == {"fills": 1, "workspaces": 1, "layers": 1}
+
+    def test_bulk_layer_resources(self):
+        with StubHTTPServer(self.get_routes()) as server:
+            magpie = get_stub_magpie(server)
+            layer_res_ids = magpie.get_geoserver_layer_res_ids("workspace", ["layer", "layer2", "layer3"])
+            assert layer_res_ids == {"layer": 3}
+            assert server.requests.count(("GET", "/resources/1")) == 1
+
+            # the services are searched once, and only the missing layers are created
+            layer_res_ids = magpie.get_geoserver_layer_res_ids("workspace", ["layer", "layer2", "layer3"],
+                                                               create_if_missing=True)
+            assert layer_res_ids == {"layer": 3, "layer2": 4, "layer3": 4}
+            assert server.requests.count(("GET", "/resources/1")) == 1
+            assert server.requests.count(("POST", "/resources")) == 2
+
+    def test_geoserver_resource_index(self):
+        with StubHTTPServer(self.get_routes()) as server:
+            magpie = get_stub_magpie(server)
+            assert magpie.get_geoserver_workspace_res_id("workspace") == 2
+
+            # created and deleted resources update the index, without searching the services again
+            assert magpie.get_geoserver_layer_res_id("workspace", "layer2", create_if_missing=True) == 4
+            assert magpie.get_geoserver_layer_res_id("workspace", "layer2") == 4
+            magpie.delete_resource(3)
+            assert magpie.get_geoserver_layer_res_id("workspace", "layer") is None
+            assert magpie.get_geoserver_workspace_res_id("workspace") == 2
+            assert server.requests.count(("GET", "/services/types/geoserver")) == 1
+            assert server.requests.count(("GET", "/resources/1")) == 1
+            assert magpie.json()["cache"]["geoserver_index"] == {"fills": 1, "workspaces": 1, "layers": 1}
+
+            # deleting the workspace also removes its layers
+            magpie.delete_resource(2)
+            assert magpie.json()["cache"]["geoserver_index"] == {"fills": 1, "workspaces": 0, "layers": 0}
+
+            # any modification of services fills the index again
+            magpie._send_request(method="DELETE", url=f"{magpie.url}/services/geoserver")
+            assert magpie.get_geoserver_layer_res_id("workspace", "layer") == 3
+            assert server.requests.count(("GET", "/resources/1")) == 2
+            assert magpie.json()["cache"]["geoserver_index"]["fills"] == 2
+
+    def test_geoserver_resource_index_disabled(self):
+        with StubHTTPServer(self.get_routes()) as server:
+            magpie = get_stub_magpie(server, resource_cache_ttl=0)
+            for _ in range(3):
+                assert magpie.get_geoserver_layer_res_id("workspace", "layer") == 3
+            assert server.requests.count(("GET", "/resources/1")) == 3
+            assert magpie.json()["cache"]["geoserver_index"]["fills"] == 0
+
+    def test_resource_invalidation(self):
+        with StubHTTPServer(self.get_routes()) as server:
+            magpie = get_stub_magpie(server)
+            magpie.get_geoserver_layer_res_id("workspace", "layer")
+            magpie.get_parents_resource_tree(3)
+
+            # creating a resource in the workspace invalidates the workspace and the service listing it as child
+            magpie.create_resource("layer2", "layer", parent_id=2)
+            magpie.get_resource(1)
+            assert server.requests.count(("GET", "/resources/1")) == 2
+            # the parents tree of the other layer refers to the workspace and is also invalidated
+            magpie.get_parents_resource_tree(3)
+            assert server.requests.count(("GET", "/resources/3")) == 2
+
+            # permission on a known resource only invalidates related resources
+            magpie.invalidate_permission_resource(3, "geoserver")
+            magpie.get_services_by_type("geoserver")
+            magpie.get_resource(1)
+            assert server.requests.count(("GET", "/services/types/geoserver")) == 1
+            assert server.requests.count(("GET", "/resources/1")) == 3
+
+            # permission on an unknown resource invalidates its whole service
+            magpie.invalidate_permission_resource(10, "geoserver")
+            magpie.get_resource(1)
+            assert server.requests.count(("GET", "/resources/1")) == 4
+
+            # any modification of services invalidates everything
+            magpie._send_request(method="DELETE", url=f"{magpie.url}/services/geoserver")
+            magpie.get_services_by_type("geoserver")
+            assert server.requests.count(("GET", "/services/types/geoserver")) == 2
+
+            magpie.delete_resource(3)
+            assert 3 not in magpie.resource_parents
+            assert 3 not in magpie.resource_children.get(2, set())
+
+    def test_resources_deleted_by_other_process(self):
+        routes = self.get_routes()
+        created_ids = iter(range(5, 10))
+        routes[("POST", "/resources")] = lambda query, body: (
+            (404, {}) if body["parent_id"] == 2 else (201, {"resource": {"resource_id": next(created_ids)}}))
+        with StubHTTPServer(routes) as server:
+            magpie = get_stub_magpie(server)
+            assert magpie.get_geoserver_workspace_res_id("workspace") == 2
+            magpie.get_parents_resource_tree(3)
+
+            # a failed request on a cached resource removes it from the cache
+            routes[("GET", "/users/user/resources/3/permissions")] = lambda query, body: (404, {})
+            with pytest.raises(MagpieHttpError):
+                magpie.get_user_permissions_by_res_id("user", 3)
+            magpie.get_parents_resource_tree(3)
+            assert server.requests.count(("GET", "/resources/3")) == 2
+            assert magpie.get_geoserver_workspace_res_id("workspace") == 2
+            assert magpie.json()["cache"]["geoserver_index"]["fills"] == 2
+            assert magpie.get_geoserver_workspace_res_id("workspace") == 2
+            assert magpie.json()["cache"]["geoserver_index"]["fills"] == 2
+
+            # the workspace found in the cached index was deleted, it is created again with the current resources
+            service = routes[("GET", "/resources/1")](None, None)[1]["resource"]
+            routes[("GET", "/resources/1")] = lambda query, body: (200, {"resource": dict(service, children={})})
+            assert magpie.get_geoserver_layer_res_id("workspace", "layer2", create_if_missing=True) == 6
+            assert server.requests.count(("POST", "/resources")) == 3
+            assert magpie.get_geoserver_workspace_res_id("workspace") == 5
+
+
+@pytest.mark.benchmark
+class TestMagpieBenchmark:
+    """
+    Micro-benchmarks of the Magpie handler requests against a local Magpie stub.
+    """
+    webhook_count = 20
+
+    @staticmethod
+    def handle_webhook(magpie: Magpie) -> None:
+        """
+        Emulates the requests sent to Magpie while handling a single permission webhook.
+        """
+        magpie.get_geoserver_layer_res_id("workspace", "layer")
+        magpie.get_parents_resource_tree(3)
+        for _ in range(10):
+            magpie.get_user_permissions_by_res_id("user", 3, effective=True)
+
+    def run_webhooks(self, keep_alive: bool):
+        with StubHTTPServer(get_magpie_stub_routes()) as server:
+            magpie = get_stub_magpie(server, keep_alive=keep_alive)
+            start = time.perf_counter()
+            for _ in range(self.webhook_count):
+                self.handle_webhook(magpie)
+            latency = (time.perf_counter() - start) / self.webhook_count
+            return latency, server.connections, len(server.requests)
+
+    def test_pooled_session_latency(self):
+        unpooled_latency, unpooled_connections, unpooled_requests = self.run_webhooks(keep_alive=False)
+        pooled_latency, pooled_connections, pooled_requests = self.run_webhooks(keep_alive=True)
+        LOGGER.info("Magpie requests per webhook: %.0f, without keep-alive: %.2f ms/webhook (%s connections), "
+                    "with pooled session: %.2f ms/webhook (%s connections)", pooled_requests / self.webhook_count,
+                    unpooled_latency * 1000, unpooled_connections, pooled_latency * 1000, pooled_connections)
+        assert unpooled_requests == pooled_requests
+        # the sign-in and the resources are only requested by the first webhook, the cached resources being reused
+        assert pooled_requests - self.webhook_count * 10 == 4
+        assert unpooled_connections == unpooled_requests
+        assert pooled_connections == 1
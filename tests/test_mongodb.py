@@ -1,18 +1,30 @@
 import os
 import tempfile
+import time
 import unittest
 
 import mock
+import mongomock
 import pytest
 import yaml
+from pymongo import DeleteOne, InsertOne
 from pymongo.collection import Collection
 from pymongo.cursor import Cursor
 
 from cowbird.database.mongodb import MongoDatabase
-from cowbird.database.stores import MonitoringStore
+from cowbird.database.stores import (
+    HardlinkIndexStatusStore,
+    HardlinkIndexStore,
+    MonitorEventJournalStore,
+    MonitoringStore
+)
+from cowbird.monitoring.fsmonitor import FSMonitor
 from cowbird.monitoring.monitor import Monitor
+from cowbird.utils import get_logger
 from tests import utils
 
+LOGGER = get_logger(__name__)
+
 
 @pytest.mark.database
 class MongodbServiceStoreTestCase(unittest.TestCase):
@@ -30,7 +42,8 @@ class MongodbServiceStoreTestCase(unittest.TestCase):
         os.unlink(cls.cfg_file.name)
 
     def setUp(self):
-        self.monitor_params = {"path": "/", "recursive": False, "callback": "cowbird.handlers.impl.catalog.Catalog"}
+        self.monitor_params = {"path": "/", "recursive": False, "callback": "cowbird.handlers.impl.catalog.Catalog",
+                               "debounce": 0.5, "watermark": 1700000000.0}
         self.monitor_params_bad_path = {"path": "", "recursive": False,
                                         "callback": "cowbird.handlers.impl.catalog.Catalog"}
         self.monitor_params_bad_callback = {"path": "/", "recursive": False, "callback": ""}
@@ -50,12 +63,22 @@ class MongodbServiceStoreTestCase(unittest.TestCase):
 
     def test_save_monitor(self):
         collection_mock = mock.Mock(spec=Collection)
-        collection_mock.count_documents.return_value = 1
         store = MonitoringStore(collection=collection_mock)
         store.save_monitor(self.monitor)
 
-        collection_mock.delete_one.assert_called_with(self.monitor.key)
-        collection_mock.insert_one.assert_called_with(self.monitor.params())
+        collection_mock.replace_one.assert_called_once_with(self.monitor.key, self.monitor.params(), upsert=True)
+
+    def test_save_monitors(self):
+        collection_mock = mock.Mock(spec=Collection)
+        store = MonitoringStore(collection=collection_mock)
+        other_monitor = Monitor(**{**self.monitor_params, "path": "/tmp"})
+        store.save_monitors([self.monitor, other_monitor])
+        store.save_monitors([])
+
+        collection_mock.bulk_write.assert_called_once_with([
+            DeleteOne(self.monitor.key), InsertOne(self.monitor.params()),
+            DeleteOne(other_monitor.key), InsertOne(other_monitor.params()),
+        ], ordered=True)
 
     def test_delete_monitor(self):
         collection_mock = mock.Mock(spec=Collection)
@@ -76,6 +99,155 @@ class MongodbServiceStoreTestCase(unittest.TestCase):
         assert len(monitors) == 1
         assert monitors[0].params() == self.monitor_params
 
-        # Store should remove monitors with bad parameters from database
-        collection_mock.delete_one.assert_has_calls([mock.call(self.monitor_params_bad_path),
-                                                     mock.call(self.monitor_params_bad_callback)])
+        # Store should remove monitors with bad parameters from database with a single request
+        collection_mock.bulk_write.assert_called_once_with([
+            DeleteOne({"callback": self.monitor_params_bad_path["callback"], "path": ""}),
+            DeleteOne({"callback": "", "path": "/"}),
+        ])
+
+
+class BenchmarkMonitor(FSMonitor):
+    @staticmethod
+    def get_instance():
+        return BenchmarkMonitor()
+
+    def on_created(self, path):
+        pass
+
+    def on_deleted(self, path):
+        pass
+
+    def on_modified(self, path):
+        pass
+
+
+@pytest.mark.database
+@pytest.mark.benchmark
+class TestMonitoringStoreBenchmark:
+    """
+    Micro-benchmark of the loading of many monitors on startup, using a mongomock collection.
+    """
+    monitor_count = 10000
+    invalid_count = 10
+    validation_workers = 16
+
+    def load_monitors(self, documents, workers):
+        """
+        Loads the monitors of a new collection of documents, returning the loaded paths and the loading duration.
+        """
+        collection = mongomock.MongoClient().db[MonitoringStore.type]
+        collection.insert_many([dict(doc) for doc in documents])
+        store = MonitoringStore(collection=mock.Mock(spec=Collection, wraps=collection))
+        start = time.perf_counter()
+        loaded = store.list_monitors(workers=workers)
+        duration = time.perf_counter() - start
+        assert collection.count_documents({}) == self.monitor_count - self.invalid_count
+        # invalid monitors are removed with a single request
+        store.collection.bulk_write.assert_called_once()
+        store.collection.delete_one.assert_not_called()
+        return [mon.path for mon in loaded], duration
+
+    def test_list_monitors(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = [os.path.join(tmpdir, str(i)) for i in range(self.monitor_count)]
+            for path in paths[self.invalid_count:]:
+                os.mkdir(path)
+            documents = [{"callback": "tests.test_mongodb.BenchmarkMonitor", "path": path,
+                          "recursive": True, "debounce": 0, "watermark": None} for path in paths]
+
+            # both validations load the same monitors from the same documents
+            sequential_paths, sequential_duration = self.load_monitors(documents, workers=1)
+            parallel_paths, parallel_duration = self.load_monitors(documents, workers=self.validation_workers)
+        LOGGER.info("Loading of %s monitors with %s invalid paths: sequential validation %.3f s, "
+                    "validation with %s threads %.3f s", self.monitor_count, self.invalid_count,
+                    sequential_duration, self.validation_workers, parallel_duration)
+        assert sorted(sequential_paths) == sorted(paths[self.invalid_count:])
+        assert parallel_paths == sequential_paths
+
+
+@pytest.mark.database
+class HardlinkIndexStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.collection = mongomock.MongoClient().db[HardlinkIndexStore.type]
+        self.collection.create_index(HardlinkIndexStore.index_fields[0], unique=True)
+        self.store = HardlinkIndexStore(collection=mock.Mock(spec=Collection, wraps=self.collection))
+        for user_id, src_path in [(1, "/wps_outputs/weaver/users/1/job/out.txt"),
+                                  (2, "/wps_outputs/weaver/users/2/job/out.txt"),
+                                  (1, "/wps_outputs/weaver.1/users/1/job/out.txt"),
+                                  (None, "/wps_outputs/weaver/public.txt")]:
+            self.store.save_hardlink(src_path, inode=len(src_path), links=[f"/workspace{src_path}"], user_id=user_id)
+
+    def test_save_hardlink_replaces_entry(self):
+        self.store.save_hardlink("/wps_outputs/weaver/public.txt", inode=1, links=[])
+        assert self.collection.count_documents({}) == 4
+        assert self.store.get_hardlink("/wps_outputs/weaver/public.txt") == {
+            "src_path": "/wps_outputs/weaver/public.txt", "inode": 1, "links": [], "user_id": None}
+
+    def test_list_hardlinks(self):
+        # regex special characters of the directory must not match other directories (e.g.: 'weaver.1')
+        src_paths = sorted(entry["src_path"] for entry in self.store.list_hardlinks("/wps_outputs/weaver"))
+        assert src_paths == ["/wps_outputs/weaver/public.txt",
+                             "/wps_outputs/weaver/users/1/job/out.txt",
+                             "/wps_outputs/weaver/users/2/job/out.txt"]
+        src_paths = [entry["src_path"] for entry in self.store.list_hardlinks("/wps_outputs/weaver/", user_ids=[2])]
+        assert src_paths == ["/wps_outputs/weaver/users/2/job/out.txt"]
+
+    def test_delete_hardlinks(self):
+        entries = self.store.delete_hardlinks("/wps_outputs/weaver/users")
+        assert len(entries) == 2
+        entries = self.store.delete_hardlinks("/wps_outputs/weaver/public.txt")
+        assert entries == [{"src_path": "/wps_outputs/weaver/public.txt", "inode": 30,
+                            "links": ["/workspace/wps_outputs/weaver/public.txt"], "user_id": None}]
+        assert self.collection.count_documents({}) == 1
+
+    def test_prune_hardlinks(self):
+        removed = self.store.prune_hardlinks("/wps_outputs", ["/wps_outputs/weaver/public.txt"])
+        assert removed == 3
+        assert [entry["src_path"] for entry in self.collection.find()] == ["/wps_outputs/weaver/public.txt"]
+
+    def test_complete_index(self):
+        status_collection = mongomock.MongoClient().db[HardlinkIndexStatusStore.type]
+        # same unique index as the one created for each store by the application
+        status_collection.create_index(HardlinkIndexStatusStore.index_fields[0], unique=True)
+        status_store = HardlinkIndexStatusStore(collection=status_collection)
+        assert not status_store.is_complete("/wps_outputs")
+        status_store.set_complete("/wps_outputs")
+        status_store.set_complete("/wps_outputs")
+        assert status_store.is_complete("/wps_outputs")
+        assert not status_store.is_complete("/wps_outputs/weaver")
+        # many directories can be marked, for example after a change of the WPS outputs directory
+        status_store.set_complete("/new_wps_outputs")
+        assert status_store.is_complete("/new_wps_outputs")
+        assert status_collection.count_documents({}) == 2
+        # the markers are not part of the hardlinks entries
+        assert len(list(self.store.list_hardlinks("/wps_outputs"))) == 4
+        assert self.store.prune_hardlinks("/wps_outputs", []) == 4
+        assert status_store.is_complete("/wps_outputs")
+
+        status_store.set_complete("/wps_outputs", complete=False)
+        assert not status_store.is_complete("/wps_outputs")
+        assert not status_store.is_complete("/new_wps_outputs")
+        assert status_collection.count_documents({}) == 0
+
+
+@pytest.mark.database
+class MonitorEventJournalStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.collection = mongomock.MongoClient().db[MonitorEventJournalStore.type]
+        self.store = MonitorEventJournalStore(collection=mock.Mock(spec=Collection, wraps=self.collection))
+        self.store.save_events([0, 1, 2], "tests.Callback", "/data",
+                               [("/data/file", "created"), ("/data/file", "modified"), ("/data/other", "deleted")])
+
+    def test_acknowledge_events(self):
+        assert self.store.get_next_seq() == 3
+        self.store.acknowledge_events([0, 2])
+        assert self.store.count_pending_events() == 1
+        assert self.store.list_pending_events() == [{"seq": 1, "callback": "tests.Callback", "monitor_path": "/data",
+                                                     "path": "/data/file", "type": "modified"}]
+        # acknowledged events are kept until they expire
+        assert self.collection.count_documents({}) == 3
+
+    def test_set_retention(self):
+        self.store.set_retention(60)
+        self.store.set_retention(120)
+        assert self.collection.index_information()["acked_ttl"]["expireAfterSeconds"] == 120
@@ -1,14 +1,41 @@
 import os
+import shutil
+import sys
 import tempfile
+import threading
 import unittest
-from time import sleep
+from pathlib import Path
+from time import sleep, time
 
+import mock
+import mongomock
 import pytest
 import yaml
+from pymongo.collection import Collection
+from schema import SchemaError
+from watchdog.events import (
+    DirCreatedEvent,
+    DirDeletedEvent,
+    DirModifiedEvent,
+    FileCreatedEvent,
+    FileDeletedEvent,
+    FileModifiedEvent
+)
+from watchdog.observers.api import EventQueue, ObservedWatch
 
+from cowbird.config import validate_monitoring_config_schema
+from cowbird.database.stores import MonitorEventJournalStore, MonitorEventStore
 from cowbird.handlers.handler_factory import HandlerFactory
-from cowbird.monitoring.fsmonitor import FSMonitor
+from cowbird.monitoring.activation import MonitorActivator
+from cowbird.monitoring.coalescer import EventCoalescer
+from cowbird.monitoring.dispatcher import EventDispatcher, OverflowPolicy
+from cowbird.monitoring.fsmonitor import FSEvent, FSEventType, FSMonitor
+from cowbird.monitoring.monitor import Monitor
 from cowbird.monitoring.monitoring import Monitoring
+from cowbird.monitoring.observer import MonitorBackend, ObserverPool
+from cowbird.monitoring.polling import DirectoryPollingEmitter
+from cowbird.monitoring.trie import PathTrie
+from cowbird.utils import SingletonMeta
 from tests.utils import clear_handlers_instances, get_test_app
 
 
@@ -53,6 +80,9 @@ class TestMonitoring(unittest.TestCase):
             mv_test_subdir_file = os.path.join(tmpdir, "moved_test_subdir_file")
             os.mkdir(test_subdir)
 
+            # watches left by the monitors of other tests
+            initial_watches = Monitoring().stats()["observers"]["watches"]
+
             # Test registering directly a callback instance
             mon = TestMonitor()
             internal_mon = Monitoring().register(tmpdir, False, mon)
@@ -78,6 +108,19 @@ class TestMonitoring(unittest.TestCase):
             # monitors second level is distinct callback, for tmpdir : (TestMonitor and TestMonitor2)
             assert len(Monitoring().monitors[tmpdir]) == 2
 
+            # all monitors share a single observer and the recursive watch of the root dir
+            stats = Monitoring().stats()
+            assert stats["monitors"] == 3
+            assert stats["observers"]["observers"] == 1
+            assert stats["observers"]["watches"] == initial_watches + 1
+            assert stats["observers"]["merged_watches"] == 2
+
+            # watermarks of the running monitors are saved
+            assert Monitoring().checkpoint() == 3
+            assert internal_mon.watermark is not None
+            saved = Monitoring().store.collection.find_one(internal_mon2.key)
+            assert saved["watermark"] == internal_mon2.watermark
+
             # Do some io operations that should be picked by the monitors
             file_io(test_file, mv_test_file)
             file_io(test_subdir_file, mv_test_subdir_file)
@@ -120,12 +163,624 @@ class TestMonitoring(unittest.TestCase):
             Monitoring().unregister(test_subdir, mon3)
             assert len(Monitoring().monitors) == 0
             assert not Monitoring().unregister(tmpdir, mon)
+            # the shared observer keeps running without any watch
+            assert Monitoring().stats()["observers"]["watches"] == initial_watches
+            assert Monitoring().stats()["observers"]["observers"] == 1
 
             # Test registering a callback via a qualified class name string
             catalog_mon = \
                 Monitoring().register(tmpdir, False, "cowbird.handlers.impl.catalog.Catalog").callback_instance
             assert catalog_mon == HandlerFactory().get_handler("Catalog")
 
+    def test_register_many(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = [os.path.join(tmpdir, str(i)) for i in range(3)]
+            for path in paths:
+                os.mkdir(path)
+            registrations = [(path, True, TestMonitor, 0) for path in paths]
+            registrations.append((os.path.join(tmpdir, "missing"), True, TestMonitor, 0))
+            with mock.patch.object(Monitoring().store.collection, "bulk_write",
+                                   wraps=Monitoring().store.collection.bulk_write) as mock_bulk_write:
+                monitors = Monitoring().register_many(registrations)
+            # a single request saves all the valid monitors
+            mock_bulk_write.assert_called_once()
+            assert monitors[3] is None
+            assert [mon.path for mon in monitors[:3]] == paths
+            assert all(mon.is_alive for mon in monitors[:3])
+            assert Monitoring().store.collection.count_documents({"path": {"$in": paths}}) == 3
+            # registering again returns the existing monitors
+            assert Monitoring().register_many(registrations[:1]) == monitors[:1]
+            for path in paths:
+                Monitoring().unregister(path, TestMonitor)
+
+    def test_lazy_monitors(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            user_dir = os.path.join(tmpdir, "user")
+            os.makedirs(os.path.join(user_dir, "subdir"))
+            mon = Monitoring().register(user_dir, True, TestMonitor)
+            mon.stop()
+            with mock.patch.object(Monitoring(), "lazy", True):
+                # monitors loaded on startup are inactive until requested
+                Monitoring()._start_monitor(mon, activate=False)  # pylint: disable=W0212
+                assert not mon.active
+                assert Monitoring().stats()["inactive"] == 1
+                # the watermark of an inactive monitor is kept until the changes of its tree get sent
+                watermark = mon.watermark
+                Monitoring().checkpoint()
+                assert mon.watermark == watermark
+                assert Monitoring().activate(os.path.join(tmpdir, "other")) == 0
+                assert Monitoring().activate(tmpdir) == 1
+                sleep(0.5)
+                assert mon.active
+                assert Monitoring().stats()["activation"]["active"] == 1
+                assert Monitoring().checkpoint() >= 1
+                assert mon.watermark != watermark
+                Monitoring().unregister(user_dir, TestMonitor)
+                assert Monitoring().stats()["activation"]["active"] == 0
+
+
+@pytest.mark.monitoring
+class TestObserverPool(unittest.TestCase):
+    def setUp(self):
+        # use a distinct pool from the one shared by the monitors of other tests
+        shared_pool = SingletonMeta._instances.pop(ObserverPool, None)  # pylint: disable=W0212
+        self.pool = ObserverPool(observer_count=2)
+        self.tmpdir = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        self.addCleanup(self.tmpdir.cleanup)
+        self.addCleanup(self.restore_shared_pool, shared_pool)
+
+    def restore_shared_pool(self, shared_pool):
+        self.pool.stop()
+        SingletonMeta._instances.pop(ObserverPool, None)  # pylint: disable=W0212
+        if shared_pool:
+            SingletonMeta._instances[ObserverPool] = shared_pool  # pylint: disable=W0212
+
+    def test_shared_watches(self):
+        paths = []
+        for i in range(4):
+            paths.append(os.path.join(self.tmpdir.name, str(i)))
+            os.mkdir(paths[-1])
+        monitors = [Monitor(path, True, TestMonitor()) for path in paths]
+        for mon in monitors:
+            self.pool.schedule(mon, mon.path, mon.recursive)
+        # a second monitor on a same path reuses the existing watch
+        other_mon = Monitor(paths[0], True, TestMonitor())
+        self.pool.schedule(other_mon, other_mon.path, other_mon.recursive)
+
+        stats = self.pool.stats()
+        assert stats["observers"] == 2
+        assert stats["watches"] == 4
+        assert stats["handlers"] == 5
+        if sys.platform.startswith("linux"):
+            assert stats["inotify"]["instances"] >= 4
+
+        self.pool.unschedule(monitors[0], paths[0], True)
+        assert self.pool.is_scheduled(other_mon, paths[0], True)
+        assert not self.pool.is_scheduled(monitors[0], paths[0], True)
+        assert self.pool.stats()["watches"] == 4
+
+        with open(os.path.join(paths[0], "file"), "w", encoding="utf-8"):
+            pass
+        sleep(1)
+        assert other_mon.callback_instance.created == [os.path.join(paths[0], "file")]
+        assert not monitors[0].callback_instance.created
+
+        self.pool.unschedule(other_mon, paths[0], True)
+        stats = self.pool.stats()
+        assert stats["watches"] == 3
+        assert stats["observers"] == 2
+
+    def test_merged_watches(self):
+        parent = self.tmpdir.name
+        child = os.path.join(parent, "child")
+        os.mkdir(child)
+        child_mon = Monitor(child, False, TestMonitor())
+        self.pool.schedule(child_mon, child, False)
+        assert self.pool.stats()["watches"] == 1
+
+        # the recursive watch of the parent replaces the watch of the child
+        parent_mon = Monitor(parent, True, TestMonitor())
+        self.pool.schedule(parent_mon, parent, True)
+        stats = self.pool.stats()
+        assert stats["watches"] == 1
+        assert stats["merged_watches"] == 1
+        assert self.pool.is_scheduled(child_mon, child, False)
+
+        # events are routed only to the handlers of the paths containing them
+        parent_file = os.path.join(parent, "file")
+        child_file = os.path.join(child, "file")
+        for path in [parent_file, child_file]:
+            with open(path, "w", encoding="utf-8"):
+                pass
+        # a file moved out of the child is deleted from its point of view
+        os.rename(child_file, os.path.join(parent, "moved"))
+        sleep(1)
+        assert parent_mon.callback_instance.created == [parent_file, child_file, os.path.join(parent, "moved")]
+        assert child_mon.callback_instance.created == [child_file]
+        assert child_mon.callback_instance.deleted == [child_file]
+        assert child not in parent_mon.callback_instance.deleted
+
+        # the child is watched again on its own once the parent is not monitored anymore
+        self.pool.unschedule(parent_mon, parent, True)
+        stats = self.pool.stats()
+        assert stats["watches"] == 1
+        assert stats["merged_watches"] == 0
+        assert self.pool.is_scheduled(child_mon, child, False)
+        with open(child_file, "w", encoding="utf-8"):
+            pass
+        sleep(1)
+        assert child_mon.callback_instance.created == [child_file, child_file]
+        assert len(parent_mon.callback_instance.created) == 3
+
+        self.pool.unschedule(child_mon, child, False)
+        assert self.pool.stats()["watches"] == 0
+
+    def test_invalid_path(self):
+        mon = Monitor(self.tmpdir.name, True, TestMonitor())
+        os.rmdir(self.tmpdir.name)
+        with pytest.raises(OSError):
+            self.pool.schedule(mon, mon.path, mon.recursive)
+        assert not self.pool.is_scheduled(mon, mon.path, mon.recursive)
+        assert self.pool.stats()["watches"] == 0
+        os.mkdir(self.tmpdir.name)
+
+    def test_backends(self):
+        polled_path = os.path.join(self.tmpdir.name, "polled")
+        native_path = os.path.join(polled_path, "native")
+        os.makedirs(native_path)
+        SingletonMeta._instances.pop(ObserverPool, None)  # pylint: disable=W0212
+        self.pool = ObserverPool(observer_count=2,
+                                 backends={polled_path: "polling", native_path + "/": MonitorBackend.INOTIFY,
+                                           "/unavailable": "fanotify"},
+                                 poll_interval=0.1, poll_max_interval=0.1)
+        assert self.pool.get_backend(self.tmpdir.name) == MonitorBackend.INOTIFY
+        assert self.pool.get_backend(polled_path) == MonitorBackend.POLLING
+        assert self.pool.get_backend(os.path.join(polled_path, "subdir")) == MonitorBackend.POLLING
+        assert self.pool.get_backend(os.path.join(native_path, "subdir")) == MonitorBackend.INOTIFY
+        assert self.pool.get_backend("/unavailable") == MonitorBackend.INOTIFY
+
+        polled_mon = Monitor(polled_path, True, TestMonitor())
+        native_mon = Monitor(native_path, True, TestMonitor())
+        for mon in [polled_mon, native_mon]:
+            self.pool.schedule(mon, mon.path, mon.recursive)
+        stats = self.pool.stats()
+        assert stats["observers"] == 2
+        assert stats["backends"] == {"inotify": 1, "polling": 1}
+        assert stats["polled_directories"] == 2
+
+        with open(os.path.join(polled_path, "file"), "w", encoding="utf-8"):
+            pass
+        sleep(1)
+        assert polled_mon.callback_instance.created == [os.path.join(polled_path, "file")]
+
+    def test_backends_config(self):
+        validate_monitoring_config_schema({"backend": "polling", "poll_interval": 0.5,
+                                           "paths": [{"path": self.tmpdir.name, "backend": "inotify"}]})
+        for invalid_cfg in [{"backend": "unknown"}, {"poll_max_interval": 0}, {"paths": [{"path": self.tmpdir.name}]}]:
+            with pytest.raises(SchemaError):
+                validate_monitoring_config_schema(invalid_cfg)
+
+
+@pytest.mark.monitoring
+class TestMonitorActivator(unittest.TestCase):
+    def setUp(self):
+        # use a distinct pool from the one shared by the monitors of other tests
+        shared_pool = SingletonMeta._instances.pop(ObserverPool, None)  # pylint: disable=W0212
+        self.pool = ObserverPool(observer_count=1)
+        self.tmpdir = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        self.addCleanup(self.tmpdir.cleanup)
+        self.addCleanup(self.restore_shared_pool, shared_pool)
+
+    def restore_shared_pool(self, shared_pool):
+        self.pool.stop()
+        SingletonMeta._instances.pop(ObserverPool, None)  # pylint: disable=W0212
+        if shared_pool:
+            SingletonMeta._instances[ObserverPool] = shared_pool  # pylint: disable=W0212
+
+    def start_lazy_monitor(self, activator, name):
+        path = os.path.join(self.tmpdir.name, name)
+        os.makedirs(os.path.join(path, "subdir"))
+        mon = Monitor(path, True, TestMonitor())
+        mon.activator = activator
+        mon.start(active=False)
+        return mon
+
+    def test_activate_on_event(self):
+        activator = MonitorActivator(max_active=1)
+        mon = self.start_lazy_monitor(activator, "lazy")
+        assert mon.is_alive
+        assert not mon.active
+        # the direct entries of the path are watched, but not those of its subdirectories
+        subdir_file = os.path.join(mon.path, "subdir", "file")
+        with open(subdir_file, "w", encoding="utf-8"):
+            pass
+        sleep(0.5)
+        assert not mon.callback_instance.created
+
+        # an event of the path activates the monitor, which sends the changes of its tree since it was started
+        path_file = os.path.join(mon.path, "file")
+        with open(path_file, "w", encoding="utf-8"):
+            pass
+        sleep(1)
+        assert mon.active
+        assert mon.is_alive
+        assert mon.callback_instance.created[0] == path_file
+        assert subdir_file in mon.callback_instance.created
+        new_subdir_file = os.path.join(mon.path, "subdir", "new_file")
+        with open(new_subdir_file, "w", encoding="utf-8"):
+            pass
+        sleep(1)
+        assert mon.callback_instance.created[-1] == new_subdir_file
+
+        # activating another monitor deactivates the least recently used one
+        other_mon = self.start_lazy_monitor(activator, "other")
+        assert activator.activate(other_mon)
+        assert other_mon.active
+        assert not mon.active
+        assert mon.is_alive
+        assert activator.stats() == {"active": 1, "activations": 2, "deactivations": 1}
+        stats = self.pool.stats()
+        assert stats["watches"] == 2
+        assert stats["handlers"] == 2
+
+    def test_deactivate_idle(self):
+        activator = MonitorActivator(idle_timeout=0.1)
+        mon = self.start_lazy_monitor(activator, "lazy")
+        assert activator.activate(mon)
+        assert mon.active
+        sleep(1)
+        assert not mon.active
+        assert mon.is_alive
+        assert activator.stats() == {"active": 0, "activations": 1, "deactivations": 1}
+
+
+@pytest.mark.monitoring
+def test_path_trie():
+    trie = PathTrie()
+    trie["/a/b"] = 1
+    trie["/a/b/c/"] = 2
+    trie["/a/bc"] = 3
+    trie["/d"] = 4
+    assert len(trie) == 4
+    assert trie.get("/a/b/c") == 2
+    assert trie.get("/a") is None
+    assert list(trie.ancestors("/a/b/c/file")) == [("/a/b", 1), ("/a/b/c", 2)]
+    assert list(trie.ancestors("/a/bcd")) == []
+    assert sorted(trie.descendants("/a/b")) == [("/a/b", 1), ("/a/b/c", 2)]
+    assert sorted(trie.descendants("/a")) == [("/a/b", 1), ("/a/b/c", 2), ("/a/bc", 3)]
+
+    assert trie.pop("/a/b") == 1
+    assert trie.pop("/a/b") is None
+    assert trie.get("/a/b/c") == 2
+    assert trie.pop("/a/b/c") == 2
+    assert sorted(trie.descendants("/")) == [("/a/bc", 3), ("/d", 4)]
+    assert len(trie) == 2
+
+
+@pytest.mark.monitoring
+class TestDirectoryPollingEmitter(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        self.addCleanup(self.tmpdir.cleanup)
+        self.root = self.tmpdir.name
+        self.subdirs = [os.path.join(self.root, f"subdir{i}") for i in range(10)]
+        for subdir in self.subdirs:
+            os.mkdir(subdir)
+            with open(os.path.join(subdir, "file"), "w", encoding="utf-8"):
+                pass
+        # entries changed long ago are only checked again when their directory changes
+        past = time() - 3600
+        for subdir in self.subdirs:
+            os.utime(os.path.join(subdir, "file"), (past, past))
+            os.utime(subdir, (past, past))
+        os.utime(self.root, (past, past))
+        self.queue = EventQueue()
+        self.emitter = DirectoryPollingEmitter(self.queue, ObservedWatch(self.root, recursive=True),
+                                               timeout=0.01, max_interval=0.04)
+        self.emitter.on_thread_start()
+
+    def get_events(self):
+        events = set()
+        while not self.queue.empty():
+            event, _ = self.queue.get()
+            events.add((type(event), event.src_path))
+        return events
+
+    def test_poll_changes(self):
+        assert self.emitter.directories == 11
+        assert self.emitter.poll() == 0
+
+        new_file = os.path.join(self.root, "new_file")
+        new_dir = os.path.join(self.root, "new_dir")
+        with open(new_file, "w", encoding="utf-8") as f:
+            f.write("Hello")
+        os.mkdir(new_dir)
+        with open(os.path.join(new_dir, "file"), "w", encoding="utf-8"):
+            pass
+        os.remove(os.path.join(self.subdirs[0], "file"))
+        assert self.emitter.poll() == 6
+        assert self.get_events() == {
+            (FileCreatedEvent, new_file),
+            (DirCreatedEvent, new_dir),
+            (FileCreatedEvent, os.path.join(new_dir, "file")),
+            (FileDeletedEvent, os.path.join(self.subdirs[0], "file")),
+            (DirModifiedEvent, self.root),
+            (DirModifiedEvent, self.subdirs[0]),
+        }
+
+        # writing into a recently created file is found even though its directory is not modified
+        root_stat = os.stat(self.root)
+        with open(new_file, "a", encoding="utf-8") as f:
+            f.write(" world!")
+        assert os.stat(self.root).st_mtime_ns == root_stat.st_mtime_ns
+        assert self.emitter.poll() == 1
+        assert self.get_events() == {(FileModifiedEvent, new_file)}
+        assert self.emitter.poll() == 0
+
+        shutil.rmtree(new_dir)
+        assert self.emitter.poll() == 3
+        assert self.get_events() == {
+            (FileDeletedEvent, os.path.join(new_dir, "file")),
+            (DirDeletedEvent, new_dir),
+            (DirModifiedEvent, self.root),
+        }
+        assert self.emitter.directories == 11
+
+    def test_only_changed_directories_listed(self):
+        changed_file = os.path.join(self.subdirs[3], "changed")
+        with open(changed_file, "w", encoding="utf-8"):
+            pass
+        with mock.patch.object(self.emitter, "_list", wraps=self.emitter._list) as mock_list:  # pylint: disable=W0212
+            assert self.emitter.poll() == 2
+        mock_list.assert_called_once_with(self.subdirs[3])
+        assert self.get_events() == {(FileCreatedEvent, changed_file), (DirModifiedEvent, self.subdirs[3])}
+
+    def test_adaptive_interval(self):
+        for interval in [0.02, 0.04, 0.04]:
+            self.emitter.queue_events(0)
+            assert self.emitter.interval == interval
+        with open(os.path.join(self.root, "new_file"), "w", encoding="utf-8"):
+            pass
+        self.emitter.queue_events(0)
+        assert self.emitter.interval == 0.01
+        assert self.get_events() == {
+            (FileCreatedEvent, os.path.join(self.root, "new_file")),
+            (DirModifiedEvent, self.root),
+        }
+
+
+@pytest.mark.monitoring
+class TestEventCoalescer(unittest.TestCase):
+    def setUp(self):
+        self.batches = []
+        self.coalescer = EventCoalescer(0.2, self.batches.append)
+
+    def test_coalesce(self):
+        events = [
+            ("created", FSEventType.CREATED), ("created", FSEventType.MODIFIED), ("created", FSEventType.MODIFIED),
+            ("modified", FSEventType.MODIFIED), ("modified", FSEventType.MODIFIED),
+            ("temporary", FSEventType.CREATED), ("temporary", FSEventType.MODIFIED), ("temporary", FSEventType.DELETED),
+            ("deleted", FSEventType.MODIFIED), ("deleted", FSEventType.DELETED),
+            ("replaced", FSEventType.DELETED), ("replaced", FSEventType.CREATED), ("replaced", FSEventType.MODIFIED),
+        ]
+        for path, event_type in events:
+            self.coalescer.add(path, event_type)
+        assert self.coalescer.pending == 4
+        self.coalescer.flush()
+        assert self.batches == [[
+            FSEvent("created", FSEventType.CREATED),
+            FSEvent("modified", FSEventType.MODIFIED),
+            FSEvent("deleted", FSEventType.DELETED),
+            FSEvent("replaced", FSEventType.DELETED),
+            FSEvent("replaced", FSEventType.CREATED),
+        ]]
+        assert self.coalescer.pending == 0
+
+    def test_debounce_window(self):
+        self.coalescer.add("file", FSEventType.CREATED)
+        sleep(0.1)
+        self.coalescer.add("file", FSEventType.MODIFIED)
+        self.coalescer.add("other", FSEventType.MODIFIED)
+        sleep(0.15)
+        # window of the path was extended by its last event
+        assert not self.batches
+        sleep(0.25)
+        assert self.batches == [[FSEvent("file", FSEventType.CREATED), FSEvent("other", FSEventType.MODIFIED)]]
+
+
+@pytest.mark.monitoring
+class TestMonitorDebounce(unittest.TestCase):
+    def test_debounced_monitor(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            test_file = os.path.join(tmpdir, "testfile")
+            mv_test_file = os.path.join(tmpdir, "moved_testfile")
+            callback = TestMonitor()
+            mon = Monitor(tmpdir, True, callback, debounce=0.5)
+            assert mon.params()["debounce"] == 0.5
+            mon.start()
+            self.addCleanup(mon.stop)
+
+            file_io(test_file, mv_test_file)
+            with open(test_file, "w", encoding="utf-8") as f:
+                f.write("Hello")
+            with open(test_file, "a", encoding="utf-8") as f:
+                f.write(" world!")
+            sleep(0.2)
+            assert not callback.created
+            sleep(1)
+
+            # transient files are dropped, and the burst of modifications is sent as a single creation
+            assert callback.created == [test_file]
+            assert not callback.deleted
+            assert callback.modified == [tmpdir]
+
+
+@pytest.mark.monitoring
+class TestMonitorCatchUp(unittest.TestCase):
+    def test_scan_changes(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            old_dir = os.path.join(tmpdir, "old_dir")
+            old_file = os.path.join(old_dir, "old_file")
+            os.mkdir(old_dir)
+            Path(old_file).touch()
+            Path(os.path.join(tmpdir, "unchanged")).touch()
+            sleep(0.05)
+            watermark = time()
+            sleep(0.05)
+            new_dir = os.path.join(tmpdir, "new_dir")
+            new_file = os.path.join(new_dir, "new_file")
+            os.mkdir(new_dir)
+            Path(new_file).touch()
+            os.chmod(old_file, 0o600)
+
+            callback = TestMonitor()
+            mon = Monitor(tmpdir, True, callback, watermark=watermark)
+            assert sorted(mon.scan_changes(watermark)) == sorted([
+                FSEvent(tmpdir, FSEventType.MODIFIED),
+                FSEvent(new_dir, FSEventType.MODIFIED),
+                FSEvent(new_file, FSEventType.CREATED),
+                FSEvent(old_file, FSEventType.CREATED),
+            ])
+            non_recursive_mon = Monitor(tmpdir, False, callback)
+            assert sorted(non_recursive_mon.scan_changes(watermark)) == sorted([
+                FSEvent(tmpdir, FSEventType.MODIFIED),
+                FSEvent(new_dir, FSEventType.MODIFIED),
+            ])
+
+            # only monitors with a watermark are caught up
+            assert non_recursive_mon.catch_up() == 0
+            assert mon.catch_up() == 4
+            assert sorted(callback.created) == sorted([new_file, old_file])
+            assert sorted(callback.modified) == sorted([tmpdir, new_dir])
+
+
+@pytest.mark.monitoring
+class TestEventDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        self.addCleanup(self.tmpdir.cleanup)
+        self.callback = RecordingMonitor()
+        self.monitor = Monitor(self.tmpdir.name, True, self.callback)
+        # use distinct dispatchers from the one shared by the monitors of other tests
+        shared_dispatcher = SingletonMeta._instances.pop(EventDispatcher, None)  # pylint: disable=W0212
+        self.addCleanup(self.restore_shared_dispatcher, shared_dispatcher)
+
+    def restore_shared_dispatcher(self, shared_dispatcher):
+        self.callback.release.set()
+        SingletonMeta._instances.pop(EventDispatcher, None)  # pylint: disable=W0212
+        if shared_dispatcher:
+            SingletonMeta._instances[EventDispatcher] = shared_dispatcher  # pylint: disable=W0212
+
+    def get_dispatcher(self, *args, **kwargs):
+        SingletonMeta._instances.pop(EventDispatcher, None)  # pylint: disable=W0212
+        return EventDispatcher(*args, **kwargs)
+
+    def start_blocked_callback(self, dispatcher):
+        """
+        Sends a first event to the worker, which then blocks until the callback is released.
+        """
+        self.callback.release.clear()
+        dispatcher.put(self.monitor, [FSEvent("first", FSEventType.CREATED)])
+        assert self.callback.started.wait(1)
+
+    def test_inline(self):
+        dispatcher = self.get_dispatcher()
+        dispatcher.put(self.monitor, [FSEvent("file", FSEventType.CREATED)])
+        assert self.callback.events == [FSEvent("file", FSEventType.CREATED)]
+        assert dispatcher.stats()["processed"] == 1
+
+    def test_path_order(self):
+        dispatcher = self.get_dispatcher(workers=4, queue_size=10)
+        events = [FSEvent(f"file{i % 20}", event_type) for i in range(200)
+                  for event_type in [FSEventType.CREATED, FSEventType.MODIFIED, FSEventType.DELETED]]
+        for event in events:
+            dispatcher.put(self.monitor, [event])
+        assert dispatcher.join(timeout=5)
+
+        assert len(self.callback.events) == len(events)
+        for i in range(20):
+            path = f"file{i}"
+            assert [event for event in self.callback.events if event.path == path] == \
+                   [event for event in events if event.path == path]
+        stats = dispatcher.stats()
+        assert stats["received"] == stats["processed"] == len(events)
+        assert stats["queued"] == 0
+        assert 0 < stats["max_queued"] <= 10
+
+    def test_overflow_block(self):
+        dispatcher = self.get_dispatcher(workers=1, queue_size=2)
+        self.start_blocked_callback(dispatcher)
+        events = [FSEvent(f"file{i}", FSEventType.CREATED) for i in range(5)]
+        producer = threading.Thread(target=dispatcher.put, args=(self.monitor, events))
+        producer.start()
+        producer.join(0.2)
+        assert producer.is_alive()
+        assert dispatcher.stats()["queued"] == 2
+
+        self.callback.release.set()
+        producer.join(1)
+        assert dispatcher.join(timeout=1)
+        assert self.callback.events[1:] == events
+        stats = dispatcher.stats()
+        assert stats["overflows"] >= 1
+        assert stats["blocked_seconds"] > 0
+        assert stats["dropped"] == 0
+
+    def test_overflow_drop_oldest(self):
+        dispatcher = self.get_dispatcher(workers=1, queue_size=2, overflow_policy=OverflowPolicy.DROP_OLDEST)
+        self.start_blocked_callback(dispatcher)
+        events = [FSEvent(f"file{i}", FSEventType.CREATED) for i in range(5)]
+        dispatcher.put(self.monitor, events)
+
+        self.callback.release.set()
+        assert dispatcher.join(timeout=1)
+        assert self.callback.events[1:] == events[3:]
+        stats = dispatcher.stats()
+        assert stats["received"] == 6
+        assert stats["processed"] == 3
+        assert stats["dropped"] == 3
+
+    def test_overflow_spill(self):
+        store = MonitorEventStore(collection=mock.Mock(spec=Collection,
+                                                       wraps=mongomock.MongoClient().db[MonitorEventStore.type]))
+        dispatcher = self.get_dispatcher(workers=1, queue_size=2, overflow_policy=OverflowPolicy.SPILL,
+                                         spill_store=store, monitor_resolver=lambda callback, path: self.monitor)
+        self.start_blocked_callback(dispatcher)
+        events = [FSEvent(f"file{i}", FSEventType.CREATED) for i in range(5)]
+        dispatcher.put(self.monitor, events)
+        stats = dispatcher.stats()
+        assert stats["queued"] == 2
+        assert stats["spilled"] == store.count_events(0) == 3
+
+        # the queued events come before the spilled ones, and any new event after them
+        dispatcher.put(self.monitor, [FSEvent("file0", FSEventType.DELETED)])
+        self.callback.release.set()
+        assert dispatcher.join(timeout=1)
+        assert self.callback.events[1:] == events + [FSEvent("file0", FSEventType.DELETED)]
+        stats = dispatcher.stats()
+        assert stats["spilled"] == 0
+        assert stats["spilled_total"] == 4
+        assert store.count_events(0) == 0
+
+    def test_journal_replay(self):
+        journal = MonitorEventJournalStore(collection=mock.Mock(
+            spec=Collection, wraps=mongomock.MongoClient().db[MonitorEventJournalStore.type]))
+        dispatcher = self.get_dispatcher(workers=1, monitor_resolver=lambda callback, path: self.monitor,
+                                         journal=journal)
+        self.start_blocked_callback(dispatcher)
+        events = [FSEvent(f"file{i}", FSEventType.CREATED) for i in range(5)]
+        dispatcher.put(self.monitor, events)
+        assert journal.count_pending_events() == 6
+
+        # a new dispatcher, as after a restart, replays the events that were not sent yet
+        callback = RecordingMonitor()
+        monitor = Monitor(self.tmpdir.name, True, callback)
+        dispatcher = self.get_dispatcher(monitor_resolver=lambda callback, path: monitor, journal=journal)
+        assert dispatcher.replay_journal() == 6
+        assert callback.events == [FSEvent("first", FSEventType.CREATED)] + events
+        assert journal.count_pending_events() == 0
+        assert dispatcher.stats()["replayed"] == 6
+
 
 class TestMonitor(FSMonitor):
     __test__ = False  # avoid invalid collect depending on specified input path/items to pytest
@@ -156,3 +811,34 @@ class TestMonitor2(TestMonitor):
     @staticmethod
     def get_instance():
         return TestMonitor2()
+
+
+class RecordingMonitor(FSMonitor):
+    """
+    Records the batches of events in the order in which they are received, optionally blocking until released.
+    """
+    def __init__(self):
+        self.events = []
+        self.lock = threading.Lock()
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    @staticmethod
+    def get_instance():
+        return RecordingMonitor()
+
+    def on_events(self, events):
+        self.started.set()
+        self.release.wait(5)
+        with self.lock:
+            self.events.extend(events)
+
+    def on_created(self, path):
+        pass
+
+    def on_deleted(self, path):
+        pass
+
+    def on_modified(self, path):
+        pass
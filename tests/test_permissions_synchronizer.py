@@ -1,6 +1,8 @@
 import contextlib
 import os
+import re
 import tempfile
+import time
 import unittest
 from collections import Counter
 from pathlib import Path
@@ -23,8 +25,12 @@ from cowbird.config import (
     ConfigErrorInvalidTokens
 )
 from cowbird.handlers import HandlerFactory
+from cowbird.permissions_synchronizer import SyncPoint
+from cowbird.utils import get_logger
 from tests import test_magpie, utils
 
+LOGGER = get_logger(__name__)
+
 CURR_DIR = Path(__file__).resolve().parent
 
 
@@ -1101,3 +1107,76 @@ class TestSyncPermissionsConfig(unittest.TestCase):
             }
         }
         check_config(self.data)
+
+
+@pytest.mark.permissions
+@pytest.mark.benchmark
+class TestSyncPointResourceMatchingBenchmark:
+    """
+    Micro-benchmark of the resource matching of a sync point, using a large synthetic config.
+    """
+    resource_count = 1000
+    lookup_count = 200
+
+    def get_sync_point(self) -> SyncPoint:
+        resources = {
+            f"ThreddsDir{i}": [{"name": "thredds", "type": Service.resource_type_name},
+                               {"name": f"dir{i}", "type": Directory.resource_type_name},
+                               {"name": MULTI_TOKEN, "type": Directory.resource_type_name},
+                               {"name": "{file}", "type": File.resource_type_name}]
+            for i in range(self.resource_count - 2)
+        }
+        resources["ThreddsAnyFile"] = [{"name": "thredds", "type": Service.resource_type_name},
+                                       {"name": MULTI_TOKEN, "type": Directory.resource_type_name},
+                                       {"name": "{file}", "type": File.resource_type_name}]
+        resources["ThreddsRegex"] = [{"name": "thredds", "type": Service.resource_type_name},
+                                     {"name": "regex", "type": File.resource_type_name,
+                                      "regex": r"^/thredds::service/special::directory/.*"}]
+        return SyncPoint(services={"thredds": resources}, permissions_mapping_list=[])
+
+    @staticmethod
+    def find_matching_res_unindexed(sync_point: SyncPoint, src_resource_tree: List[Dict]) -> Dict[str, int]:
+        """
+        Evaluates every resource key of the config, as done without the precompiled matchers and index.
+        """
+        matched_length_by_res = {}
+        for res_key, res_segments in sync_point.services["thredds"].items():
+            res_regex, named_segments_count = SyncPoint._generate_regex_from_segments(res_segments)
+            path = SyncPoint._generate_nametype_path_from_segments(res_segments, src_resource_tree)
+            matches = (re.search if named_segments_count == -1 else re.match)(res_regex, path)
+            if matches:
+                matched_length_by_res[res_key] = (named_segments_count if named_segments_count != -1
+                                                  else len(matches.group()))
+        return matched_length_by_res
+
+    def test_find_matching_res(self):
+        sync_point = self.get_sync_point()
+        permission = mock.Mock(service_type="thredds")
+        trees = []
+        for i in range(self.lookup_count):
+            tree = [{"resource_name": "thredds", "resource_type": Service.resource_type_name},
+                    {"resource_name": f"dir{i * 7 % (self.resource_count + 10)}",
+                     "resource_type": Directory.resource_type_name},
+                    {"resource_name": "sub", "resource_type": Directory.resource_type_name},
+                    {"resource_name": "data-file", "resource_type": File.resource_type_name}]
+            trees.append(tree)
+        trees.append([{"resource_name": "thredds", "resource_type": Service.resource_type_name},
+                      {"resource_name": "special", "resource_type": Directory.resource_type_name},
+                      {"resource_name": "data-file", "resource_type": File.resource_type_name}])
+
+        start = time.perf_counter()
+        unindexed = [self.find_matching_res_unindexed(sync_point, tree) for tree in trees]
+        unindexed_duration = time.perf_counter() - start
+        start = time.perf_counter()
+        indexed = [sync_point._find_matching_res(permission, tree) for tree in trees]
+        indexed_duration = time.perf_counter() - start
+        LOGGER.info("Resource matching over %s config keys: without index %.3f ms/lookup, with index %.3f ms/lookup",
+                    self.resource_count, unindexed_duration / len(trees) * 1000,
+                    indexed_duration / len(trees) * 1000)
+
+        for tree, matched_lengths, (res_key, _) in zip(trees, unindexed, indexed):
+            longest = max(matched_lengths.values())
+            expected = [key for key, length in matched_lengths.items() if length == longest]
+            assert [res_key] == expected, f"Unexpected match for tree {tree}"
+            # only the key of the directory, if any, and the keys without a literal directory are evaluated
+            assert len(sync_point.resource_index["thredds"].get_candidates(tree)) <= 3
@@ -14,7 +14,7 @@ import unittest
 from abc import ABC
 from datetime import datetime
 from time import sleep
-from unittest.mock import patch
+from unittest.mock import call, patch
 
 import pytest
 from celery import chain, shared_task
@@ -206,6 +206,24 @@ class TestRequestTask(unittest.TestCase):
                                                           datastore_name=datastore_name,
                                                           filename=shapefile_name)
 
+    @pytest.mark.geoserver
+    @patch("cowbird.handlers.impl.geoserver.Geoserver.publish_shapefiles")
+    def test_geoserver_files_creation(self, publish_shapefiles_mock):
+        test_user_name = "test_user"
+        # the second shapefile is incomplete the first time it is validated
+        publish_shapefiles_mock.side_effect = [["shapefile2"], []]
+
+        # initialize geoserver instance
+        Geoserver.get_instance()
+
+        Geoserver.publish_shapefiles_task(workspace_name=test_user_name, shapefile_names=["shapefile1", "shapefile2"])
+
+        # current implementation doesn't give any handler on which we could wait
+        sleep(3)
+        # only the incomplete shapefile is published again by the retry
+        assert publish_shapefiles_mock.call_args_list == [call(test_user_name, ["shapefile1", "shapefile2"]),
+                                                          call(test_user_name, ["shapefile2"])]
+
     @pytest.mark.geoserver
     @patch("cowbird.handlers.impl.geoserver.Geoserver._remove_shapefile_request")
     def test_geoserver_file_removal(self, remove_shapefile_request_mock):
@@ -18,7 +18,7 @@ from cowbird import __meta__
 from cowbird.api import exception as ax
 from cowbird.api import generic as ag
 from cowbird.api import requests as ar
-from cowbird.utils import CONTENT_TYPE_JSON, ExtendedEnum, get_header
+from cowbird.utils import CONTENT_TYPE_JSON, ExtendedEnum, HTTPSessionPool, LatencyHistogram, TTLCache, get_header
 from tests import utils
 
 
@@ -271,3 +271,65 @@ class TestUtils(unittest.TestCase):
         content_type, where = ag.guess_target_format(request)
         utils.check_val_equal(content_type, CONTENT_TYPE_JSON)
         utils.check_val_equal(where, True)
+
+    def test_http_session_pool_reuse_connections(self):
+        routes = {("GET", "/ping"): lambda query, body: (200, {"ping": "pong"})}
+        with utils.StubHTTPServer(routes) as server:
+            pool = HTTPSessionPool(keep_alive=True)
+            for _ in range(5):
+                utils.check_val_equal(pool.request("GET", f"{server.url}/ping", timeout=5).status_code, 200)
+            utils.check_val_equal(server.connections, 1)
+
+            pool = HTTPSessionPool(keep_alive=False)
+            for _ in range(5):
+                utils.check_val_equal(pool.request("GET", f"{server.url}/ping", timeout=5).status_code, 200)
+            utils.check_val_equal(server.connections, 6)
+
+    def test_http_session_pool_recreated_in_child_process(self):
+        pool = HTTPSessionPool()
+        session = pool.session
+        utils.check_val_equal(pool.session is session, True, msg="session should be reused within the same process")
+        with mock.patch("cowbird.utils.os.getpid", return_value=-1):
+            utils.check_val_equal(pool.session is session, False, msg="forked process should not share the session")
+
+    def test_http_session_pool_auth(self):
+        pool = HTTPSessionPool(auth=("admin", "secret"))
+        utils.check_val_equal(pool.session.auth, ("admin", "secret"))
+        utils.check_val_equal(HTTPSessionPool().session.auth, None)
+
+    def test_latency_histogram(self):
+        histogram = LatencyHistogram(buckets=[0.1, 1])
+        for duration in [0.05, 0.1, 0.5, 2]:
+            histogram.observe(duration)
+        stats = histogram.stats()
+        utils.check_val_equal(stats["count"], 4)
+        utils.check_val_equal(stats["max"], 2)
+        utils.check_val_equal(stats["buckets"], {"0.1": 2, "1": 3, "+Inf": 4})
+
+    def test_ttl_cache_expiry_and_eviction(self):
+        cache = TTLCache(ttl=60, maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        utils.check_val_equal(cache.get("a"), 1)
+        cache.set("c", 3)  # evicts 'b', least recently used
+        utils.check_val_equal(cache.get("b"), None)
+        utils.check_val_equal(cache.get("c"), 3)
+        utils.check_val_equal(cache.stats()["hits"], 2)
+        utils.check_val_equal(cache.stats()["misses"], 1)
+
+        with mock.patch("cowbird.utils.time.monotonic", return_value=10 ** 9):
+            utils.check_val_equal(cache.get("a"), None)
+        utils.check_val_equal(len(cache), 1)
+
+        cache = TTLCache(ttl=0, maxsize=10)
+        cache.set("a", 1)
+        utils.check_val_equal(cache.get("a"), None)
+
+    def test_ttl_cache_reset(self):
+        cache = TTLCache(ttl=60, maxsize=2)
+        cache.set("a", 1)
+        cache.reset({"b": 2, "c": 3, "d": 4})
+        utils.check_val_equal(cache.get("a"), None)
+        utils.check_val_equal(cache.get("b"), None, msg="values beyond the size should be evicted first")
+        utils.check_val_equal(cache.get("c"), 3)
+        utils.check_val_equal(cache.get("d"), 4)
@@ -1,10 +1,12 @@
 import functools
 import json as json_pkg  # avoid conflict name with json argument employed for some function
 import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from stat import ST_MODE
 from typing import Any, Callable, Collection, Dict, Iterable, List, Literal, Optional, Tuple, Type, Union
 from typing_extensions import TypeAlias
-from urllib.parse import urlparse
+from urllib.parse import parse_qs, urlparse
 
 import mock
 import requests
@@ -212,6 +214,83 @@ class MockAnyHandler(MockAnyHandlerBase):
     required_params = []
 
 
+StubRouteType: TypeAlias = Callable[[Dict[str, List[str]], Optional[JSON]], Tuple[int, JSON]]
+
+
+class StubHTTPServer(object):
+    """
+    Minimal local HTTP/1.1 server running in a thread, to emulate a web service (e.g.: `Magpie`) in offline tests.
+
+    Routes are matched by ``(method, path)`` and return a ``(status, json)`` tuple computed from the query parameters
+    and the JSON body of the request. All received requests and the number of opened connections are recorded.
+
+    .. code-block:: python
+
+        with StubHTTPServer({("GET", "/users"): lambda query, body: (200, {"user_names": []})}) as server:
+            requests.get(f"{server.url}/users")
+    """
+
+    def __init__(self, routes: Dict[Tuple[str, str], StubRouteType]) -> None:
+        self.routes = routes
+        self.requests: List[Tuple[str, str]] = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "StubHTTPServer":
+        stub = self
+
+        class StubRequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # allow keep-alive connections
+            disable_nagle_algorithm = True  # avoid delayed ACK stalls between headers and body writes
+
+            def setup(self) -> None:
+                super().setup()
+                with stub._lock:  # pylint: disable=W0212
+                    stub.connections += 1
+
+            def log_message(self, *_: Any) -> None:
+                pass
+
+            def _handle(self) -> None:
+                url = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json_pkg.loads(self.rfile.read(length)) if length else None
+                with stub._lock:  # pylint: disable=W0212
+                    stub.requests.append((self.command, url.path))
+                route = stub.routes.get((self.command, url.path))
+                status, data = route(parse_qs(url.query), body) if route else (404, {"detail": "not found"})
+                content = json_pkg.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", CONTENT_TYPE_JSON)
+                self.send_header("Content-Length", str(len(content)))
+                if self.close_connection:
+                    self.send_header("Connection", "close")
+                if url.path.endswith("/signin"):
+                    self.send_header("Set-Cookie", "auth_tkt=stub; Path=/")
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), StubRequestHandler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+
 def clear_handlers_instances():
     # Remove the handler instances initialized with test specific config
     SingletonMeta._instances.clear()  # pylint: disable=W0212